@@ -1,17 +1,37 @@
 # coding=utf-8
 import copy
-import random
 import warnings
 
 import numpy as np
 
-from sklearn.gaussian_process.kernels import Matern
-from sklearn.gaussian_process import GaussianProcessRegressor
-from scipy.optimize import minimize
-from scipy.stats import norm
+# sklearn and scipy are imported on first use: the suggestions of the first iteration are random,
+# so a searcher process does not pay for their import before the gp is trained
 
 # Need to import the searcher abstract class, the following are essential
-from thpo.abstract_searcher import AbstractSearcher
+try:
+    # The judge runs the searcher with its own stock thpo, prepare_submission.sh ships index_searcher.py with it
+    from index_searcher import IndexSearcher
+except ModuleNotFoundError:
+    from thpo.index_searcher import IndexSearcher
+
+# Surrogate of the searcher:
+#   'full': fit GaussianProcessRegressor from scratch in every iteration
+#   'incremental': IncrementalGP, refit hyperparameters every GP_REFIT_INTERVAL iterations
+SURROGATE_MODE = 'full'
+GP_REFIT_INTERVAL = 10
+
+# Optimizer of the acquisition function:
+#   'continuous': random warm up and L-BFGS-B on the bounds, then snap to coords
+#   'grid': score every unevaluated point of the coords lattice if it has at most MAX_GRID_SIZE points,
+#       otherwise local search on the lattice from the best of ACQ_N_SAMPLES random points
+ACQ_OPTIMIZER = 'continuous'
+MAX_GRID_SIZE = 100000
+ACQ_CHUNK_SIZE = 10000
+ACQ_N_SAMPLES = 1000
+ACQ_N_LOCAL_SEARCH = 5
+
+# Design of the random suggestions of the first iteration, 'uniform', 'lhs' or 'sobol'
+INIT_SAMPLE_METHOD = 'uniform'
 
 
 class UtilityFunction(object):
@@ -54,6 +74,8 @@ class UtilityFunction(object):
             warnings.simplefilter("ignore")
             mean, std = g_p.predict(x_x, return_std=True)
 
+        from scipy.stats import norm
+
         a_a = (mean - y_max - x_i)
         z_z = a_a / std
         return a_a * norm.cdf(z_z) + std * norm.pdf(z_z)
@@ -64,11 +86,113 @@ class UtilityFunction(object):
             warnings.simplefilter("ignore")
             mean, std = g_p.predict(x_x, return_std=True)
 
+        from scipy.stats import norm
+
         z_z = (mean - y_max - x_i) / std
         return norm.cdf(z_z)
 
 
-class Searcher(AbstractSearcher):
+class IncrementalGP(object):
+    """
+    Gaussian process regression whose kernel hyperparameters are optimized by GaussianProcessRegressor
+    every refit_interval fits, starting from the previous hyperparameters. Between refits the
+    hyperparameters are fixed, and new observations are appended to the Cholesky factor of the kernel matrix.
+    """
+    def __init__(self, kernel, alpha=1e-6, refit_interval=10, random_state=None):
+        from sklearn.gaussian_process import GaussianProcessRegressor
+
+        self.gp = GaussianProcessRegressor(kernel=kernel, alpha=alpha, normalize_y=False, random_state=random_state)
+        self.alpha = alpha
+        self.refit_interval = refit_interval
+        self.n_fit = 0
+        self.kernel_ = None
+        self.x_train = None
+        self.l_factor = None
+        self.alpha_ = None
+        self.y_mean = 0.0
+        self.y_std = 1.0
+
+    def fit(self, x_datas, y_datas):
+        """ Fit the gp, the observations of the previous fit are reused if x_datas starts with them
+
+        Args:
+            x_datas: Parameters
+            y_datas: Reward of Parameters
+        """
+        from scipy.linalg import cho_solve
+
+        x_datas = np.asarray(x_datas, dtype=float)
+        y_datas = np.asarray(y_datas, dtype=float)
+        self.y_mean = y_datas.mean()
+        self.y_std = y_datas.std() if y_datas.std() > 0 else 1.0
+        y_normalized = (y_datas - self.y_mean) / self.y_std
+
+        if self.kernel_ is None or self.n_fit % self.refit_interval == 0:
+            if self.kernel_ is not None:
+                # warm start the hyperparameter optimization
+                self.gp.kernel = self.kernel_
+            self.gp.fit(x_datas, y_normalized)
+            self.kernel_ = self.gp.kernel_
+            self.l_factor = self.gp.L_
+        elif self.is_appended(x_datas):
+            self.l_factor = self.append_cholesky(x_datas[len(self.x_train):])
+        else:
+            self.l_factor = self.full_cholesky(x_datas)
+        self.x_train = x_datas
+        self.alpha_ = cho_solve((self.l_factor, True), y_normalized)
+        self.n_fit += 1
+
+    def is_appended(self, x_datas):
+        n_train = len(self.x_train)
+        return len(x_datas) >= n_train and np.array_equal(x_datas[:n_train], self.x_train)
+
+    def full_cholesky(self, x_datas):
+        from scipy.linalg import cholesky
+
+        k_matrix = self.kernel_(x_datas)
+        k_matrix[np.diag_indices_from(k_matrix)] += self.alpha
+        return cholesky(k_matrix, lower=True)
+
+    def append_cholesky(self, x_new):
+        """ Append the rows of new observations to the Cholesky factor of the training observations
+
+        Args:
+            x_new: Parameters of new observations
+
+        Return:
+            l_factor: lower Cholesky factor of the kernel matrix of training and new observations
+        """
+        from scipy.linalg import cholesky, solve_triangular
+
+        if len(x_new) == 0:
+            return self.l_factor
+        k_cross = self.kernel_(self.x_train, x_new)
+        k_new = self.kernel_(x_new)
+        k_new[np.diag_indices_from(k_new)] += self.alpha
+        l_cross = solve_triangular(self.l_factor, k_cross, lower=True)
+        try:
+            l_new = cholesky(k_new - l_cross.T.dot(l_cross), lower=True)
+        except np.linalg.LinAlgError:
+            return self.full_cholesky(np.vstack([self.x_train, x_new]))
+        zeros = np.zeros((len(self.x_train), len(x_new)))
+        return np.block([[self.l_factor, zeros], [l_cross.T, l_new]])
+
+    def predict(self, x_x, return_std=False):
+        """ Predict with the fitted gp, the same as GaussianProcessRegressor.predict
+        """
+        from scipy.linalg import solve_triangular
+
+        k_trans = self.kernel_(x_x, self.x_train)
+        mean = k_trans.dot(self.alpha_) * self.y_std + self.y_mean
+        if not return_std:
+            return mean
+        v_v = solve_triangular(self.l_factor, k_trans.T, lower=True)
+        var = self.kernel_.diag(x_x) - np.einsum('ij,ij->j', v_v, v_v)
+        var = np.maximum(var, 0)
+        return mean, np.sqrt(var) * self.y_std
+
+
+class Searcher(IndexSearcher):
 
     def __init__(self, parameters_config, n_iter, n_suggestion):
         """ Init searcher
@@ -110,15 +234,37 @@ class Searcher(AbstractSearcher):
         n_iteration: number of iterations
         n_suggestion: number of suggestions to return
         """
-        AbstractSearcher.__init__(self, parameters_config, n_iter, n_suggestion)
+        IndexSearcher.__init__(self, parameters_config, n_iter, n_suggestion)
+        # The gp is created on first training, see get_gp
+        self.gp = None
 
-        gp = GaussianProcessRegressor(
-            kernel=Matern(nu=2.5),
-            alpha=1e-6,
-            normalize_y=True,
-            random_state=np.random.RandomState(1),
-        )
+    def get_gp(self):
+        """ Get the gp, create it on first use
+
+        Return:
+            gp: GaussianProcessRegressor, or IncrementalGP if SURROGATE_MODE is 'incremental'
+        """
+        if self.gp is not None:
+            return self.gp
+        from sklearn.gaussian_process.kernels import Matern
+        from sklearn.gaussian_process import GaussianProcessRegressor
+
+        if SURROGATE_MODE == 'incremental':
+            gp = IncrementalGP(
+                kernel=Matern(nu=2.5),
+                alpha=1e-6,
+                refit_interval=GP_REFIT_INTERVAL,
+                random_state=np.random.RandomState(1),
+            )
+        else:
+            gp = GaussianProcessRegressor(
+                kernel=Matern(nu=2.5),
+                alpha=1e-6,
+                normalize_y=True,
+                random_state=np.random.RandomState(1),
+            )
         self.gp = gp
+        return gp
 
     def init_param_group(self, n_suggestions):
         """ Suggest n_suggestions parameters in random form
@@ -129,8 +275,8 @@ class Searcher(AbstractSearcher):
         Return:
             next_suggestions: n_suggestions Parameters in random form
         """
-        next_suggestions = [{p_name: p_conf['coords'][random.randint(0, len(p_conf["coords"]) - 1)]
-                            for p_name, p_conf in self.parameters_config.items()} for _ in range(n_suggestions)]
+        indices = self.replace_visited(self.sample_indices(n_suggestions, INIT_SAMPLE_METHOD))
+        next_suggestions = self.indices_to_parameters(indices)
 
         return next_suggestions
 
@@ -162,17 +308,15 @@ class Searcher(AbstractSearcher):
         Return:
             gp: Gaussian process regression
         """
-        self.gp.fit(x_datas, y_datas)
+        self.get_gp().fit(x_datas, y_datas)
 
-    def random_sample(self):
-        """ Generate a random sample in the form of [value_0, value_1,... ]
+    def random_sample(self, n_samples):
+        """ Generate random samples in the form of [[value_0, value_1,... ], ...]
 
         Return:
-            sample: a random sample in the form of [value_0, value_1,... ]
+            samples: numpy.ndarray, shape (n_samples, n_params), columns follow the sorted parameter names
         """
-        sample = [p_conf['coords'][random.randint(0, len(p_conf["coords"]) - 1)] for p_name, p_conf
-                  in sorted(self.parameters_config.items(), key=lambda x: x[0])]
-        return sample
+        return self.indices_to_values(self.sample_indices(n_samples))
 
     def get_bounds(self):
         """ Get sorted parameter space
@@ -186,7 +330,7 @@ class Searcher(AbstractSearcher):
 
         _bounds = np.array(
             [_get_param_value(item[1]) for item in sorted(self.parameters_config.items(), key=lambda x: x[0])],
-            dtype=np.float
+            dtype=float
         )
         return _bounds
 
@@ -204,30 +348,101 @@ class Searcher(AbstractSearcher):
         Return:
             Return the current optimal parameters
         """
+        from scipy.optimize import minimize
+
         # Warm up with random points
-        x_tries = np.array([self.random_sample() for _ in range(int(num_warmup))])
+        x_tries = self.random_sample(int(num_warmup))
         ys = f_acq(x_tries, g_p=gp, y_max=y_max)
         x_max = x_tries[ys.argmax()]
         max_acq = ys.max()
         # Explore the parameter space more throughly
-        x_seeds = np.array([self.random_sample() for _ in range(int(num_starting_points))])
+        x_seeds = self.random_sample(int(num_starting_points))
         for x_try in x_seeds:
             # Find the minimum of minus the acquisition function
-            res = minimize(lambda x: -f_acq(x.reshape(1, -1), g_p=gp, y_max=y_max),
-                           x_try.reshape(1, -1),
+            res = minimize(lambda x: -f_acq(x.reshape(1, -1), g_p=gp, y_max=y_max)[0],
+                           x_try,
                            bounds=bounds,
                            method="L-BFGS-B")
             # See if success
             if not res.success:
                 continue
             # Store it if better than previous minimum(maximum).
-            if max_acq is None or -res.fun[0] >= max_acq:
+            if max_acq is None or -res.fun >= max_acq:
                 x_max = res.x
-                max_acq = -res.fun[0]
+                max_acq = -res.fun
         return np.clip(x_max, bounds[:, 0], bounds[:, 1])
 
+    @staticmethod
+    def score_points(f_acq, gp, y_max, points):
+        scores = f_acq(points, g_p=gp, y_max=y_max)
+        return np.where(np.isnan(scores), -np.inf, scores)
+
+    def acq_max_grid(self, f_acq, gp, y_max, excluded):
+        """ Produces the best unevaluated point of the coords lattice
+
+        Args:
+            f_acq: Acquisition function
+            gp: GaussianProcessRegressor
+            y_max: Best reward in suggestions history
+            excluded: numpy.ndarray of int, packed indices of points not to suggest, see VisitedIndex
+
+        Return:
+            Return the flat index of the current optimal point
+        """
+        shape = self.codec.shape
+        grid_size = int(np.prod(shape))
+        if grid_size <= MAX_GRID_SIZE:
+            candidates = np.setdiff1d(np.arange(grid_size), excluded)
+            best_index, best_score = None, -np.inf
+            for start in range(0, len(candidates), ACQ_CHUNK_SIZE):
+                chunk = candidates[start:start + ACQ_CHUNK_SIZE]
+                indices = np.stack(np.unravel_index(chunk, shape), axis=1)
+                scores = self.score_points(f_acq, gp, y_max, self.indices_to_values(indices))
+                if best_index is None or scores.max() > best_score:
+                    # break ties at random, the acquisition may be flat
+                    best = np.flatnonzero(scores == scores.max())
+                    best_index, best_score = chunk[self.random_state.choice(best)], scores.max()
+            return best_index
+        return self.acq_local_search(f_acq, gp, y_max, excluded)
+
+    def acq_local_search(self, f_acq, gp, y_max, excluded):
+        """ Local search on the coords lattice, started from the best random samples.
+            A step moves to the best point differing by one coord index in one parameter.
+
+        Args: see acq_max_grid
+
+        Return:
+            Return the flat index of the best point found
+        """
+        shape = np.array(self.codec.shape)
+        n_params = len(shape)
+        samples = self.sample_indices(ACQ_N_SAMPLES)
+        scores = self.score_points(f_acq, gp, y_max, self.indices_to_values(samples))
+        scores[np.isin(self.visited.pack(samples), excluded)] = -np.inf
+        order = np.argsort(-scores, kind='stable')[:ACQ_N_LOCAL_SEARCH]
+        current, current_scores = samples[order], scores[order]
+
+        moves = np.concatenate([np.eye(n_params, dtype=int), -np.eye(n_params, dtype=int)])
+        improved = np.ones(len(current), dtype=bool)
+        while improved.any():
+            neighbors = current[:, None, :] + moves[None, :, :]
+            valid = ((neighbors >= 0) & (neighbors < shape)).all(axis=2)
+            neighbors = np.clip(neighbors, 0, shape - 1).reshape(-1, n_params)
+            neighbor_scores = self.score_points(f_acq, gp, y_max, self.indices_to_values(neighbors))
+            neighbor_scores[np.isin(self.visited.pack(neighbors), excluded)] = -np.inf
+            neighbor_scores = np.where(valid, neighbor_scores.reshape(valid.shape), -np.inf)
+            best_move = neighbor_scores.argmax(axis=1)
+            best_scores = neighbor_scores[np.arange(len(current)), best_move]
+            improved = best_scores > current_scores
+            current[improved] = neighbors.reshape(len(current), -1, n_params)[improved, best_move[improved]]
+            current_scores[improved] = best_scores[improved]
+
+        best = current[current_scores.argmax()]
+        return self.visited.pack(best)[0]
+
     def parse_suggestions(self, suggestions):
-        """ Parse the parameters result
+        """ Parse the parameters result, parameters are snapped to coords, and the visited or
+            repeated ones are replaced by random unvisited parameters
 
         Args:
             suggestions: Parameters
@@ -235,22 +450,10 @@ class Searcher(AbstractSearcher):
         Return:
             suggestions: The parsed parameters
         """
-        def get_param_value(p_name, value):
-            p_coords = self.parameters_config[p_name]['coords']
-            if value in p_coords:
-                return value
-            else:
-                subtract = np.abs([p_coord - value for p_coord in p_coords])
-                min_index = np.argmin(subtract, axis=0)
-                return p_coords[min_index]
-
-        p_names = [p_name for p_name, p_conf in sorted(self.parameters_config.items(), key=lambda x: x[0])]
-        suggestions = [{p_names[index]:suggestion[index] for index in range(len(suggestion))}
-                       for suggestion in suggestions]
-
-        suggestions = [{p_name: get_param_value(p_name, value) for p_name, value in suggestion.items()}
-                       for suggestion in suggestions]
-        return suggestions
+        # columns of suggestions follow the sorted parameter names, the same as the codec
+        indices = self.parameters_to_indices(np.asarray(suggestions, dtype=float))
+        indices = self.replace_visited(indices)
+        return self.indices_to_parameters(indices)
 
     def suggest_old(self, suggestions_history, n_suggestions=1):
         """ Suggest next n_suggestion parameters, old implementation of preliminary competition.
@@ -289,8 +492,11 @@ class Searcher(AbstractSearcher):
         if (suggestions_history is None) or (len(suggestions_history) <= 0):
             next_suggestions = self.init_param_group(n_suggestions)
         else:
+            self.visited.add(self.parameters_to_indices([suggestion[0] for suggestion in suggestions_history]))
             x_datas, y_datas = self.parse_suggestions_history(suggestions_history)
             self.train_gp(x_datas, y_datas)
+            if ACQ_OPTIMIZER == 'grid':
+                return self.suggest_grid(y_datas, n_suggestions)
             _bounds = self.get_bounds()
             suggestions = []
             for index in range(n_suggestions):
@@ -311,6 +517,25 @@ class Searcher(AbstractSearcher):
 
         return next_suggestions
 
+    def suggest_grid(self, y_datas, n_suggestions):
+        """ Suggest next n_suggestion parameters with the 'grid' acquisition optimizer and the trained gp.
+            Suggestions are distinct points of the coords lattice that are not visited.
+        """
+        excluded = self.visited.visited_keys()
+        flat_indices = []
+        for index in range(n_suggestions):
+            utility_function = UtilityFunction(kind='poi', kappa=(index + 1) * 2.576, x_i=index * 20)
+            flat_index = self.acq_max_grid(
+                f_acq=utility_function.utility,
+                gp=self.gp,
+                y_max=y_datas.max(),
+                excluded=excluded,
+            )
+            excluded = np.append(excluded, flat_index)
+            flat_indices.append(flat_index)
+        suggestions = self.indices_to_values(self.visited.unpack(flat_indices))
+        return self.parse_suggestions(suggestions)
+
     def get_my_score(self, reward):
         """ Get the most trusted reward of all iterations.
 
@@ -358,6 +583,7 @@ class Searcher(AbstractSearcher):
             if iterations_of_suggestion >= MIN_TRUSTED_ITERATION:
                 cur_score = self.get_my_score(suggestion['reward'])
                 new_suggestions_history.append([suggestion["parameter"], cur_score])
+        self.update_visited(running_suggestions, suggestion_history)
         return self.suggest_old(new_suggestions_history, n_suggestions)
 
     def is_early_stop(self, iteration_number, running_suggestions, suggestion_history):
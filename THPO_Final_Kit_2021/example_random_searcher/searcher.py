@@ -1,11 +1,13 @@
 # coding=utf-8
-import random
-
 # Need to import the searcher abstract class, the following are essential
-from thpo.abstract_searcher import AbstractSearcher
+try:
+    # The judge runs the searcher with its own stock thpo, prepare_submission.sh ships index_searcher.py with it
+    from index_searcher import IndexSearcher
+except ModuleNotFoundError:
+    from thpo.index_searcher import IndexSearcher
 
 
-class Searcher(AbstractSearcher):
+class Searcher(IndexSearcher):
     searcher_name = "RandomSearcher"
 
     def __init__(self, parameters_config, n_iter, n_suggestion):
@@ -48,7 +50,7 @@ class Searcher(AbstractSearcher):
         n_iteration: number of iterations
         n_suggestion: number of suggestions to return
         """
-        AbstractSearcher.__init__(self, parameters_config, n_iter, n_suggestion)
+        IndexSearcher.__init__(self, parameters_config, n_iter, n_suggestion)
 
     def suggest_old(self, suggestion_history, n_suggestions=1):
         """ Suggest next n_suggestion parameters, old implementation of preliminary competition.
@@ -84,13 +86,8 @@ class Searcher(AbstractSearcher):
                          {'p1': 0, 'p2': 1, 'p3': 3},
                          {'p1': 2, 'p2': 2, 'p3': 2}]
         """
-        next_suggestions = []
-        for __ in range(n_suggestions):
-            next_suggest = {
-                p_name: p_conf["coords"][random.randint(0, len(p_conf["coords"]) - 1)]
-                for p_name, p_conf in self.parameters_config.items()
-            }
-            next_suggestions.append(next_suggest)
+        indices = self.replace_visited(self.sample_indices(n_suggestions))
+        next_suggestions = self.indices_to_parameters(indices)
 
         return next_suggestions
 
@@ -129,6 +126,7 @@ class Searcher(AbstractSearcher):
         new_suggestions_history = []
         for suggestion in suggestion_history:
             new_suggestions_history.append([suggestion["parameter"], suggestion['reward'][-1]['value']])
+        self.update_visited(running_suggestions, suggestion_history)
         return self.suggest_old(new_suggestions_history, n_suggestions)
 
     def is_early_stop(self, iteration_number, running_suggestions, suggestion_history):
@@ -1,6 +1,6 @@
 import sys
 sys.path.insert(0, '.')
-from thpo.data_utils import get_evaluator, get_all_parameters, get_value
+from thpo.data_utils import get_evaluator, get_all_values
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
@@ -14,13 +14,10 @@ p = plt.figure(figsize=(8,6))
 name_list = evaluator.dims  # all parameter names
 parameters_config = evaluator.parameters_config
 
+all_ms = get_all_values(evaluator, 'm')     # shape: (n_points, 14)
 for day in range(14):
     print('read day', day)
-    data = []
-    for parameter in get_all_parameters(evaluator):
-        value_name = 'm'
-        result = get_value(evaluator, parameter, day, value_name)
-        data.append(result)
+    data = all_ms[:, day]
     data = np.array(data).reshape(-1, int(np.sqrt(len(data))))
 
     print('plot day', day)
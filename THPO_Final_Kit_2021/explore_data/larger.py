@@ -1,6 +1,6 @@
 import sys
 sys.path.insert(0, '.')
-from thpo.data_utils import get_evaluator, get_all_parameters, get_value
+from thpo.data_utils import get_evaluator, get_all_values
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
@@ -12,21 +12,10 @@ evaluator = get_evaluator(path)
 name_list = evaluator.dims  # all parameter names
 parameters_config = evaluator.parameters_config
 
-last_larger = np.array([0] * 14, dtype=float)
-n = 0
-for parameter in get_all_parameters(evaluator):
-    n += 1
-    # ls = get_value(evaluator, parameter, None, 'l')
-    # us = get_value(evaluator, parameter, None, 'u')
-    ms = get_value(evaluator, parameter, None, 'm')
+ms = get_all_values(evaluator, 'm')     # shape: (n_points, 14)
+n = ms.shape[0]
 
-    last_m = get_value(evaluator, parameter, 13, 'm')
+last_m = ms[:, 13:14]
 
-    v = np.array([last_m >= m for m in ms], dtype=float)
-    last_larger += v
-
-    if n % 1000 == 0:
-        print(n)
-last_larger /= n
+last_larger = (last_m >= ms).sum(axis=0) / n
 print(last_larger)
-
@@ -6,7 +6,8 @@
 """
 import sys
 sys.path.insert(0, '.')
-from thpo.data_utils import get_evaluator, get_all_parameters, get_value
+from thpo.data_utils import get_evaluator, get_all_values, get_all_coords
+from thpo.order_analysis import order_agreement
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
@@ -18,32 +19,8 @@ evaluator = get_evaluator(path)
 name_list = evaluator.dims  # all parameter names
 parameters_config = evaluator.parameters_config
 
-def compare(d1, d2):
-    for name in name_list:
-        if d1[name] < d2[name]:
-            return -1
-        elif d1[name] > d2[name]:
-            return 1
-    return 0
-
-mean_order = np.array([0] * 14, dtype=float)
-n = 0
-for para1 in get_all_parameters(evaluator):
-    for para2 in get_all_parameters(evaluator):
-        if compare(para1, para2) >= 0:     # skip
-            continue
-        n += 1
-
-        para1_ms = get_value(evaluator, para1, None, 'm')
-        para2_ms = get_value(evaluator, para2, None, 'm')
-
-        last_order = (para1_ms[-1] <= para2_ms[-1])
-
-        v = ((np.array(para1_ms) <= np.array(para2_ms))==last_order).astype(float)
-        mean_order += v
-
-        if n % 1000 == 0:
-            print(n)
-            print(mean_order/n)
-print(n)
-print(mean_order/n)
+# pairs are oriented by parameter values in the order of name_list
+result = order_agreement(get_all_values(evaluator, 'm'), get_all_coords(evaluator))
+print(result['n_pairs'])
+print(result['agreement'])
+print('kendall tau:', result['kendall_tau'])
@@ -1,6 +1,6 @@
 import sys
 sys.path.insert(0, '.')
-from thpo.data_utils import get_evaluator, get_all_parameters, get_value, get_sorted_parameters
+from thpo.data_utils import get_evaluator, get_all_values, get_sorted_index
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
@@ -15,18 +15,18 @@ parameters_config = evaluator.parameters_config
 
 idx_list = [0, 1000, 3000, 2000, 500,
        1, 6000, 5000, 2500, 3200]
-sorted_parameters = get_sorted_parameters(evaluator)
-# for parameter in sorted_parameters:
-#     values = get_value(evaluator, parameter, None, None)
-#     print(values)
+sorted_index = get_sorted_index(evaluator)
+all_us = get_all_values(evaluator, 'u')
+all_ms = get_all_values(evaluator, 'm')
+all_ls = get_all_values(evaluator, 'l')
 
 p = plt.figure(figsize=(8.0, 4.5))
 for i, idx in enumerate(idx_list):
-    parameter = sorted_parameters[idx]
-    print(i, idx, get_value(evaluator, parameter, 13, 'm'))
-    us = get_value(evaluator, parameter, None, 'u')
-    ms = get_value(evaluator, parameter, None, 'm')
-    ls = get_value(evaluator, parameter, None, 'l')
+    point = sorted_index[idx]
+    print(i, idx, all_ms[point, 13])
+    us = all_us[point]
+    ms = all_ms[point]
+    ls = all_ls[point]
 
     ax = p.add_subplot(2, 5, i + 1)
     ax.set_ylim(-6, 4)
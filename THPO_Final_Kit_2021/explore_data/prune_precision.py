@@ -10,7 +10,8 @@
 
 import sys
 sys.path.insert(0, '.')
-from thpo.data_utils import get_evaluator, get_all_parameters, get_value
+from thpo.data_utils import get_evaluator, get_all_scores, get_sorted_index
+from thpo.prune_analysis import pairwise_threshold_stats, prune_rule_curves, UPPER_BOUND, VALUE
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
@@ -22,45 +23,33 @@ evaluator = get_evaluator(path)
 name_list = evaluator.dims  # all parameter names
 parameters_config = evaluator.parameters_config
 
-def compare(d1, d2):
-    for name in name_list:
-        if d1[name] < d2[name]:
-            return -1
-        elif d1[name] > d2[name]:
-            return 1
-    return 0
-
-para_reward = []
-para_cnt = 0
-for para in get_all_parameters(evaluator):
-    reward = get_value(evaluator, para, 13, 'm')
-    para_reward.append((para, reward))
-    para_cnt += 1
-para_reward.sort(key=lambda x: -x[1])   # maximize
-sorted_para = [para for para, reward in para_reward]
+scores = get_all_scores(evaluator)
+final = scores[:, 13, VALUE]
+sorted_index = get_sorted_index(evaluator)
 
 top_cnt = 50
 candidate_cnt = 1000
 
-prune_precision = np.array([0] * 14, dtype=float)
-valid_cnt = np.array([0] * 14, dtype=float)
-n = 0
-for running_para in sorted_para[:candidate_cnt]:
-    for target_para in sorted_para[:top_cnt]:
-        if running_para == target_para:     # skip
-            continue
-        n += 1
-
-        running_us = get_value(evaluator, running_para, None, 'u')
-        running_last_m = get_value(evaluator, running_para, 13, 'm')
-        target_last_m = get_value(evaluator, target_para, 13, 'm')
+running_idx = sorted_index[:candidate_cnt]
+target_idx = sorted_index[:top_cnt]
+target_index = np.full(candidate_cnt, -1)
+target_index[:top_cnt] = np.arange(top_cnt)
 
-        running_us = np.array(running_us)
-        valid_cnt += (running_us < target_last_m).astype(float)
-        prune_precision += ((running_us < target_last_m) & (running_last_m < target_last_m)).astype(float)
-
-        if n % 1000 == 0:
-            print(n, valid_cnt)
-            print(prune_precision/valid_cnt)
+stats = pairwise_threshold_stats(scores[running_idx, :, UPPER_BOUND], final[running_idx], final[target_idx],
+                                 target_index)
+n = stats['n_pairs']
+valid_cnt = stats['pruned'].astype(float)
+prune_precision = stats['correct'].astype(float)
 print(n, valid_cnt)
 print(prune_precision/valid_cnt)
+
+# sweep prune rules
+candidate_sizes = [100, 500, 1000]
+top_ns = [5, 10, 50]
+for rule in ['upper_bound', 'mean_rank', 'mixed']:
+    curves = prune_rule_curves(scores, final, rule, candidate_sizes, top_ns, eta=2)
+    for i, candidate_size in enumerate(candidate_sizes):
+        for j, top_n in enumerate(top_ns):
+            print('rule: %s, candidates: %d, top_n: %d' % (rule, candidate_size, top_n))
+            for key in ['precision', 'recall', 'wasted_budget']:
+                print('  %s:' % key, np.round(curves[key][i, j], 4))
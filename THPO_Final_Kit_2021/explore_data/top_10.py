@@ -1,6 +1,6 @@
 import sys
 sys.path.insert(0, '.')
-from thpo.data_utils import get_evaluator, get_all_parameters, get_value, get_sorted_parameters
+from thpo.data_utils import get_evaluator, get_all_scores, get_all_values, get_sorted_index
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
@@ -15,16 +15,19 @@ parameters_config = evaluator.parameters_config
 
 top_n = 10
 
-sorted_parameters = get_sorted_parameters(evaluator)[:top_n]
-for parameter in sorted_parameters:
-    values = get_value(evaluator, parameter, None, None)
+top_idx = get_sorted_index(evaluator)[:top_n]
+for idx in top_idx:
+    values = evaluator.score_to_list(get_all_scores(evaluator)[idx])
     print(values)
 
+all_us = get_all_values(evaluator, 'u')
+all_ms = get_all_values(evaluator, 'm')
+all_ls = get_all_values(evaluator, 'l')
 p = plt.figure()
-for i, parameter in enumerate(sorted_parameters):
-    us = get_value(evaluator, parameter, None, 'u')
-    ms = get_value(evaluator, parameter, None, 'm')
-    ls = get_value(evaluator, parameter, None, 'l')
+for i, idx in enumerate(top_idx):
+    us = all_us[idx]
+    ms = all_ms[idx]
+    ls = all_ls[idx]
 
     ax = p.add_subplot(2, 5, i + 1)
     plt.plot(us, color='b')
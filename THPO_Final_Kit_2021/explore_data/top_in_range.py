@@ -1,6 +1,6 @@
 import sys
 sys.path.insert(0, '.')
-from thpo.data_utils import get_evaluator, get_all_parameters, get_value, get_sorted_parameters
+from thpo.data_utils import get_evaluator, get_all_values, get_sorted_index
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
@@ -14,30 +14,19 @@ parameters_config = evaluator.parameters_config
 
 top_n = 100
 
-last_in_range = np.array([0] * 14, dtype=float)
-both_in_range = np.array([0] * 14, dtype=float)
-n = 0
-for parameter in get_sorted_parameters(evaluator)[:top_n]:
-    n += 1
-    ls = get_value(evaluator, parameter, None, 'l')
-    us = get_value(evaluator, parameter, None, 'u')
+top_idx = get_sorted_index(evaluator)[:top_n]
+# shape: (top_n, 14)
+ls = get_all_values(evaluator, 'l')[top_idx]
+us = get_all_values(evaluator, 'u')[top_idx]
+ms = get_all_values(evaluator, 'm')[top_idx]
+n = ms.shape[0]
 
-    last_m = get_value(evaluator, parameter, 13, 'm')
-    last_l = get_value(evaluator, parameter, 13, 'l')
-    last_u = get_value(evaluator, parameter, 13, 'u')
+last_m = ms[:, 13:14]
+last_l = ls[:, 13:14]
+last_u = us[:, 13:14]
 
-    v = np.array([l<=last_m<=u for l, u in zip(ls, us)], dtype=float)
-    last_in_range += v
-
-    v1 = np.array([l<=last_u<=u for l, u in zip(ls, us)], dtype=float)
-    v2 = np.array([l <= last_l <= u for l, u in zip(ls, us)], dtype=float)
-    v3 = ((v1+v2) == 2).astype(float)
-    both_in_range += v3
-
-    if n % 1000 == 0:
-        print(n)
-last_in_range /= n
+last_in_range = ((ls <= last_m) & (last_m <= us)).sum(axis=0) / n
 print(last_in_range)
 
-both_in_range /= n
+both_in_range = ((ls <= last_u) & (last_u <= us) & (ls <= last_l) & (last_l <= us)).sum(axis=0) / n
 print(both_in_range)
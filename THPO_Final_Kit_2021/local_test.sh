@@ -23,6 +23,7 @@ command -v python3 >/dev/null 2>&1 || (echo err:python3 is not found, please ins
 # SEARCHER="example_random_searcher"
 
 # Run searcher in all dataset
+# Add "-m warm" to run repeats in a warm worker process per dataset instead of a python process per repeat
 python3 main.py -o $SEARCHER -d $DATASET -i $N_ITERATION -s $N_SUGGESTION -r $N_REPEAT
 
 # Test bayesian optimization
@@ -8,6 +8,11 @@ import numpy as np
 from thpo.abstract_searcher import AbstractSearcher
 from thpo.run_search import run_search
 from thpo.reward_calculation import calculate_reward
+from thpo.eval_cache import load_stats
+import thpo.chunk_store as chunk_store
+from thpo.phase_timer import load_summary, format_summary
+import thpo.profiler as profiler
+import thpo.import_report as import_report
 import thpo.common as common
 
 
@@ -68,6 +73,44 @@ def experiment(args):
     for i, func_name in enumerate(eva_func_list):
         print("func:", func_name, "mean:", course_result["mean_reward"][i],
               "normed mean:", course_result["normed_mean"][i])
+    if args[common.CmdArgs.eval_cache] != common.EVAL_CACHE_NONE:
+        print("\n========================= evaluation cache ==========================\n")
+        for func_name in eva_func_list:
+            stats = load_stats(args[common.CmdArgs.result_root], func_name)
+            if stats is not None:
+                print("func:", func_name, "hits:", stats["hits"], "misses:", stats["misses"],
+                      "hit rate: %.4f" % stats["hit_rate"])
+    if args[common.CmdArgs.eval_backend] == common.EVAL_BACKEND_CHUNKED:
+        print("\n=========================== chunk cache ============================\n")
+        for func_name in eva_func_list:
+            stats = chunk_store.load_stats(args[common.CmdArgs.result_root], func_name)
+            if stats is not None:
+                print("func:", func_name, "hits:", stats["hits"], "misses:", stats["misses"],
+                      "hit rate: %.4f" % stats["hit_rate"], "read: %.1f MB" % (stats["read_bytes"] / 1e6),
+                      "peak resident: %.1f MB" % (stats["peak_resident_bytes"] / 1e6),
+                      "max rss: %.1f MB" % (stats["max_rss"] / 1e6))
+    summaries = []
+    for func_name in eva_func_list:
+        summary = load_summary(args[common.CmdArgs.result_root], func_name, args[common.CmdArgs.n_repeat])
+        if summary is not None:
+            summaries.append((func_name, summary))
+    if len(summaries) > 0:
+        print("\n================== phase seconds per repeat ======================\n")
+        print(format_summary(summaries))
+    if args[common.CmdArgs.profile] == common.PROFILE_SAMPLE:
+        searcher_name = profiler.get_searcher_name(args[common.CmdArgs.searcher_root])
+        profile_path = profiler.get_profile_path(args[common.CmdArgs.result_root], searcher_name)
+        if os.path.exists(profile_path):
+            print("\n===================== profile self samples =======================\n")
+            print("merged profile:", profile_path)
+            for frame, count, fraction in profiler.top_frames(profiler.load_collapsed(profile_path)):
+                print("%6d %6.2f%% %s" % (count, fraction * 100, frame))
+    report = None
+    if args[common.CmdArgs.import_report] == common.IMPORT_REPORT_ON:
+        report = import_report.load_report(args[common.CmdArgs.result_root])
+    if report is not None:
+        print("\n========================== import time ===========================\n")
+        print(import_report.format_report(report))
     print("\n============================ fianl score ============================\n")
     print(args[common.CmdArgs.searcher_root], "final score: ", final_score)
     print("\n=====================================================================\n")
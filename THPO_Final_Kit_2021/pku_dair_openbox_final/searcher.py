@@ -1,6 +1,7 @@
 # coding=utf-8
 import os
-NUM_THREADS = "2"
+# Threads per worker are given by the harness in THPO_NUM_THREADS, 2 if it is not set
+NUM_THREADS = os.environ.get("THPO_NUM_THREADS", "2")
 os.environ["OMP_NUM_THREADS"] = NUM_THREADS         # export OMP_NUM_THREADS=1
 os.environ["OPENBLAS_NUM_THREADS"] = NUM_THREADS    # export OPENBLAS_NUM_THREADS=1
 os.environ["MKL_NUM_THREADS"] = NUM_THREADS         # export MKL_NUM_THREADS=1
@@ -8,7 +9,11 @@ os.environ["VECLIB_MAXIMUM_THREADS"] = NUM_THREADS  # export VECLIB_MAXIMUM_THRE
 os.environ["NUMEXPR_NUM_THREADS"] = NUM_THREADS     # export NUMEXPR_NUM_THREADS=1
 
 # Need to import the searcher abstract class, the following are essential
-from thpo.abstract_searcher import AbstractSearcher
+try:
+    # The judge runs the searcher with its own stock thpo, prepare_submission.sh ships index_searcher.py with it
+    from index_searcher import IndexSearcher
+except ModuleNotFoundError:
+    from thpo.index_searcher import IndexSearcher
 
 import time
 import numpy as np
@@ -23,7 +28,7 @@ N_ITERATION = 140
 CONFIDENCE_N_ITERATION = 14
 
 
-class Searcher(AbstractSearcher):
+class Searcher(IndexSearcher):
     searcher_name = "OpenBoxSearcher"
 
     def __init__(self, parameters_config, n_iter, n_suggestion):
@@ -66,9 +71,7 @@ class Searcher(AbstractSearcher):
         n_iteration: number of iterations
         n_suggestion: number of suggestions to return
         """
-        AbstractSearcher.__init__(self, parameters_config, n_iter, n_suggestion)
-
-        self.all_configs = set()
+        IndexSearcher.__init__(self, parameters_config, n_iter, n_suggestion)
 
         # hyper-parameters of Searcher
         self.hps = dict(
@@ -87,6 +90,13 @@ class Searcher(AbstractSearcher):
 
         self.impute_value = None
 
+        # Persistent history of the advisor, updated incrementally by update_history_container.
+        # The i-th item of history_configs and history_values is for suggestion_history[i]
+        self.history_container = HistoryContainer('thpo')
+        self.history_configs = []
+        self.history_values = []    # observed value, None if the suggestion is not in history_container
+        self.history_impute_value = None    # impute value used by history_values
+
         self.config_space = self.get_config_space(parameters_config)
         self.advisor = SyncBatchAdvisor(
             config_space=self.config_space,
@@ -115,9 +125,7 @@ class Searcher(AbstractSearcher):
         Parameter: a dict in the form of {name:value, name:value, ...}. for example:
                             {'p1': 0, 'p2': 0, 'p3': 0}
         """
-        para_dict = dict()
-        for name, v in parameter.items():
-            para_dict[name] = self.parameters_config[name]['coords'].index(v)
+        para_dict = dict(zip(self.codec.names, self.codec.encode(parameter)))
         config = get_config_from_dict(para_dict, self.config_space)
         return config
 
@@ -137,6 +145,44 @@ class Searcher(AbstractSearcher):
             history_container.update_observation(observation)
         return history_container
 
+    def update_history_observation(self, config, value):
+        if value is None:
+            return
+        perf = -value  # maximize reward -> minimize perf
+        observation = Observation(config=config, objs=[perf])
+        self.history_container.update_observation(observation)
+
+    def update_history_container(self, suggestion_history):
+        """ Update self.history_container with the suggestions new in suggestion_history
+
+        suggestion_history only grows and its suggestions never change, so a suggestion is identified by
+        its position. Values of old suggestions only change when the impute value is set, then the
+        container is rebuilt to keep the order of suggestion_history, the same as parse_suggestion_history_old.
+
+        Args:
+            suggestion_history: a list of historical suggestion parameters and rewards, see suggest
+        """
+        n_old = len(self.history_values)
+        rebuild = False
+        if self.impute_value != self.history_impute_value:
+            self.history_impute_value = self.impute_value
+            for i in range(n_old):
+                value = self.get_impute_value(suggestion_history[i])
+                if value != self.history_values[i]:
+                    self.history_values[i] = value
+                    rebuild = True
+        if rebuild:
+            self.history_container = HistoryContainer('thpo')
+            for config, value in zip(self.history_configs, self.history_values):
+                self.update_history_observation(config, value)
+
+        for suggestion in suggestion_history[n_old:]:
+            config = self.convert_parameter_to_config(suggestion["parameter"])
+            value = self.get_impute_value(suggestion)
+            self.history_configs.append(config)
+            self.history_values.append(value)
+            self.update_history_observation(config, value)
+
     def suggest_old(self, suggestion_history, n_suggestions=1):
         """ Suggest next n_suggestion parameters, old implementation of preliminary competition.
 
@@ -272,18 +318,16 @@ class Searcher(AbstractSearcher):
             print('iteration_number=%d. remain=%d. no suggest.' % (iteration_number, remain_evaluation_iteration))
             return []
 
-        new_suggestions_history = []
-        self.all_configs = set()
-        for suggestion in suggestion_history:
-            value = self.get_impute_value(suggestion)
-            if value is not None:
-                new_suggestions_history.append([suggestion["parameter"], value])
-            self.all_configs.add(self.convert_parameter_to_config(suggestion["parameter"]))
-
-        for suggestion in running_suggestions:
-            self.all_configs.add(self.convert_parameter_to_config(suggestion["parameter"]))
+        self.update_history_container(suggestion_history)
+        self.update_visited(running_suggestions, suggestion_history)
 
-        return self.suggest_old(new_suggestions_history, n_suggestions)
+        next_configs = self.advisor.get_suggestions(n_suggestions, self.history_container)
+        # running and early stopped suggestions are not in the history container, so the advisor
+        # may suggest them again, replace them and repeated ones by random unvisited suggestions
+        indices = [[conf.get_dictionary()[name] for name in self.codec.names] for conf in next_configs]
+        indices = self.replace_visited(np.array(indices, dtype=np.int64).reshape(-1, len(self.codec.names)))
+        next_suggestions = self.indices_to_parameters(indices)
+        return next_suggestions
 
     def is_early_stop(self, iteration_number, running_suggestions, suggestion_history):
         """ Decide whether to stop the running suggested parameter experiment.
@@ -0,0 +1,43 @@
+# coding=utf-8
+""" Parity of the numpy and chunked backends with the xarray backend, see thpo/backend_parity.py
+"""
+import os
+import sys
+
+import pytest
+
+KIT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, KIT_ROOT)
+import thpo.common as common
+from thpo.backend_parity import check_parity
+from thpo.evaluate_function import EvaluateFunction
+
+DATA_ROOT = os.path.join(KIT_ROOT, "input")
+
+
+def get_data_path(data_name):
+    path = os.path.join(DATA_ROOT, data_name)
+    if not os.path.exists(path):
+        pytest.skip("data set %s is not in %s" % (data_name, DATA_ROOT))
+    return path
+
+
+@pytest.mark.parametrize("data_name", ["data-2", "data-30"])
+def test_backend_parity(data_name):
+    assert check_parity(get_data_path(data_name)) == []
+
+
+@pytest.mark.parametrize("backend", [common.EVAL_BACKEND_XARRAY, common.EVAL_BACKEND_NUMPY])
+def test_explicit_backend_decodes_json(backend):
+    path = get_data_path("data-30")
+    eva = EvaluateFunction(path, 100, backend)
+    # a binary dataset next to the json dataset is only used by the auto backend
+    assert eva.header is None or "offset" not in eva.header
+
+
+def test_auto_backend_uses_binary():
+    path = get_data_path("data-30")
+    if not os.path.exists(path + ".bin"):
+        pytest.skip("no binary dataset next to " + path)
+    eva = EvaluateFunction(path, 100, common.EVAL_BACKEND_AUTO)
+    assert "offset" in eva.header
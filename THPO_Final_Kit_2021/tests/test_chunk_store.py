@@ -0,0 +1,68 @@
+# coding=utf-8
+""" Streaming conversion of json datasets to chunked datasets, see thpo/chunk_store.py
+"""
+import os
+import sys
+import json
+import tracemalloc
+
+import numpy as np
+import pytest
+
+KIT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, KIT_ROOT)
+from thpo import chunk_store, data_store
+
+PARAMS = ["p1", "p2", "p3", "p4"]
+N_COORDS = 12
+
+
+def write_dataset(path, json_dims, reversed_dims):
+    """ Write a json dataset of a random value tensor, "data" follows json_dims and the labels of
+        reversed_dims are in the reverse order of "coords"
+
+    Returns:
+        values: numpy.ndarray, the value tensor
+    """
+    random_state = np.random.RandomState(0)
+    data_dims = PARAMS + ["iters", "value"]
+    values = np.round(random_state.uniform(-1.0, 1.0, [N_COORDS] * len(PARAMS) + [14, 3]), 3)
+    values[0, 1, 2, 3, 4, 1] = np.nan
+    attrs = {"dims": PARAMS, "baseline": {}}
+    coords = {}
+    data = values
+    for axis, dim in enumerate(PARAMS):
+        attrs[dim] = {"parameter_name": dim, "coords": [float(c) for c in range(N_COORDS)]}
+        labels = attrs[dim]["coords"]
+        if dim in reversed_dims:
+            labels = labels[::-1]
+            data = np.flip(data, axis)
+        coords[dim] = {"dims": [dim], "data": labels}
+    data = data.transpose([data_dims.index(dim) for dim in json_dims])
+    ds_json = {"dims": json_dims, "attrs": attrs, "data": data.tolist(), "coords": coords, "name": "test"}
+    with open(path, "w") as f:
+        json.dump(ds_json, f)
+    return values
+
+
+@pytest.mark.parametrize("json_dims,reversed_dims", [
+    (PARAMS + ["iters", "value"], []),
+    (["iters", "p2", "p1", "value", "p4", "p3"], ["p3"]),
+])
+def test_convert_with_small_memory(json_dims, reversed_dims, tmp_path):
+    path = str(tmp_path / "data")
+    values = write_dataset(path, json_dims, reversed_dims)
+    tracemalloc.start()
+    try:
+        out_path = chunk_store.convert(path, chunk_points=64, block_size=1 << 14)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # a row of chunks along the first parameter axis is a quarter of the tensor
+    assert peak < values.nbytes / 4
+    store = chunk_store.ChunkStore(out_path, 0)
+    assert np.array_equal(np.asarray(store), values, equal_nan=True)
+    with open(path, "r") as f:
+        _, decoded = data_store.decode_dataset(json.load(f))
+    assert np.array_equal(decoded, values, equal_nan=True)
+    assert [name for name in os.listdir(str(tmp_path)) if name.endswith(".tmp")] == []
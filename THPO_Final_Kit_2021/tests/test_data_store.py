@@ -0,0 +1,79 @@
+# coding=utf-8
+""" Loading of quantized binary and chunked datasets, see thpo/data_store.py and thpo/chunk_store.py
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+KIT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, KIT_ROOT)
+import thpo.common as common
+from thpo import chunk_store, data_store
+from thpo.data_utils import get_all_scores
+from thpo.evaluate_function import EvaluateFunction
+
+DATA_ROOT = os.path.join(KIT_ROOT, "input")
+
+
+@pytest.fixture(scope="module")
+def int16_dataset(tmp_path_factory):
+    """ data-30 with an int16 binary dataset and an int16 chunked dataset next to it
+    """
+    source = os.path.join(DATA_ROOT, "data-30")
+    if not os.path.exists(source):
+        pytest.skip("data set data-30 is not in %s" % DATA_ROOT)
+    path = str(tmp_path_factory.mktemp("int16") / "data-30")
+    os.symlink(source, path)
+    data_store.convert(path, dtype="int16")
+    chunk_store.convert(path, dtype="int16")
+    return path
+
+
+def test_quantized_binary_is_opt_in(int16_dataset):
+    binary_path = data_store.get_binary_path(int16_dataset)
+    assert data_store.find_binary_file(int16_dataset) is None
+    assert data_store.find_binary_file(int16_dataset, quantized=True) == binary_path
+    assert data_store.find_binary_file(binary_path) == binary_path
+    # the auto backend decodes the json dataset instead of the int16 one
+    eva = EvaluateFunction(int16_dataset, 100, common.EVAL_BACKEND_AUTO)
+    assert isinstance(eva.values, np.ndarray)
+    eva = EvaluateFunction(int16_dataset, 100, common.EVAL_BACKEND_AUTO, quantized=True)
+    assert isinstance(eva.values, data_store.QuantizedTensor)
+
+
+def test_quantized_chunks_are_opt_in(int16_dataset):
+    chunk_path = chunk_store.get_chunk_path(int16_dataset)
+    assert chunk_store.find_chunk_file(int16_dataset) is None
+    assert chunk_store.find_chunk_file(int16_dataset, quantized=True) == chunk_path
+    assert chunk_store.find_chunk_file(chunk_path) == chunk_path
+    with pytest.raises(AssertionError, match="--storage quantized"):
+        EvaluateFunction(int16_dataset, 100, common.EVAL_BACKEND_CHUNKED)
+    eva = EvaluateFunction(int16_dataset, 100, common.EVAL_BACKEND_CHUNKED, quantized=True)
+    assert eva.values.quantization is not None
+
+
+def test_quantized_scores(int16_dataset):
+    reference = get_all_scores(EvaluateFunction(int16_dataset, 100, common.EVAL_BACKEND_NUMPY))
+    eva = EvaluateFunction(int16_dataset, 100, common.EVAL_BACKEND_AUTO, quantized=True)
+    scores = get_all_scores(eva)
+    assert scores.shape == reference.shape
+    assert np.array_equal(np.isnan(scores), np.isnan(reference))
+    assert np.nanmax(np.abs(scores - reference)) <= eva.header["quantization"]["max_abs_error"]
+
+
+def test_read_version_1_header(tmp_path):
+    path = str(tmp_path / "data.bin")
+    data_store.write_binary(path, "data", {"dims": ["p1"]}, ["p1", "iters", "value"], np.zeros([2, 14, 3]))
+    with open(path, "rb") as f:
+        content = f.read()
+    # a version 1 header has no "quantization", blanks keep the header length and the offset
+    quantization = b', "quantization": null'
+    assert b'"version": 2' in content and quantization in content
+    content = content.replace(b'"version": 2', b'"version": 1').replace(quantization, b" " * len(quantization))
+    with open(path, "wb") as f:
+        f.write(content)
+    header, values = data_store.load_binary(path)
+    assert header["version"] == 1 and header["quantization"] is None
+    assert np.array_equal(values, np.zeros([2, 14, 3]))
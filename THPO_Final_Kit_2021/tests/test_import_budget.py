@@ -0,0 +1,20 @@
+# coding=utf-8
+""" Cold start budget of the harness and the example searchers, see thpo/import_report.py
+"""
+import os
+import sys
+
+import pytest
+
+KIT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, KIT_ROOT)
+from thpo import import_report
+
+
+@pytest.mark.parametrize("searcher_root", ["example_bayesian_optimization", "example_random_searcher"])
+def test_import_budget(searcher_root, monkeypatch):
+    # the import script and the searcher directory are relative to the kit root, like in run_search
+    monkeypatch.chdir(KIT_ROOT)
+    report = import_report.measure_import_time(searcher_root)
+    cold_start = report["harness"] + report["searcher"]
+    assert cold_start <= import_report.COLD_START_BUDGET, import_report.format_report(report)
@@ -0,0 +1,46 @@
+# coding=utf-8
+""" Submitted searchers run with the stock thpo of the judge, see prepare_submission.sh
+"""
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+KIT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the judge provides thpo with AbstractSearcher only, and imports searcher.py like run_search_one_time
+JUDGE_SCRIPT = """
+import sys
+import importlib
+sys.path.append(".")
+sys.path.append("upload")
+searcher_class = importlib.import_module(".searcher", "upload").Searcher
+config = {name: {"parameter_name": name, "parameter_type": 1, "double_max_value": 2.0, "double_min_value": 0.0,
+                 "double_step": 1.0, "coords": [0.0, 1.0, 2.0]} for name in ["p1", "p2"]}
+searcher = searcher_class(config, 140, 5)
+suggestions = searcher.suggest(1, [], [], 5)
+assert len(set(tuple(sorted(s.items())) for s in suggestions)) == 5, suggestions
+"""
+
+
+def get_shared_modules():
+    with open(os.path.join(KIT_ROOT, "prepare_submission.sh"), "r") as f:
+        return re.search(r'SHARED_MODULES="([^"]*)"', f.read()).group(1).split()
+
+
+@pytest.mark.parametrize("searcher_root", ["example_random_searcher", "example_bayesian_optimization"])
+def test_submission_with_stock_thpo(searcher_root, tmp_path):
+    thpo_root = tmp_path / "thpo"
+    thpo_root.mkdir()
+    for name in ["__init__.py", "abstract_searcher.py"]:
+        shutil.copy(os.path.join(KIT_ROOT, "thpo", name), str(thpo_root))
+    upload = str(tmp_path / "upload")
+    shutil.copytree(os.path.join(KIT_ROOT, searcher_root), upload, ignore=shutil.ignore_patterns("__pycache__"))
+    for module in get_shared_modules():
+        shutil.copy(os.path.join(KIT_ROOT, module), upload)
+    status = subprocess.run([sys.executable, "-c", JUDGE_SCRIPT], cwd=str(tmp_path),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    assert status.returncode == 0, status.stderr.decode()
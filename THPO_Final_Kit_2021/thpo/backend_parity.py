@@ -0,0 +1,121 @@
+# coding=utf-8
+"""
+Parity check of the json dataset decoders of EvaluateFunction (see common.EVAL_BACKENDS).
+
+Every dataset is loaded from its json file by the xarray and the numpy backends, and from a chunked
+dataset converted from its json file (see chunk_store.py) by the chunked backend. The value tensors,
+the metadata and the results of the public API on random points (on and off the coords) must be
+identical to the ones of the xarray backend.
+
+Usage:
+    python3 thpo/backend_parity.py -dr ./input/ -d data-2 data-30
+exits with 1 if any dataset differs. tests/test_backend_parity.py runs the check on data-2 and data-30.
+"""
+import os
+import sys
+import copy
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.append(".")
+import thpo.common as common
+import thpo.chunk_store as chunk_store
+from thpo.evaluate_function import EvaluateFunction
+
+
+def random_parameters(parameters_config, n_points, random_state):
+    """ Random parameters, half of them on the coords and half of them uniform in the bounds
+    """
+    parameters = []
+    for i in range(n_points):
+        parameter = {}
+        for name, config in parameters_config.items():
+            coords = config["coords"]
+            if i % 2 == 0:
+                parameter[name] = coords[random_state.randint(len(coords))]
+            else:
+                parameter[name] = random_state.uniform(min(coords), max(coords))
+        parameters.append(parameter)
+    return parameters
+
+
+def compare_backends(eva_a, eva_b, parameters):
+    """ Compare two evaluation functions of the same dataset
+
+    Args:
+        eva_a: EvaluateFunction
+        eva_b: EvaluateFunction
+        parameters: list of suggestion points
+
+    Returns:
+        mismatches: list of names of the differing items
+    """
+    mismatches = []
+
+    def check(name, equal):
+        if not equal:
+            mismatches.append(name)
+
+    check("values", eva_a.values.shape == eva_b.values.shape and all(
+        np.array_equal(eva_a.values[i], eva_b.values[i]) for i in np.ndindex(*eva_a.values.shape[:-2])))
+    check("dims", list(eva_a.dims) == list(eva_b.dims))
+    check("name", eva_a.get_name() == eva_b.get_name())
+    check("parameters_config", eva_a.get_param_config() == eva_b.get_param_config())
+    check("get_baseline", all(np.array_equal(a, b) for a, b in zip(eva_a.get_baseline(), eva_b.get_baseline())))
+    check("get_init_score", eva_a.get_init_score() == eva_b.get_init_score())
+    check("evaluate", all(np.array_equal(eva_a.evaluate(p), eva_b.evaluate(p)) for p in parameters))
+    check("evaluate_many", np.array_equal(eva_a.evaluate_many(parameters), eva_b.evaluate_many(parameters)))
+    check("get_paramter_score", all(eva_a.get_paramter_score(p) == eva_b.get_paramter_score(p)
+                                    for p in parameters[:100]))
+    suggestions = [{"parameter": p, "reward": [{}] * (i % 14)} for i, p in enumerate(parameters)]
+    check("evaluate_final", eva_a.evaluate_final(copy.deepcopy(suggestions)) ==
+          eva_b.evaluate_final(copy.deepcopy(suggestions)))
+    return mismatches
+
+
+def check_parity(path, n_points=1000, seed=0):
+    """ Compare the numpy and the chunked backends with the xarray backend on a json dataset
+
+    Args:
+        path: file path of json dataset, a binary or chunked dataset next to it is not used
+        n_points: number of random points
+        seed: random seed
+
+    Returns:
+        mismatches: list of "backend: item" of the differing items, empty if the backends agree
+    """
+    # A link without a binary dataset next to it, so that the json dataset is decoded
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        link = os.path.join(tmp_dir, os.path.basename(path))
+        os.symlink(os.path.abspath(path), link)
+        eva_xr = EvaluateFunction(link, 100, common.EVAL_BACKEND_XARRAY)
+        eva_np = EvaluateFunction(link, 100, common.EVAL_BACKEND_NUMPY)
+        chunk_store.convert(link, chunk_points=256)
+        eva_ck = EvaluateFunction(link, 100, common.EVAL_BACKEND_CHUNKED, 1024 * 1024)
+
+        parameters = random_parameters(eva_xr.parameters_config, n_points, np.random.RandomState(seed))
+        mismatches = []
+        for backend, eva in [(common.EVAL_BACKEND_NUMPY, eva_np), (common.EVAL_BACKEND_CHUNKED, eva_ck)]:
+            mismatches += ["%s: %s" % (backend, name) for name in compare_backends(eva_xr, eva, parameters)]
+        if not (np.array_equal(eva_xr.da.values, eva_np.da.values) and eva_xr.da.dims == eva_np.da.dims):
+            mismatches.append("%s: da" % common.EVAL_BACKEND_NUMPY)
+        eva_ck.values.close()
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="parity check of the json dataset decoders of EvaluateFunction")
+    parser.add_argument("-dr", "--data-root", dest="data_root", type=str, default="./input/",
+                        help="data set directory")
+    parser.add_argument("-d", "--data", dest="data", required=True, type=str, nargs="+",
+                        help="data set file name")
+    parser.add_argument("-n", "--n-points", dest="n_points", type=int, default=1000,
+                        help="number of random points")
+    args = parser.parse_args()
+    n_failed = 0
+    for data_name in args.data:
+        mismatches = check_parity(args.data_root + data_name, args.n_points)
+        print(data_name, "parity:", "ok" if len(mismatches) == 0 else "mismatch " + ", ".join(mismatches))
+        n_failed += len(mismatches) > 0
+    sys.exit(1 if n_failed > 0 else 0)
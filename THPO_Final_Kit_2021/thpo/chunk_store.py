@@ -0,0 +1,676 @@
+# coding=utf-8
+"""
+Chunked dataset format for value tensors larger than memory, loaded by the chunked backend of EvaluateFunction.
+
+The value tensor (see data_store.py) is split along the parameter axes into hyper-rectangular chunks of
+chunk_shape points, every chunk keeps the whole (14, 3) scores of its points and is compressed by zlib.
+A chunked dataset file is laid out as:
+    MAGIC (8 bytes) | header length (uint64) | header (json, utf-8) | chunk ... chunk | index | index offset (uint64)
+Chunks are in C order of the chunk grid, and the index holds (offset, length) of every chunk as uint64.
+Chunks at the upper end of an axis are cut to the lattice. The header carries "name", "dims", "data_dims",
+"attrs", "shape", "dtype", "chunk_shape", "compression" and "quantization", chunks are stored as float64 or
+quantized to float32 or int16 like binary datasets (see data_store.get_quantization). Chunks stay quantized
+in the cache and are dequantized when indexed.
+
+convert streams a json dataset into a chunked dataset: the text of "data" is read block by block into a
+temporary raw float64 file next to the output, which is memory-mapped and compressed chunk by chunk, so only
+a block of text and a chunk are kept in memory. A json dataset whose "dims" or "coords" are not in the order of
+the value tensor is reordered chunk by chunk the same way.
+
+ChunkStore is indexed like the value tensor, and reads the chunks touched by an index through a LRU cache
+bounded by the bytes of decompressed chunks. Its hits, misses and resident bytes of every repeat are
+appended to a stats file in the result directory, see save_stats.
+
+Usage:
+    python3 thpo/chunk_store.py -dr ./input/ -d data-30 data-2 --chunk-points 1024 --dtype int16
+"""
+import os
+import json
+import zlib
+import struct
+import argparse
+import collections
+import numpy as np
+
+try:
+    import data_store
+except ModuleNotFoundError:
+    from . import data_store
+
+MAGIC = b"THPOCHK\x00"
+VERSION = 1
+CHUNK_SUFFIX = ".chunks"
+STATS_SUFFIX = ".chunk_stats"
+COMPRESSION = "zlib"
+DEFAULT_CHUNK_POINTS = 1024
+DEFAULT_LEVEL = 6
+BLOCK_SIZE = 1 << 20
+_LENGTH_FORMAT = "<Q"
+_LENGTH_SIZE = struct.calcsize(_LENGTH_FORMAT)
+_INDEX_DTYPE = np.dtype([("offset", "<u8"), ("length", "<u8")])
+_BRACKETS_TO_SPACES = str.maketrans("[]", "  ")
+
+
+def get_chunk_path(path):
+    """ Get the chunked dataset path of a json dataset
+
+    Args:
+        path: file path of json dataset
+
+    Returns:
+        chunk_path: file path of chunked dataset
+    """
+    return path + CHUNK_SUFFIX
+
+
+def is_chunk_file(path):
+    """ Test whether path is a chunked dataset file
+    """
+    if not os.path.isfile(path):
+        return False
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def find_chunk_file(path, quantized=False):
+    """ Find the chunked dataset to load for a dataset path
+
+    Args:
+        path: file path of a json dataset or of a chunked dataset
+        quantized: whether a chunked dataset next to a json dataset may be quantized
+
+    Returns:
+        chunk_path: file path of chunked dataset, or None if there is no usable chunked dataset.
+            A chunked dataset older than its json dataset is ignored, so is a quantized one unless quantized is True.
+            A chunked dataset path is always returned.
+    """
+    if is_chunk_file(path):
+        return path
+    chunk_path = get_chunk_path(path)
+    if not is_chunk_file(chunk_path):
+        return None
+    if os.path.exists(path) and os.path.getmtime(path) > os.path.getmtime(chunk_path):
+        return None
+    if not quantized and read_header(chunk_path).get("quantization") is not None:
+        return None
+    return chunk_path
+
+
+def read_header(path):
+    """ Read the header of a chunked dataset without touching its chunks
+
+    Args:
+        path: file path of chunked dataset
+
+    Returns:
+        header: dict type, see module docstring
+    """
+    with open(path, "rb") as f:
+        prefix = f.read(len(MAGIC) + _LENGTH_SIZE)
+        assert prefix[:len(MAGIC)] == MAGIC, "not a chunked dataset: " + path
+        header_len, = struct.unpack(_LENGTH_FORMAT, prefix[len(MAGIC):])
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    assert header["version"] == VERSION, "unsupported chunked dataset version %s" % header["version"]
+    assert header["compression"] == COMPRESSION, "unsupported compression " + header["compression"]
+    return header
+
+
+def default_chunk_shape(lattice_shape, chunk_points=DEFAULT_CHUNK_POINTS):
+    """ Get a chunk shape of about chunk_points points with the same edge on every parameter axis
+
+    Args:
+        lattice_shape: number of coords of every parameter
+        chunk_points: number of points of a chunk
+
+    Returns:
+        chunk_shape: tuple of int, edges of a chunk, cut to the lattice
+    """
+    edge = max(1, int(round(chunk_points ** (1.0 / len(lattice_shape)))))
+    return tuple(min(edge, int(n)) for n in lattice_shape)
+
+
+class JsonReader():
+    """ Sequential reader of a json object from a text file, read block by block
+
+    Small values are parsed by json.loads, large arrays are passed to the caller block by block, see array_blocks.
+    """
+    def __init__(self, f, block_size=BLOCK_SIZE):
+        self.f = f
+        self.block_size = block_size
+        self.buf = ""
+        self.pos = 0
+
+    def fill(self):
+        data = self.f.read(self.block_size)
+        if not data:
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while self.pos >= len(self.buf):
+            if not self.fill():
+                return ""
+        return self.buf[self.pos]
+
+    def skip_ws(self):
+        c = self.peek()
+        while c and c in " \t\r\n":
+            self.pos += 1
+            c = self.peek()
+        return c
+
+    def expect(self, expected):
+        c = self.skip_ws()
+        assert c == expected, "expect %r, got %r" % (expected, c)
+        self.pos += 1
+
+    def read_raw_string(self):
+        """ Read a json string with its quotes and escapes
+        """
+        chars = [self.peek()]
+        self.pos += 1
+        while True:
+            c = self.peek()
+            assert c, "unterminated string"
+            chars.append(c)
+            self.pos += 1
+            if c == "\\":
+                chars.append(self.peek())
+                self.pos += 1
+            elif c == '"':
+                return "".join(chars)
+
+    def read_value(self):
+        """ Read a small json value
+        """
+        chars = []
+        depth = 0
+        self.skip_ws()
+        while True:
+            c = self.peek()
+            if c == '"':
+                chars.append(self.read_raw_string())
+                continue
+            if not c or (depth == 0 and c in ",}]"):
+                break
+            if c in "[{":
+                depth += 1
+            elif c in "]}":
+                depth -= 1
+            chars.append(c)
+            self.pos += 1
+        return json.loads("".join(chars))
+
+    def read_key(self):
+        """ Read the next key of the object and its colon
+
+        Returns:
+            key: string type, None at the end of the object
+        """
+        c = self.skip_ws()
+        if c in "{,":
+            self.pos += 1
+            c = self.skip_ws()
+        if c == "}":
+            self.pos += 1
+            return None
+        key = json.loads(self.read_raw_string())
+        self.expect(":")
+        return key
+
+    def array_blocks(self):
+        """ Read an array of numbers and nested arrays without strings, block by block
+
+        Yields:
+            text: text of the array in the block, brackets included
+            level: numpy.ndarray of int, nesting level after every character of text, 0 after the closing bracket
+        """
+        assert self.skip_ws() == "[", "expect an array"
+        depth = 0
+        while True:
+            if self.pos >= len(self.buf) and not self.fill():
+                raise ValueError("unterminated array")
+            text = self.buf[self.pos:]
+            codes = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+            steps = (codes == ord("[")).astype(np.int32) - (codes == ord("]"))
+            level = depth + np.cumsum(steps, dtype=np.int32)
+            closed = np.flatnonzero(level == 0)
+            if len(closed) > 0:
+                end = int(closed[0]) + 1
+                self.pos += end
+                yield text[:end], level[:end]
+                return
+            self.pos = len(self.buf)
+            depth = int(level[-1])
+            yield text, level
+
+
+def scan_json_dataset(path, block_size=BLOCK_SIZE):
+    """ Read a json dataset except "data", and the shape of "data"
+
+    Args:
+        path: file path of json dataset
+        block_size: characters of a block
+
+    Returns:
+        ds_json: dict type, the json dataset without "data"
+        shape: tuple of int, shape of "data", whose axes follow ds_json["dims"]
+    """
+    ds_json = {}
+    shape = None
+    with open(path, "r") as f:
+        reader = JsonReader(f, block_size)
+        key = reader.read_key()
+        while key is not None:
+            if key != "data":
+                ds_json[key] = reader.read_value()
+                key = reader.read_key()
+                continue
+            # the length of axis k is one more than the commas at level k + 1 in the first item at level k,
+            # which ends where the level goes back to k, so no item of "data" is parsed
+            counts, starts, active = None, None, None
+            head, head_level = "", np.zeros([0], dtype=np.int32)
+            for text, level in reader.array_blocks():
+                if counts is None:
+                    text, level = head + text, np.concatenate([head_level, level])
+                codes = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+                commas = codes == ord(",")
+                if counts is None:
+                    # the number of dims is the level of the first number, after the opening brackets
+                    leaf = np.flatnonzero((codes != ord("[")) & ~np.isin(codes, list(b" \t\r\n")))
+                    if len(leaf) == 0:
+                        head, head_level = text, level
+                        continue
+                    n_dims = int(level[leaf[0]])
+                    counts = [0] * n_dims
+                    starts = [int(np.argmax(level == k + 1)) for k in range(n_dims)]
+                    active = list(range(n_dims))
+                else:
+                    starts = [0] * len(counts)
+                for k in list(active):
+                    ends = np.flatnonzero(level[starts[k]:] == k)
+                    end = starts[k] + int(ends[0]) if len(ends) > 0 else len(level)
+                    counts[k] += int(np.count_nonzero(commas[:end] & (level[:end] == k + 1)))
+                    if len(ends) > 0:
+                        active.remove(k)
+            assert counts is not None, "no data in json dataset: " + path
+            shape = tuple(count + 1 for count in counts)
+            key = reader.read_key()
+    assert shape is not None, "no data in json dataset: " + path
+    return ds_json, shape
+
+
+def iter_json_numbers(path, block_size=BLOCK_SIZE):
+    """ Read the numbers of "data" of a json dataset in C order, block by block
+
+    Args:
+        path: file path of json dataset
+        block_size: characters of a block
+
+    Yields:
+        numbers: numpy.ndarray of float64, the numbers of a block, null is nan
+    """
+    with open(path, "r") as f:
+        reader = JsonReader(f, block_size)
+        key = reader.read_key()
+        while key != "data":
+            assert key is not None, "no data in json dataset: " + path
+            reader.read_value()
+            key = reader.read_key()
+        carry = ""
+        for text, _ in reader.array_blocks():
+            # a number may be cut by the end of the block, keep it for the next block
+            text = carry + text
+            cut = max(text.rfind(","), text.rfind("]"), text.rfind("[")) + 1
+            carry = text[cut:]
+            # brackets only separate numbers like commas, the numbers are parsed without a python object each
+            text = text[:cut].translate(_BRACKETS_TO_SPACES).replace("null", "nan").strip(" \t\r\n,")
+            if text:
+                numbers = np.fromstring(text, dtype=float, sep=",")
+                assert len(numbers) == text.count(",") + 1, "unexpected text in data: " + text[:100]
+                yield numbers
+        assert carry.strip() == "", "unexpected text in data: " + carry[:100]
+
+
+def write_json_numbers(path, raw_path, block_size=BLOCK_SIZE):
+    """ Write the numbers of "data" of a json dataset to a raw float64 file in C order, block by block
+
+    Args:
+        path: file path of json dataset
+        raw_path: output file path
+        block_size: characters of a block
+
+    Returns:
+        n_numbers: number of numbers
+        value_range: (low, high), see data_store.value_range
+    """
+    n_numbers = 0
+    low, high = np.inf, -np.inf
+    with open(raw_path, "wb") as f:
+        for numbers in iter_json_numbers(path, block_size):
+            f.write(numbers.astype(np.float64).tobytes())
+            n_numbers += len(numbers)
+            numbers = numbers[~np.isnan(numbers)]
+            if numbers.size > 0:
+                low, high = min(low, float(numbers.min())), max(high, float(numbers.max()))
+    return n_numbers, ((low, high) if low <= high else (0.0, 0.0))
+
+
+def write_chunked(path, header, values, index=None, level=DEFAULT_LEVEL):
+    """ Write a chunked dataset
+
+    Args:
+        path: output file path
+        header: dict type, see module docstring, "version" and "compression" are set here
+        values: value tensor with parameter axes first, e.g. a numpy.memmap, only one chunk of it is read at a time
+        index: list of numpy.ndarray of int, positions of the coords of every parameter axis in values,
+            see data_store.get_coords_index, None if values is in order
+        level: zlib compression level
+    """
+    header = dict(header, version=VERSION, compression=COMPRESSION)
+    shape = header["shape"]
+    chunk_shape = header["chunk_shape"]
+    quantization = header.get("quantization")
+    n_dims = len(chunk_shape)
+    grid = [-(-shape[axis] // chunk_shape[axis]) for axis in range(n_dims)]
+    header_bytes = json.dumps(header).encode("utf-8")
+    index_entries = []
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack(_LENGTH_FORMAT, len(header_bytes)))
+        f.write(header_bytes)
+        offset = f.tell()
+        # chunks in C order of the chunk grid
+        for position in np.ndindex(*grid):
+            window = tuple(slice(p * c, (p + 1) * c) for p, c in zip(position, chunk_shape))
+            if index is None:
+                chunk = values[window]
+            else:
+                chunk = values[np.ix_(*[idx[w] for idx, w in zip(index, window)])]
+            chunk = data_store.quantize(chunk, quantization)
+            blob = zlib.compress(chunk.tobytes(), level)
+            f.write(blob)
+            index_entries.append((offset, len(blob)))
+            offset += len(blob)
+        f.write(np.array(index_entries, dtype=_INDEX_DTYPE).tobytes())
+        f.write(struct.pack(_LENGTH_FORMAT, offset))
+    os.replace(tmp_path, path)
+
+
+def convert(path, out_path=None, chunk_points=DEFAULT_CHUNK_POINTS, dtype="float64", level=DEFAULT_LEVEL,
+            block_size=BLOCK_SIZE):
+    """ Convert a json dataset to a chunked dataset
+
+    Args:
+        path: file path of json dataset
+        out_path: file path of chunked dataset, default: path + CHUNK_SUFFIX
+        chunk_points: number of points of a chunk, see default_chunk_shape
+        dtype: dtype of the stored value tensor, one of data_store.STORAGE_DTYPES
+        level: zlib compression level
+        block_size: characters of a block of the json dataset read at a time
+
+    Returns:
+        out_path: file path of chunked dataset
+    """
+    if out_path is None:
+        out_path = get_chunk_path(path)
+    ds_json, json_shape = scan_json_dataset(path, block_size)
+    attrs = ds_json["attrs"]
+    json_dims = list(ds_json["dims"])
+    dims = list(attrs.get("dims", json_dims))
+    data_dims = dims + [dim for dim in json_dims if dim not in dims]
+    chunk_shape = default_chunk_shape([len(attrs[dim]["coords"]) for dim in dims], chunk_points)
+    raw_path = "%s.%d.raw.tmp" % (out_path, os.getpid())
+    try:
+        n_numbers, value_range = write_json_numbers(path, raw_path, block_size)
+        assert n_numbers == int(np.prod(json_shape)), "data does not match its shape %s" % (json_shape,)
+        raw = np.memmap(raw_path, dtype=np.float64, mode="r", shape=tuple(json_shape))
+        values = raw.transpose([json_dims.index(dim) for dim in data_dims])
+        index = data_store.get_coords_index(ds_json, values.shape)
+        shape = values.shape if index is None else tuple(len(idx) for idx in index) + values.shape[len(dims):]
+        quantization = data_store.get_quantization(dtype, *value_range)
+        header = {
+            "name": ds_json.get("name"),
+            "dims": dims,
+            "data_dims": data_dims,
+            "attrs": attrs,
+            "shape": [int(n) for n in shape],
+            "dtype": np.dtype(quantization["dtype"] if quantization is not None else np.float64).str,
+            "chunk_shape": list(chunk_shape),
+            "quantization": quantization,
+        }
+        write_chunked(out_path, header, values, index, level)
+        del raw, values
+    finally:
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+    data_store.write_metadata(path, ds_json.get("name"), attrs)
+    return out_path
+
+
+def get_max_rss():
+    """ Get the peak resident memory of the process in bytes, None if it is not available
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ChunkStore():
+    """ Value tensor of a chunked dataset, read chunk by chunk through a LRU cache
+
+    store[idx] is the same as values[idx] of the value tensor, for a tuple of int indices (one point) or
+    a tuple of int arrays (a batch of points) of the parameter axes.
+
+    Attributes:
+        header: dict type, see module docstring
+        shape: shape of the value tensor
+        dtype: dtype of the stored value tensor
+        quantization: dict type, see data_store.get_quantization, None for float64
+        chunk_shape: edges of a chunk on the parameter axes
+        max_bytes: bound of the bytes of decompressed chunks in the cache, the last read chunk is always kept
+        hits: number of chunk reads from the cache since the last pop_stats
+        misses: number of chunk reads from the file since the last pop_stats
+        read_bytes: compressed bytes read from the file since the last pop_stats
+        resident_bytes: bytes of decompressed chunks in the cache
+        peak_resident_bytes: maximum resident_bytes since the last pop_stats
+    """
+    def __init__(self, path, max_bytes):
+        """
+        Args:
+            path: file path of chunked dataset
+            max_bytes: bound of the bytes of decompressed chunks in the cache
+        """
+        self.path = path
+        self.header = read_header(path)
+        self.f = open(path, "rb")
+        self.shape = tuple(self.header["shape"])
+        self.dtype = np.dtype(self.header["dtype"])
+        self.quantization = self.header.get("quantization")
+        self.ndim = len(self.shape)
+        self.chunk_shape = np.array(self.header["chunk_shape"], dtype=np.int64)
+        self.n_dims = len(self.chunk_shape)
+        self.lattice_shape = np.array(self.shape[:self.n_dims], dtype=np.int64)
+        self.score_shape = self.shape[self.n_dims:]
+        self.grid = tuple(int(n) for n in -(-self.lattice_shape // self.chunk_shape))
+        self.f.seek(-_LENGTH_SIZE, os.SEEK_END)
+        index_offset, = struct.unpack(_LENGTH_FORMAT, self.f.read(_LENGTH_SIZE))
+        self.f.seek(index_offset)
+        n_chunks = int(np.prod(self.grid))
+        self.index = np.frombuffer(self.f.read(n_chunks * _INDEX_DTYPE.itemsize), dtype=_INDEX_DTYPE)
+        assert len(self.index) == n_chunks, "truncated chunk index: " + path
+
+        self.max_bytes = max_bytes
+        self.chunks = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.read_bytes = 0
+        self.resident_bytes = 0
+        self.peak_resident_bytes = 0
+
+    def close(self):
+        self.chunks.clear()
+        self.resident_bytes = 0
+        self.f.close()
+
+    def get_chunk_window(self, chunk_id):
+        """ Get the slices of the parameter axes covered by a chunk
+        """
+        begin = np.array(np.unravel_index(chunk_id, self.grid)) * self.chunk_shape
+        end = np.minimum(begin + self.chunk_shape, self.lattice_shape)
+        return tuple(slice(int(b), int(e)) for b, e in zip(begin, end))
+
+    def read_chunk(self, chunk_id):
+        """ Read and decompress a chunk from the file, the cache is not used
+
+        Args:
+            chunk_id: position of the chunk in C order of the chunk grid
+
+        Returns:
+            chunk: read-only numpy.ndarray of the stored dtype, shape: chunk edges cut to the lattice + (14, 3)
+        """
+        offset, length = int(self.index[chunk_id]["offset"]), int(self.index[chunk_id]["length"])
+        self.f.seek(offset)
+        blob = self.f.read(length)
+        edges = tuple(window.stop - window.start for window in self.get_chunk_window(chunk_id))
+        chunk = np.frombuffer(zlib.decompress(blob), dtype=self.dtype)
+        return chunk.reshape(edges + self.score_shape)
+
+    def __array__(self, dtype=None, copy=None):
+        """ Read the whole value tensor chunk by chunk, bypassing the cache. It must fit in memory
+        """
+        values = np.empty(self.shape, dtype=self.dtype)
+        for chunk_id in range(len(self.index)):
+            values[self.get_chunk_window(chunk_id)] = self.read_chunk(chunk_id)
+        if self.quantization is not None and "scale" in self.quantization:
+            values = data_store.dequantize(values, self.quantization)
+        return values if dtype is None else values.astype(dtype)
+
+    def get_chunk(self, chunk_id):
+        """ Get a decompressed chunk
+
+        Args:
+            chunk_id: position of the chunk in C order of the chunk grid
+
+        Returns:
+            chunk: read-only numpy.ndarray, shape: chunk edges cut to the lattice + (14, 3)
+        """
+        chunk = self.chunks.get(chunk_id)
+        if chunk is not None:
+            self.chunks.move_to_end(chunk_id)
+            self.hits += 1
+            return chunk
+        self.misses += 1
+        chunk = self.read_chunk(chunk_id)
+        self.read_bytes += int(self.index[chunk_id]["length"])
+        self.chunks[chunk_id] = chunk
+        self.resident_bytes += chunk.nbytes
+        while self.resident_bytes > self.max_bytes and len(self.chunks) > 1:
+            _, evicted = self.chunks.popitem(last=False)
+            self.resident_bytes -= evicted.nbytes
+        self.peak_resident_bytes = max(self.peak_resident_bytes, self.resident_bytes)
+        return chunk
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        assert len(key) == self.n_dims, "index every parameter axis of a chunked dataset"
+        parts = np.broadcast_arrays(*[np.asarray(k, dtype=np.int64) for k in key])
+        batch_shape = parts[0].shape
+        idx = np.stack([part.ravel() for part in parts], axis=1)
+        chunk_pos = idx // self.chunk_shape
+        local = idx - chunk_pos * self.chunk_shape
+        chunk_ids = np.ravel_multi_index(tuple(chunk_pos.T), self.grid)
+        if len(idx) == 1:
+            scores = self.get_chunk(int(chunk_ids[0]))[tuple(local[0])][np.newaxis]
+        else:
+            scores = np.empty((len(idx),) + self.score_shape, dtype=self.dtype)
+            order = np.argsort(chunk_ids, kind="stable")
+            bounds = np.flatnonzero(np.diff(chunk_ids[order])) + 1
+            for rows in np.split(order, bounds):
+                chunk = self.get_chunk(int(chunk_ids[rows[0]]))
+                scores[rows] = chunk[tuple(local[rows].T)]
+        scores = scores.reshape(batch_shape + self.score_shape)
+        if self.quantization is not None and "scale" in self.quantization:
+            return data_store.dequantize(scores, self.quantization)
+        return scores
+
+    def pop_stats(self):
+        """ Get the stats since the last call and reset them
+
+        Returns:
+            stats: dict type, "hits", "misses", "read_bytes", "resident_bytes", "peak_resident_bytes",
+                "chunks" (number of chunks in the cache) and "max_rss" (peak resident memory of the process)
+        """
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "read_bytes": self.read_bytes,
+            "resident_bytes": self.resident_bytes,
+            "peak_resident_bytes": self.peak_resident_bytes,
+            "chunks": len(self.chunks),
+            "max_rss": get_max_rss(),
+        }
+        self.hits, self.misses, self.read_bytes = 0, 0, 0
+        self.peak_resident_bytes = self.resident_bytes
+        return stats
+
+
+def save_stats(result_root, name, repeat_num, stats):
+    """ Append the chunk cache stats of a repeat to the stats file of an evaluation function
+    """
+    item = dict(stats, repeat=repeat_num)
+    with open(result_root + name + STATS_SUFFIX, "a") as f:
+        f.write(json.dumps(item) + "\n")
+
+
+def load_stats(result_root, name):
+    """ Sum the chunk cache stats of all repeats of an evaluation function
+
+    Returns:
+        stats: dict type, "hits", "misses", "hit_rate" and "read_bytes" of all repeats,
+            maximum "peak_resident_bytes" and "max_rss" of the repeats, None if there are no stats
+    """
+    path = result_root + name + STATS_SUFFIX
+    if not os.path.exists(path):
+        return None
+    stats = {"hits": 0, "misses": 0, "read_bytes": 0, "peak_resident_bytes": 0, "max_rss": 0}
+    with open(path, "r") as f:
+        for line in f:
+            item = json.loads(line)
+            for key in ["hits", "misses", "read_bytes"]:
+                stats[key] += item[key]
+            for key in ["peak_resident_bytes", "max_rss"]:
+                stats[key] = max(stats[key], item[key] or 0)
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / total if total > 0 else 0.0
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="convert json datasets to chunked datasets")
+    parser.add_argument("-dr", "--data-root", dest="data_root", type=str, default="./input/",
+                        help="data set directory")
+    parser.add_argument("-d", "--data", dest="data", required=True, type=str, nargs="+",
+                        help="data set file name")
+    parser.add_argument("--chunk-points", dest="chunk_points", type=int, default=DEFAULT_CHUNK_POINTS,
+                        help="number of points of a chunk")
+    parser.add_argument("--dtype", dest="dtype", type=str, default="float64", choices=data_store.STORAGE_DTYPES,
+                        help="dtype of the stored value tensor")
+    parser.add_argument("--level", dest="level", type=int, default=DEFAULT_LEVEL, help="zlib compression level")
+    args = parser.parse_args()
+    for data_name in args.data:
+        out_path = convert(args.data_root + data_name, chunk_points=args.chunk_points, dtype=args.dtype,
+                           level=args.level)
+        header = read_header(out_path)
+        print("convert", data_name, "->", out_path, "chunk shape:", header["chunk_shape"],
+              "size: %.1f MB" % (os.path.getsize(out_path) / 1e6))
+        if header["quantization"] is not None:
+            print(data_name, "max absolute error:", header["quantization"]["max_abs_error"],
+                  "(loaded with --storage quantized only)")
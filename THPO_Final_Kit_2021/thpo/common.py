@@ -21,6 +21,63 @@ OTHER_ERROR = ERROR_START + 8
 OUT_OF_MEMORY_ERROR = ERROR_START + 9
 RUNTIME_ERROR = ERROR_START + 10
 
+# Execution modes of repeats:
+#   subprocess: launch a python process for every repeat
+#   warm: keep one warm worker process per pool process, which runs repeats in-process
+RUN_MODE_SUBPROCESS = "subprocess"
+RUN_MODE_WARM = "warm"
+RUN_MODES = [RUN_MODE_SUBPROCESS, RUN_MODE_WARM]
+
+# Evaluation result caches, see eval_cache.py:
+#   none: no cache
+#   lru: a per-process LRU cache bounded by --cache-size MB
+#   shared: a memory-mapped cache shared by all worker processes of a run
+EVAL_CACHE_NONE = "none"
+EVAL_CACHE_LRU = "lru"
+EVAL_CACHE_SHARED = "shared"
+EVAL_CACHE_MODES = [EVAL_CACHE_NONE, EVAL_CACHE_LRU, EVAL_CACHE_SHARED]
+
+# Profilers of repeats, see profiler.py:
+#   none: no profiler
+#   sample: sample the stacks of every repeat and write them as collapsed stacks
+PROFILE_NONE = "none"
+PROFILE_SAMPLE = "sample"
+PROFILE_MODES = [PROFILE_NONE, PROFILE_SAMPLE]
+
+# Import time report of the searcher, see import_report.py:
+#   none: no report
+#   report: measure the import time of the harness and the searcher in a new process before the run
+IMPORT_REPORT_NONE = "none"
+IMPORT_REPORT_ON = "report"
+IMPORT_REPORT_MODES = [IMPORT_REPORT_NONE, IMPORT_REPORT_ON]
+
+# Loaders of datasets in EvaluateFunction:
+#   auto: the binary dataset next to the json dataset if there is one (see data_store.py and --storage),
+#       otherwise xarray
+#   xarray: xarray.DataArray.from_dict of the json dataset, a binary dataset next to it is not used
+#   numpy: data_store.decode_dataset of the json dataset, which does not import xarray and pandas
+#   chunked: the chunked dataset next to the json dataset (see chunk_store.py and --storage), read chunk by
+#       chunk through a LRU cache bounded by --chunk-cache-size MB
+EVAL_BACKEND_AUTO = "auto"
+EVAL_BACKEND_XARRAY = "xarray"
+EVAL_BACKEND_NUMPY = "numpy"
+EVAL_BACKEND_CHUNKED = "chunked"
+EVAL_BACKENDS = [EVAL_BACKEND_AUTO, EVAL_BACKEND_XARRAY, EVAL_BACKEND_NUMPY, EVAL_BACKEND_CHUNKED]
+
+# Storage of the binary and chunked datasets loaded by the auto and chunked backends:
+#   exact: only float64 datasets, a quantized dataset is ignored (auto) or rejected (chunked)
+#   quantized: float64 datasets and datasets quantized to float32 or int16 (see data_store.py), which is lossy
+STORAGE_EXACT = "exact"
+STORAGE_QUANTIZED = "quantized"
+STORAGE_MODES = [STORAGE_EXACT, STORAGE_QUANTIZED]
+
+
+# Environment variables bounding the threads of numerical libraries (BLAS, OpenMP ...) in a process.
+# They only take effect if set before the libraries are imported, so the harness sets them before
+# launching searcher processes. THPO_NUM_THREADS tells searchers the threads per worker.
+NUM_THREADS_ENV = "THPO_NUM_THREADS"
+THREAD_ENV_VARS = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                   "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS", NUM_THREADS_ENV]
 
 class CmdArgs(IntEnum):
     uuid = auto()
@@ -36,6 +93,14 @@ class CmdArgs(IntEnum):
     worker = auto()
     all_iters = auto()
     repear_num = auto()
+    run_mode = auto()
+    eval_cache = auto()
+    cache_size = auto()
+    profile = auto()
+    import_report = auto()
+    eval_backend = auto()
+    chunk_cache_size = auto()
+    storage = auto()
 
 
 CMD_STR = {
@@ -52,6 +117,14 @@ CMD_STR = {
     CmdArgs.worker: ("-w", "--worker", "number of problem run in parallel"),
     CmdArgs.all_iters: ("-a", "--all_iter", "all iterations in one run search"),
     CmdArgs.repear_num: ("-n", "--repeat_number", "repetition number in one function"),
+    CmdArgs.run_mode: ("-m", "--mode", "execution mode of repeats, subprocess or warm"),
+    CmdArgs.eval_cache: ("-c", "--cache", "evaluation result cache, none, lru or shared"),
+    CmdArgs.cache_size: ("-cs", "--cache-size", "memory bound of the lru evaluation result cache in MB"),
+    CmdArgs.profile: ("-p", "--profile", "profiler of repeats, none or sample"),
+    CmdArgs.import_report: ("-ir", "--import-report", "import time report of the searcher, none or report"),
+    CmdArgs.eval_backend: ("-eb", "--eval-backend", "loader of datasets, auto (binary dataset if any, else xarray), xarray, numpy or chunked"),
+    CmdArgs.chunk_cache_size: ("-ccs", "--chunk-cache-size", "memory bound of the chunk cache of chunked datasets in MB"),
+    CmdArgs.storage: ("-st", "--storage", "storage of binary and chunked datasets to load, exact (float64) or quantized (also lossy float32 and int16)"),
 }
 
 
@@ -91,13 +164,20 @@ def experiment_parser(description):
     add_argument(parser, CmdArgs.timeout, default=600, type=int)
     add_argument(parser, CmdArgs.all_iters, default=100, type=positive_int)
     add_argument(parser, CmdArgs.repear_num, default=1, type=positive_int)
+    add_argument(parser, CmdArgs.run_mode, default=RUN_MODE_SUBPROCESS, type=str, choices=RUN_MODES)
+    add_argument(parser, CmdArgs.eval_cache, default=EVAL_CACHE_NONE, type=str, choices=EVAL_CACHE_MODES)
+    add_argument(parser, CmdArgs.cache_size, default=64, type=positive_int)
+    add_argument(parser, CmdArgs.profile, default=PROFILE_NONE, type=str, choices=PROFILE_MODES)
+    add_argument(parser, CmdArgs.import_report, default=IMPORT_REPORT_NONE, type=str, choices=IMPORT_REPORT_MODES)
+    add_argument(parser, CmdArgs.eval_backend, default=EVAL_BACKEND_AUTO, type=str, choices=EVAL_BACKENDS)
+    add_argument(parser, CmdArgs.chunk_cache_size, default=256, type=positive_int)
+    add_argument(parser, CmdArgs.storage, default=STORAGE_EXACT, type=str, choices=STORAGE_MODES)
 
     return parser
 
 
 def arg_to_str(arg):
-    _, dest = str(arg).split(".")
-    return dest
+    return arg.name
 
 
 def namespace_to_dict(args_ns):
@@ -130,3 +210,35 @@ def args_to_str(args):
         args_str.append(short_name)
         args_str.append(str(value))
     return ' '.join(args_str)
+
+
+def get_cpu_count():
+    """ Get the number of cores available to the current process
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def get_threads_per_worker(n_worker):
+    """ Split the available cores over the workers running in parallel
+
+    Args:
+        n_worker: number of workers running in parallel
+
+    Returns:
+        n_threads: threads per worker, at least 1. It is THPO_NUM_THREADS if it is set by the user
+    """
+    if os.environ.get(NUM_THREADS_ENV):
+        return max(1, int(os.environ[NUM_THREADS_ENV]))
+    return max(1, get_cpu_count() // max(1, n_worker))
+
+
+def set_thread_env(n_threads):
+    """ Set the thread environment variables, inherited by the processes launched afterwards
+
+    Args:
+        n_threads: threads per worker
+    """
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(n_threads)
@@ -0,0 +1,507 @@
+# coding=utf-8
+"""
+Binary dataset format for evaluation functions.
+
+A binary dataset file is laid out as:
+    MAGIC (8 bytes) | header length (uint64, little endian) | header (json, utf-8) | padding | value tensor
+
+The header carries "name", "dims", "data_dims", "attrs" (parameters config, baseline ...),
+"shape", "dtype", "offset" and "quantization". The value tensor is a dense C-ordered array of shape
+(len(coords_0), ..., len(coords_n), 14, 3), whose axes follow attrs["dims"] and the order of
+"coords" in each parameter config, so it can be memory-mapped and indexed directly.
+
+The value tensor is stored as float64, or quantized (see get_quantization) as
+    float32: max absolute error max(|x|) * 2^-24
+    int16: x = offset + code * scale with one offset and scale per dataset spanning [min(x), max(x)] by
+        codes -32767 ... 32767, code -32768 is nan, max absolute error scale / 2 = (max(x) - min(x)) / 131068
+"quantization" in the header holds "dtype", "max_abs_error" and, for int16, "offset" and "scale",
+it is None for float64. load_binary wraps int16 codes in a QuantizedTensor, which is indexed like the
+float64 value tensor. thpo/quantization_check.py verifies the effect on calculate_reward.
+Quantized storage is lossy, so find_binary_file only finds a quantized binary dataset next to a json dataset
+when asked to (EvaluateFunction with --storage quantized), otherwise the json dataset is loaded.
+Version 1 files have no "quantization" and are stored as float64.
+
+A metadata sidecar file (path + METADATA_SUFFIX) holds only {"name": name, "attrs": attrs} of a
+dataset, so that parameters config, dims, name and baseline are read without the value tensor.
+It is written next to the binary dataset by convert, and next to a json dataset the first time
+its metadata is read.
+
+Usage:
+    python3 thpo/data_store.py -dr ./input/ -d data-30 data-2
+    python3 thpo/data_store.py -dr ./input/ -d data-30 data-2 --dtype int16
+    python3 thpo/data_store.py -dr ./input/ -d data-30 data-2 --metadata-only
+"""
+import os
+import json
+import struct
+import argparse
+import numpy as np
+
+MAGIC = b"THPOBIN\x00"
+VERSION = 2
+SUPPORTED_VERSIONS = [1, 2]
+BINARY_SUFFIX = ".bin"
+METADATA_SUFFIX = ".meta.json"
+ALIGNMENT = 64
+STORAGE_DTYPES = ["float64", "float32", "int16"]
+INT16_NAN = -32768
+INT16_MAX = 32767
+_LENGTH_FORMAT = "<Q"
+_PREFIX_SIZE = len(MAGIC) + struct.calcsize(_LENGTH_FORMAT)
+
+
+def get_binary_path(path):
+    """ Get the binary dataset path of a json dataset
+
+    Args:
+        path: file path of json dataset
+
+    Returns:
+        binary_path: file path of binary dataset
+    """
+    return path + BINARY_SUFFIX
+
+
+def is_binary_file(path):
+    """ Test whether path is a binary dataset file
+    """
+    if not os.path.isfile(path):
+        return False
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def find_binary_file(path, quantized=False):
+    """ Find the binary dataset to load for a dataset path
+
+    Args:
+        path: file path of a json dataset or of a binary dataset
+        quantized: whether a binary dataset next to a json dataset may be quantized
+
+    Returns:
+        binary_path: file path of binary dataset, or None if there is no usable binary dataset.
+            A binary dataset older than its json dataset is ignored, so is a quantized one unless quantized is True.
+            A binary dataset path is always returned.
+    """
+    if is_binary_file(path):
+        return path
+    binary_path = get_binary_path(path)
+    if not is_binary_file(binary_path):
+        return None
+    if os.path.exists(path) and os.path.getmtime(path) > os.path.getmtime(binary_path):
+        return None
+    if not quantized and read_header(binary_path)["quantization"] is not None:
+        return None
+    return binary_path
+
+
+def read_header(path):
+    """ Read the header of a binary dataset without touching the value tensor
+
+    Args:
+        path: file path of binary dataset
+
+    Returns:
+        header: dict type, see module docstring
+    """
+    with open(path, "rb") as f:
+        prefix = f.read(_PREFIX_SIZE)
+        assert prefix[:len(MAGIC)] == MAGIC, "not a binary dataset: " + path
+        header_len, = struct.unpack(_LENGTH_FORMAT, prefix[len(MAGIC):])
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    assert header["version"] in SUPPORTED_VERSIONS, "unsupported binary dataset version %s" % header["version"]
+    header.setdefault("quantization", None)
+    return header
+
+
+def get_metadata_path(path):
+    """ Get the metadata sidecar path of a dataset
+    """
+    return path + METADATA_SUFFIX
+
+
+def write_metadata(path, name, attrs):
+    """ Write the metadata sidecar of a dataset
+
+    Args:
+        path: file path of the dataset
+        name: name of evaluation function
+        attrs: dict type, attributes of the dataset (parameters config, dims, baseline)
+
+    Returns:
+        metadata_path: file path of the metadata sidecar
+    """
+    metadata_path = get_metadata_path(path)
+    tmp_path = "%s.%d.tmp" % (metadata_path, os.getpid())
+    with open(tmp_path, "w") as f:
+        json.dump({"name": name, "attrs": attrs}, f)
+    os.replace(tmp_path, metadata_path)
+    return metadata_path
+
+
+def find_metadata_file(path):
+    """ Find the metadata sidecar of a dataset
+
+    Returns:
+        metadata_path: file path of the metadata sidecar, or None if it does not exist or is older than the dataset
+    """
+    metadata_path = get_metadata_path(path)
+    if not os.path.isfile(metadata_path):
+        return None
+    if os.path.exists(path) and os.path.getmtime(path) > os.path.getmtime(metadata_path):
+        return None
+    return metadata_path
+
+
+def read_attrs(path):
+    """ Read the name and the attributes (parameters config, dims, baseline) of a dataset
+        without building its value tensor
+
+    The metadata sidecar is read if it exists, then the header of the binary dataset. Otherwise the
+    json dataset is parsed and its metadata sidecar is written for later reads.
+
+    Args:
+        path: file path of a json dataset or of a binary dataset
+
+    Returns:
+        name: name of evaluation function
+        attrs: dict type, attributes of the dataset
+    """
+    metadata_path = find_metadata_file(path)
+    if metadata_path is not None:
+        with open(metadata_path, "r") as f:
+            metadata = json.load(f)
+        return metadata["name"], metadata["attrs"]
+    # the attributes of a quantized binary dataset are not quantized
+    binary_path = find_binary_file(path, quantized=True)
+    if binary_path is not None:
+        header = read_header(binary_path)
+        return header["name"], header["attrs"]
+    with open(path, "r") as f:
+        ds_json = json.load(f)
+    try:
+        write_metadata(path, ds_json.get("name"), ds_json["attrs"])
+    except OSError:
+        # the data set directory may be read-only
+        pass
+    return ds_json.get("name"), ds_json["attrs"]
+
+
+def load_metadata(path):
+    """ Load the metadata of a dataset, see read_attrs
+
+    Args:
+        path: file path of a json dataset or of a binary dataset
+
+    Returns:
+        metadata: dict type:
+            "name": name of evaluation function
+            "dims": list of the parameter names
+            "parameters_config": parameters configuration, see EvaluateFunction
+            "baseline": baseline of evaluation function, see EvaluateFunction
+    """
+    name, attrs = read_attrs(path)
+    dims = attrs["dims"]
+    metadata = {
+        "name": name,
+        "dims": dims,
+        "parameters_config": {dim: attrs[dim] for dim in dims},
+        "baseline": attrs["baseline"],
+    }
+    return metadata
+
+
+def value_range(values):
+    """ Get the minimum and the maximum of values, nan is ignored
+
+    Returns:
+        low: float type, 0.0 if all values are nan
+        high: float type, 0.0 if all values are nan
+    """
+    values = np.asarray(values, dtype=float)
+    finite = values[~np.isnan(values)]
+    if finite.size == 0:
+        return 0.0, 0.0
+    return float(finite.min()), float(finite.max())
+
+
+def get_quantization(dtype, low, high):
+    """ Get the quantization of values in [low, high] stored as dtype, see module docstring
+
+    Args:
+        dtype: one of STORAGE_DTYPES
+        low: minimum of values
+        high: maximum of values
+
+    Returns:
+        quantization: dict type, "dtype", "max_abs_error" and, for int16, "offset" and "scale",
+            None for float64
+    """
+    assert dtype in STORAGE_DTYPES, "unknown storage dtype " + str(dtype)
+    magnitude = max(abs(low), abs(high))
+    if dtype == "float64":
+        return None
+    if dtype == "float32":
+        # round to nearest has a relative error of at most 2^-24, and subnormals an absolute one of 2^-150
+        return {"dtype": np.dtype(np.float32).str, "max_abs_error": magnitude * 2.0 ** -24 + 2.0 ** -150}
+    offset = (low + high) / 2.0
+    scale = (high - low) / (2 * INT16_MAX) if high > low else 1.0
+    # half a step, and a margin of the float64 rounding of code * scale + offset
+    max_abs_error = scale / 2.0 + 4 * np.finfo(np.float64).eps * max(magnitude, 1.0)
+    return {"dtype": np.dtype(np.int16).str, "offset": offset, "scale": scale, "max_abs_error": max_abs_error}
+
+
+def quantize(values, quantization):
+    """ Convert values to the stored dtype of quantization
+
+    Args:
+        values: numpy.ndarray, float values
+        quantization: see get_quantization
+
+    Returns:
+        codes: C-ordered numpy.ndarray of the stored dtype
+    """
+    if quantization is None:
+        return np.ascontiguousarray(values, dtype=np.float64)
+    if "scale" not in quantization:
+        return np.ascontiguousarray(values, dtype=np.dtype(quantization["dtype"]))
+    values = np.asarray(values, dtype=float)
+    scaled = np.rint((values - quantization["offset"]) / quantization["scale"])
+    codes = np.clip(np.nan_to_num(scaled), -INT16_MAX, INT16_MAX).astype(np.int16)
+    codes[np.isnan(values)] = INT16_NAN
+    return np.ascontiguousarray(codes)
+
+
+def dequantize(codes, quantization):
+    """ Convert stored values to float64, see quantize
+    """
+    if quantization is None or "scale" not in quantization:
+        return np.array(codes, dtype=float)
+    codes = np.asarray(codes)
+    return np.where(codes == INT16_NAN, np.nan, codes * quantization["scale"] + quantization["offset"])
+
+
+class QuantizedTensor():
+    """ Value tensor stored as int16 codes, values[idx] is the dequantized float64 value tensor indexed by idx
+
+    Attributes:
+        codes: numpy.ndarray of int16, e.g. a numpy.memmap of a binary dataset
+        quantization: dict type, see get_quantization
+        shape: shape of the value tensor
+    """
+    def __init__(self, codes, quantization):
+        self.codes = codes
+        self.quantization = quantization
+        self.shape = codes.shape
+        self.ndim = codes.ndim
+        self.dtype = np.dtype(np.float64)
+
+    def __getitem__(self, key):
+        return dequantize(self.codes[key], self.quantization)
+
+    def dequantize(self):
+        """ Get the whole dequantized value tensor
+        """
+        return dequantize(self.codes, self.quantization)
+
+    def __array__(self, dtype=None, copy=None):
+        """ Get the whole dequantized value tensor for numpy.asarray, it is always a copy
+        """
+        values = self.dequantize()
+        return values if dtype is None else values.astype(dtype, copy=False)
+
+
+def load_binary(path):
+    """ Memory-map a binary dataset
+
+    Args:
+        path: file path of binary dataset
+
+    Returns:
+        header: dict type, see module docstring
+        values: read-only numpy.memmap of the value tensor, wrapped in a QuantizedTensor if it is stored as int16
+    """
+    header = read_header(path)
+    values = np.memmap(path, dtype=np.dtype(header["dtype"]), mode="r",
+                       offset=header["offset"], shape=tuple(header["shape"]))
+    quantization = header["quantization"]
+    if quantization is not None and "scale" in quantization:
+        values = QuantizedTensor(values, quantization)
+    return header, values
+
+
+def dataset_to_tensor(ds_json):
+    """ Convert a json dataset to a dense tensor
+
+    Args:
+        ds_json: dict type, json dataset in the form of xarray.DataArray.to_dict()
+
+    Returns:
+        data_dims: list of all dimension names of the tensor, parameter names come first
+        values: numpy.ndarray, whose parameter axes follow the order of "coords" in the parameter config
+    """
+    import xarray as xr
+
+    da = xr.DataArray.from_dict(ds_json)
+    data_dims, values = dataarray_to_tensor(da)
+    return data_dims, np.ascontiguousarray(values)
+
+
+def decode_dataset(ds_json):
+    """ Convert a json dataset to a dense tensor with numpy only, the same as dataset_to_tensor
+
+    Args:
+        ds_json: dict type, json dataset in the form of xarray.DataArray.to_dict():
+            "dims": dimension names of "data", "data": nested lists of values,
+            "coords": {dim: {"data": labels of the axis}}, "attrs": attributes, "name": name
+
+    Returns:
+        data_dims: list of all dimension names of the tensor, parameter names come first
+        values: numpy.ndarray, whose parameter axes follow the order of "coords" in the parameter config
+    """
+    attrs = ds_json["attrs"]
+    json_dims = list(ds_json["dims"])
+    dims = attrs.get("dims", json_dims)
+    data_dims = list(dims) + [dim for dim in json_dims if dim not in dims]
+    values = np.asarray(ds_json["data"], dtype=float)
+    assert values.ndim == len(json_dims), "data does not match dims"
+    values = values.transpose([json_dims.index(dim) for dim in data_dims])
+    index = get_coords_index(ds_json, values.shape)
+    if index is not None:
+        values = values[np.ix_(*index)]
+    return data_dims, np.ascontiguousarray(values)
+
+
+def get_coords_index(ds_json, shape):
+    """ Select the labels of every parameter axis of a json dataset in the order of "coords", like DataArray.loc
+
+    Args:
+        ds_json: dict type, json dataset, "data" is not used
+        shape: shape of "data" with its axes in the order of the value tensor, parameter axes first
+
+    Returns:
+        index: list of numpy.ndarray of int64, positions of "coords" of every parameter in the labels of its axis,
+            None if the labels are already in the order of "coords"
+    """
+    attrs = ds_json["attrs"]
+    dims = attrs.get("dims", ds_json["dims"])
+    index = []
+    for axis, dim in enumerate(dims):
+        labels = ds_json.get("coords", {}).get(dim, {}).get("data")
+        if labels is None:
+            labels = list(range(shape[axis]))
+        position = {}
+        for i, label in enumerate(labels):
+            position.setdefault(label, i)
+        index.append(np.array([position[value] for value in attrs[dim]["coords"]], dtype=np.int64))
+    if all(np.array_equal(idx, np.arange(shape[axis])) for axis, idx in enumerate(index)):
+        return None
+    return index
+
+
+def dataarray_to_tensor(da):
+    """ Get the value tensor of a dataset, the tensor is not copied if it is already in order
+
+    Args:
+        da: xarray type, dataset
+
+    Returns:
+        data_dims: list of all dimension names of the tensor, parameter names come first
+        values: numpy.ndarray, whose parameter axes follow the order of "coords" in the parameter config
+    """
+    dims = da.attrs.get("dims", list(da.dims))
+    data_dims = list(dims) + [dim for dim in da.dims if dim not in dims]
+    if list(da.dims) != data_dims:
+        da = da.transpose(*data_dims)
+    in_order = all(np.array_equal(da.coords[dim].values, da.attrs[dim]["coords"]) for dim in dims)
+    if not in_order:
+        da = da.loc[{dim: da.attrs[dim]["coords"] for dim in dims}]
+    return data_dims, da.variable.values
+
+
+def write_binary(path, name, attrs, data_dims, values, dtype="float64"):
+    """ Write a binary dataset
+
+    Args:
+        path: output file path
+        name: name of evaluation function
+        attrs: dict type, attributes of the dataset (parameters config, dims, baseline)
+        data_dims: list of all dimension names of values
+        values: numpy.ndarray, value tensor
+        dtype: dtype of the stored value tensor, one of STORAGE_DTYPES
+    """
+    quantization = get_quantization(dtype, *value_range(values))
+    values = quantize(values, quantization)
+    header = {
+        "version": VERSION,
+        "name": name,
+        "dims": attrs.get("dims", data_dims[:values.ndim - 2]),
+        "data_dims": list(data_dims),
+        "attrs": attrs,
+        "shape": list(values.shape),
+        "dtype": values.dtype.str,
+        "offset": 0,
+        "quantization": quantization,
+    }
+    # The offset is part of the header, so grow it until the header fits before the offset
+    offset = ALIGNMENT
+    while True:
+        header["offset"] = offset
+        header_bytes = json.dumps(header).encode("utf-8")
+        if _PREFIX_SIZE + len(header_bytes) <= offset:
+            break
+        offset += ALIGNMENT
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack(_LENGTH_FORMAT, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b" " * (offset - _PREFIX_SIZE - len(header_bytes)))
+        f.write(values.tobytes())
+    os.replace(tmp_path, path)
+
+
+def convert(path, out_path=None, dtype="float64"):
+    """ Convert a json dataset to a binary dataset
+
+    Args:
+        path: file path of json dataset
+        out_path: file path of binary dataset, default: path + BINARY_SUFFIX
+        dtype: dtype of the stored value tensor, one of STORAGE_DTYPES
+
+    Returns:
+        out_path: file path of binary dataset
+    """
+    if out_path is None:
+        out_path = get_binary_path(path)
+    with open(path, "r") as f:
+        ds_json = json.load(f)
+    data_dims, values = dataset_to_tensor(ds_json)
+    write_binary(out_path, ds_json.get("name"), ds_json["attrs"], data_dims, values, dtype)
+    write_metadata(path, ds_json.get("name"), ds_json["attrs"])
+    return out_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="convert json datasets to binary datasets")
+    parser.add_argument("-dr", "--data-root", dest="data_root", type=str, default="./input/",
+                        help="data set directory")
+    parser.add_argument("-d", "--data", dest="data", required=True, type=str, nargs="+",
+                        help="data set file name")
+    parser.add_argument("--dtype", dest="dtype", type=str, default="float64", choices=STORAGE_DTYPES,
+                        help="dtype of the stored value tensor")
+    parser.add_argument("--metadata-only", dest="metadata_only", action="store_true",
+                        help="only write metadata sidecar files")
+    args = parser.parse_args()
+    for data_name in args.data:
+        if args.metadata_only:
+            with open(args.data_root + data_name, "r") as f:
+                ds_json = json.load(f)
+            out_path = write_metadata(args.data_root + data_name, ds_json.get("name"), ds_json["attrs"])
+        else:
+            out_path = convert(args.data_root + data_name, dtype=args.dtype)
+            quantization = read_header(out_path).get("quantization")
+            if quantization is not None:
+                print(data_name, "max absolute error:", quantization["max_abs_error"],
+                      "(loaded with --storage quantized only)")
+        print("convert", data_name, "->", out_path)
@@ -39,6 +39,7 @@ def get_all_parameters(evaluator, return_list=False):
 
 N_ITERS = 14
 value_name_dict = dict(v='value', m='value', l='lower_bound', u='upper_bound')
+value_index_dict = dict(value=0, lower_bound=1, upper_bound=2)
 
 
 def get_value(evaluator, para_dict, day=None, value_name=None):
@@ -52,28 +53,83 @@ def get_value(evaluator, para_dict, day=None, value_name=None):
         'lower_bound', 'l'
         'upper_bound', 'u'
     """
-    result = evaluator.get_paramter_score(para_dict)    # list of dicts. dict keys: value, lower_bound, upper_bound
+    score = evaluator.evaluate_many([para_dict])[0]     # shape: (N_ITERS, 3). value, lower_bound, upper_bound
     if day is not None:
         assert 0 <= day < N_ITERS
-        result = result[day]
-    if value_name is not None:
-        value_name = value_name_dict.get(value_name, value_name)
-        assert value_name in ['value', 'lower_bound', 'upper_bound']
-
+        score = score[day:day + 1]
+    if value_name is None:
+        result = evaluator.score_to_list(score)     # list of dicts. dict keys: value, lower_bound, upper_bound
         if day is not None:
-            result = result[value_name]
-        else:
-            result = [result[d][value_name] for d in range(N_ITERS)]
+            result = result[0]
+        return result
+
+    value_name = value_name_dict.get(value_name, value_name)
+    assert value_name in value_index_dict
+    result = list(score[:, value_index_dict[value_name]])
+    if day is not None:
+        result = result[0]
     return result
 
 
+def get_all_scores(evaluator):
+    """
+    :return:
+        numpy.ndarray view of the whole data set, shape: (n_points, N_ITERS, 3).
+        points are in the same order as get_all_parameters.
+        the last axis is (value, lower_bound, upper_bound).
+        a chunked data set (see chunk_store.py) is read into a copy, which must fit in memory,
+        and so is a quantized binary data set (see data_store.py).
+    """
+    return np.asarray(evaluator.values).reshape(-1, N_ITERS, 3)
+
+
+def get_all_values(evaluator, value_name='m'):
+    """
+    :param value_name:
+        'value', 'v', 'm'
+        'lower_bound', 'l'
+        'upper_bound', 'u'
+    :return:
+        numpy.ndarray view of get_all_scores, shape: (n_points, N_ITERS).
+        points are in the same order as get_all_parameters.
+    """
+    value_name = value_name_dict.get(value_name, value_name)
+    assert value_name in value_index_dict
+    return get_all_scores(evaluator)[:, :, value_index_dict[value_name]]
+
+
+def get_all_coords(evaluator):
+    """
+    :return:
+        numpy.ndarray, coordinate meshgrid of all parameters, shape: (n_points, n_dims).
+        points are in the same order as get_all_parameters, columns are in the same order as evaluator.dims.
+    """
+    name_list = evaluator.dims  # all parameter names
+    all_coords = [np.asarray(evaluator.parameters_config[name]['coords'], dtype=float) for name in name_list]
+    mesh = np.meshgrid(*all_coords, indexing='ij')
+    return np.stack([m.reshape(-1) for m in mesh], axis=1)
+
+
+def coords_to_parameter(evaluator, coords):
+    """
+    convert a row of get_all_coords to a dict type parameter
+    """
+    return {name: value for name, value in zip(evaluator.dims, coords.tolist())}
+
+
+def get_sorted_index(evaluator, day=13):
+    """
+    :return:
+        indices of all points sorted by value on day (maximize), ties keep the order of get_all_parameters
+    """
+    return np.argsort(-get_all_values(evaluator, 'm')[:, day], kind='stable')
+
+
 def get_sorted_parameters(evaluator):
-    para_reward = []
-    for para in get_all_parameters(evaluator):
-        reward = get_value(evaluator, para, 13, 'm')
-        para_reward.append((para, reward))
-    para_reward.sort(key=lambda x: -x[1])  # maximize
-    sorted_para = [para for para, reward in para_reward]
+    all_pairs = get_all_parameter_pairs(evaluator, return_list=True)
+    name_list = evaluator.dims  # all parameter names
+    sorted_para = [{name: value for name, value in zip(name_list, all_pairs[i])}
+                   for i in get_sorted_index(evaluator)]
     return sorted_para
 
 
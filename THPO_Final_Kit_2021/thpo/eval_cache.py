@@ -0,0 +1,191 @@
+# coding=utf-8
+"""
+Caches of evaluation results keyed by the integer coordinate tuple of a suggestion point
+(indices in "coords" of every parameter, see ParameterCodec).
+
+    lru: a per-process LRU cache bounded by the bytes of cached scores. In warm mode the evaluation
+        function of a worker is reused, so the cache is kept across repeats.
+    shared: a file-backed array of scores and a filled flag per point, memory-mapped by all worker
+        processes of a run (including the processes of subprocess mode), kept across repeats and searchers.
+
+Hits and misses of every repeat are appended to a stats file in the result directory, see save_stats.
+"""
+import os
+import json
+import collections
+import numpy as np
+
+try:
+    import common
+except ModuleNotFoundError:
+    from . import common
+
+SHARED_CACHE_DIR = "eval_cache/"
+STATS_SUFFIX = ".cache_stats"
+
+
+class LRUCache():
+    """ Per-process LRU cache of scores
+
+    Attributes:
+        max_entries: maximum number of cached points, max_bytes // bytes of the scores of a point
+        hits: number of cache hits since the last pop_stats
+        misses: number of cache misses since the last pop_stats
+    """
+    def __init__(self, values_shape, max_bytes):
+        """
+        Args:
+            values_shape: shape of the value tensor of the evaluation function
+            max_bytes: bound of the bytes of cached scores
+        """
+        self.n_dims = len(values_shape) - 2
+        self.max_entries = max(1, max_bytes // (int(np.prod(values_shape[self.n_dims:])) * 8))
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, idx, values):
+        """ Get the scores of points, the missed ones are read from values and cached
+
+        Args:
+            idx: numpy.ndarray of int, shape (n_points, n_dims), indices in "coords" of every parameter
+            values: value tensor of the evaluation function
+
+        Returns:
+            scores: numpy.ndarray of float64, shape (n_points, 14, 3)
+        """
+        keys = [tuple(row) for row in np.asarray(idx).tolist()]
+        scores = np.empty((len(keys),) + tuple(values.shape[self.n_dims:]), dtype=float)
+        missed = []
+        for i, key in enumerate(keys):
+            score = self.entries.get(key)
+            if score is None:
+                missed.append(i)
+            else:
+                self.entries.move_to_end(key)
+                scores[i] = score
+        self.hits += len(keys) - len(missed)
+        self.misses += len(missed)
+        if len(missed) > 0:
+            scores[missed] = values[tuple(np.asarray(idx)[missed].T)]
+            for i in missed:
+                self.entries[keys[i]] = scores[i].copy()
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return scores
+
+    def pop_stats(self):
+        """ Get hits and misses since the last call and reset them
+        """
+        stats = {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+        self.hits, self.misses = 0, 0
+        return stats
+
+
+class SharedCache():
+    """ Cache of scores shared by processes through a memory-mapped file
+
+    Scores are written before the filled flag, and a point always has the same scores,
+    so processes may fill the same point at the same time.
+    """
+    def __init__(self, path, values_shape):
+        """
+        Args:
+            path: file of the cache, created if it does not exist
+            values_shape: shape of the value tensor of the evaluation function
+        """
+        self.lattice_shape = tuple(values_shape[:-2])
+        self.score_shape = tuple(values_shape[-2:])
+        n_points = int(np.prod(self.lattice_shape))
+        score_bytes = n_points * int(np.prod(self.score_shape)) * 8
+        self.create_file(path, score_bytes + n_points)
+        self.scores = np.memmap(path, dtype=np.float64, mode="r+", shape=(n_points,) + self.score_shape)
+        self.filled = np.memmap(path, dtype=np.uint8, mode="r+", offset=score_bytes, shape=(n_points,))
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def create_file(path, size):
+        """ Create a zero-filled file of size bytes atomically, nothing is done if it exists
+        """
+        if os.path.exists(path):
+            return
+        tmp_path = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp_path, "wb") as f:
+            f.truncate(size)
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        os.remove(tmp_path)
+
+    def lookup(self, idx, values):
+        """ Get the scores of points, the missed ones are read from values and cached, see LRUCache.lookup
+        """
+        keys = np.ravel_multi_index(np.asarray(idx, dtype=np.int64).T, self.lattice_shape)
+        hit = self.filled[keys].astype(bool)
+        scores = np.array(self.scores[keys])
+        missed = np.flatnonzero(~hit)
+        self.hits += int(hit.sum())
+        self.misses += len(missed)
+        if len(missed) > 0:
+            scores[missed] = values[tuple(np.asarray(idx)[missed].T)]
+            self.scores[keys[missed]] = scores[missed]
+            self.filled[keys[missed]] = 1
+        return scores
+
+    def pop_stats(self):
+        """ Get hits and misses since the last call and reset them, see LRUCache.pop_stats
+        """
+        stats = {"hits": self.hits, "misses": self.misses, "entries": int(np.count_nonzero(self.filled))}
+        self.hits, self.misses = 0, 0
+        return stats
+
+
+def create_cache(mode, values_shape, name, result_root, max_bytes):
+    """ Create the cache of an evaluation function
+
+    Args:
+        mode: one of common.EVAL_CACHE_MODES
+        values_shape: shape of the value tensor of the evaluation function
+        name: name of the evaluation function
+        result_root: result directory, the shared cache is in its SHARED_CACHE_DIR
+        max_bytes: bound of the bytes of the lru cache
+
+    Returns:
+        cache: LRUCache, SharedCache or None
+    """
+    if mode == common.EVAL_CACHE_LRU:
+        return LRUCache(values_shape, max_bytes)
+    if mode == common.EVAL_CACHE_SHARED:
+        cache_dir = result_root + SHARED_CACHE_DIR
+        os.makedirs(cache_dir, exist_ok=True)
+        return SharedCache(cache_dir + name, values_shape)
+    return None
+
+
+def save_stats(result_root, name, repeat_num, stats):
+    """ Append the cache stats of a repeat to the stats file of an evaluation function
+    """
+    item = dict(stats, repeat=repeat_num)
+    with open(result_root + name + STATS_SUFFIX, "a") as f:
+        f.write(json.dumps(item) + "\n")
+
+
+def load_stats(result_root, name):
+    """ Sum the cache stats of all repeats of an evaluation function
+
+    Returns:
+        stats: dict type, "hits", "misses" and "hit_rate", None if there are no stats
+    """
+    path = result_root + name + STATS_SUFFIX
+    if not os.path.exists(path):
+        return None
+    hits, misses = 0, 0
+    with open(path, "r") as f:
+        for line in f:
+            item = json.loads(line)
+            hits += item["hits"]
+            misses += item["misses"]
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": hits / total if total > 0 else 0.0}
@@ -1,15 +1,34 @@
 # coding=utf-8
 import json
-import xarray as xr
 import numpy as np
 
+try:
+    import common
+    import data_store
+    import chunk_store
+    from param_codec import ParameterCodec
+except ModuleNotFoundError:
+    from . import common
+    from . import data_store
+    from . import chunk_store
+    from .param_codec import ParameterCodec
+
 
 class EvaluateFunction():
     """ Evaluation function class
     All evaluation functions are to find the maximum value.
 
     Attributes:
-        da: xarray type, contains all information of the data set
+        da: xarray type, contains all information of the data set.
+            If a binary dataset (see data_store.py) is loaded, da wraps its memory-mapped value tensor.
+            It is only built (and xarray imported) on first access, unless a json dataset is decoded by xarray.
+            It is not available for a chunked dataset, and holds a dequantized copy of an int16 binary dataset.
+        header: dict type, header of the dataset in the form of a binary dataset header (see data_store.py),
+            None for a json dataset decoded by xarray
+        values: numpy.ndarray type, value tensor of the data set, whose axes follow dims and the order of
+            "coords" in parameters_config, the last two axes are iterations and (value, lower_bound, upper_bound).
+            A data_store.QuantizedTensor for an int16 binary dataset, or a chunk_store.ChunkStore for the
+            chunked backend, which are indexed in the same way.
         dims: list type, list of the parameter name, eg:["p1", "p2", "p3"]
         parameters_config: parameters configuration, dict type:
             dict key: parameters name, string type
@@ -51,28 +70,126 @@ class EvaluateFunction():
             "clip": clip reward
             "best": best reward
             "worst": worst reward
+        cache: evaluation result cache consulted by evaluate and evaluate_many (see eval_cache.py), None by default
     """
-    def __init__(self, path, iters):
+    def __init__(self, path, iters, backend=common.EVAL_BACKEND_AUTO, chunk_cache_bytes=256 * 1024 * 1024,
+                 quantized=False):
         """ initialization of evaluation function
 
         Args:
-            path: file path of evaluation function
+            path: file path of evaluation function, a json dataset, a binary dataset or a chunked dataset
             iters: number of iterations
+            backend: loader of the dataset, one of common.EVAL_BACKENDS. The binary dataset next to a json
+                dataset is only used by the auto backend, a binary dataset path is loaded by every backend but chunked
+            chunk_cache_bytes: bound of the chunk cache of the chunked backend
+            quantized: whether the binary or chunked dataset next to a json dataset may be quantized, which is lossy
         """
-        with open(path, "r") as f:
-            ds_json = json.load(f)
-        self.da = xr.DataArray.from_dict(ds_json)
-        self.dims = self.da.attrs["dims"]
+        assert backend in common.EVAL_BACKENDS, "unknown backend " + str(backend)
+        binary_path = None
+        if backend == common.EVAL_BACKEND_AUTO or data_store.is_binary_file(path):
+            binary_path = data_store.find_binary_file(path, quantized)
+        if backend == common.EVAL_BACKEND_CHUNKED:
+            chunk_path = chunk_store.find_chunk_file(path, quantized)
+            assert chunk_path is not None, \
+                "no float64 chunked dataset for %s (a quantized one is loaded with --storage quantized), " \
+                "run: python3 thpo/chunk_store.py -d <data>" % path
+            self.values = chunk_store.ChunkStore(chunk_path, chunk_cache_bytes)
+            self.header = self.values.header
+            self._da = None
+            attrs, self.name = self.header["attrs"], self.header["name"]
+        elif binary_path is not None:
+            self.header, self.values = data_store.load_binary(binary_path)
+            self._da = None
+            attrs, self.name = self.header["attrs"], self.header["name"]
+        elif backend == common.EVAL_BACKEND_NUMPY:
+            with open(path, "r") as f:
+                ds_json = json.load(f)
+            data_dims, self.values = data_store.decode_dataset(ds_json)
+            attrs, self.name = ds_json["attrs"], ds_json.get("name")
+            self.header = {"name": self.name, "dims": attrs["dims"], "data_dims": data_dims, "attrs": attrs}
+            self._da = None
+        else:
+            import xarray as xr
+
+            with open(path, "r") as f:
+                ds_json = json.load(f)
+            self.header = None
+            self._da = xr.DataArray.from_dict(ds_json)
+            _, self.values = data_store.dataarray_to_tensor(self._da)
+            attrs, self.name = self._da.attrs, self._da.name
+        self.dims = attrs["dims"]
         self.parameters_config = {}
         for dim in self.dims:
-            assert dim in self.da.attrs, "dim not in attrs"
-            self.parameters_config[dim] = self.da.attrs[dim]
-        self.name = self.da.name
-        self.baseline = self.da.attrs["baseline"]
+            assert dim in attrs, "dim not in attrs"
+            self.parameters_config[dim] = attrs[dim]
+        self.baseline = attrs["baseline"]
         # assert iters <= self.baseline["iters"], "iters is more than setting"
         self.baseline["median"] = np.array(self.baseline["median"][0:100])
         self.baseline["mean"] = np.array(self.baseline["mean"][0:100])
 
+        # Snap parameter values to coords indices, columns follow dims
+        self.codec = ParameterCodec(self.parameters_config, self.dims)
+        self.cache = None
+
+    @property
+    def da(self):
+        assert not isinstance(self.values, chunk_store.ChunkStore), "da is not available for a chunked dataset"
+        if self._da is None:
+            self._da = self.binary_to_dataarray(self.header, self.values)
+        return self._da
+
+    @staticmethod
+    def load_binary_data(path):
+        """ Load a binary dataset without copying the value tensor
+
+        Args:
+            path: file path of binary dataset
+
+        Returns:
+            da: xarray type, backed by the memory-mapped value tensor
+        """
+        header, values = data_store.load_binary(path)
+        return EvaluateFunction.binary_to_dataarray(header, values)
+
+    @staticmethod
+    def binary_to_dataarray(header, values):
+        """ Wrap the value tensor of a binary dataset in a DataArray
+
+        Args:
+            header: dict type, header of binary dataset, see data_store.py
+            values: value tensor of binary dataset
+
+        Returns:
+            da: xarray type, backed by values, or by a dequantized copy of values stored as int16
+        """
+        import xarray as xr
+
+        if isinstance(values, data_store.QuantizedTensor):
+            values = values.dequantize()
+        attrs = header["attrs"]
+        coords = {dim: attrs[dim]["coords"] for dim in header["dims"]}
+        return xr.DataArray(values, dims=header["data_dims"], coords=coords, attrs=attrs, name=header["name"])
+
+    def set_cache(self, cache):
+        """ Set the evaluation result cache, None to disable it
+
+        Args:
+            cache: an object with lookup(idx, values) -> scores, e.g. eval_cache.LRUCache
+        """
+        self.cache = cache
+
+    def get_coords_index(self, axis, value):
+        """ Get the index of the closest valid value in "coords" of a parameter
+
+        Args:
+            axis: index of the parameter in dims
+            value: parameter value
+
+        Returns:
+            idx: index in "coords", the first one in "coords" is used if two valid values are equally close
+        """
+        return self.codec.snap_index(axis, value)
+
     def evaluate(self, params):
         """ evaluate reward for a suggestion point
 
@@ -82,32 +199,68 @@ class EvaluateFunction():
         Returns:
             score: reward of the suggestion point
         """
-        for dim in self.dims:
-            assert dim in params, "missing parameter " + dim
+        # Convert parameters to indices of coordinates in "coords"
+        idx = self.codec.encode(params)
+        if self.cache is not None:
+            return self.cache.lookup(np.array([idx]), self.values)[0]
+
+        # Binary datasets may store float32 values, always return float64 scores
+        return np.array(self.values[idx], dtype=float)
+
+    def get_coords_indices(self, params):
+        """ Get the indices of the closest valid values in "coords" for a batch of suggestion points
+
+        Args:
+            params: suggestion points, a list of dicts in the form of {parameter_name: parameter_value, ... },
+                or a numpy.ndarray of shape (n_points, len(dims)) whose columns follow dims
+
+        Returns:
+            idx: numpy.ndarray of int, shape (n_points, len(dims)), indices in "coords" of every parameter
+        """
+        return self.codec.encode_many(params)
+
+    def evaluate_many(self, params):
+        """ evaluate rewards for a batch of suggestion points
 
-        def get_param_value(dim, value):
-            idx = np.abs(np.array(self.parameters_config[dim]["coords"]) - value).argmin()
-            return self.parameters_config[dim]["coords"][idx]
-        # Convert parameters to coordinates in "coords"
-        new_params = {dim: get_param_value(dim, params[dim]) for dim in self.dims}
+        Args:
+            params: suggestion points, see get_coords_indices
 
-        return self.da.loc[new_params].values
+        Returns:
+            scores: numpy.ndarray, shape (n_points, 14, 3), the last axis is (value, lower_bound, upper_bound)
+        """
+        idx = self.get_coords_indices(params)
+        if self.cache is not None:
+            return self.cache.lookup(idx, self.values)
+        return np.array(self.values[tuple(idx.T)], dtype=float)
 
     def evaluate_final(self, suggestions):
+        if len(suggestions) == 0:
+            return []
+        scores = self.evaluate_many([suggestion['parameter'] for suggestion in suggestions])
         evaluate_res = []
-        for suggestion in suggestions:
-            score_list = self.get_paramter_score(suggestion['parameter'])
+        for suggestion, score in zip(suggestions, scores):
             get_len = 1
             if 'reward' in suggestion:
                 get_len = len(suggestion['reward']) + 1
-            suggestion['reward'] = score_list[:get_len]
+            suggestion['reward'] = self.score_to_list(score[:get_len])
             evaluate_res.append(suggestion)
         return evaluate_res
 
     def get_paramter_score(self, paramter):
-        ori_score = self.evaluate(paramter)
+        return self.score_to_list(self.evaluate(paramter))
+
+    @staticmethod
+    def score_to_list(score):
+        """ Convert scores of a suggestion point to a list of dicts
+
+        Args:
+            score: numpy.ndarray, shape (n_iters, 3)
+
+        Returns:
+            score_list: list of dicts in the form of {'value': value, 'lower_bound': lower_bound, 'upper_bound': upper_bound}
+        """
         score_list = []
-        for s in ori_score:
+        for s in score:
             score_list.append({'value':s[0], 'lower_bound':s[1], 'upper_bound':s[2]})
         return score_list
 
@@ -0,0 +1,180 @@
+# coding=utf-8
+"""
+Import time of searchers, enabled by --import-report report.
+
+measure_import_time starts a new python process which imports the harness (thpo.run_search_one_time)
+and the searcher module in the same way as a repeat does, i.e. the cold start of a repeat in subprocess
+mode. The process runs with "-X importtime" (python >= 3.7), whose report on stderr is parsed into
+the import time of every module:
+    import time: self [us] | cumulative | imported package
+On older pythons only the harness and searcher totals are measured.
+
+run_search writes the report to result_root + REPORT_FILE, and main.py prints it.
+
+Usage:
+    python3 thpo/import_report.py -o example_bayesian_optimization --budget 1.0
+exits with 1 if the import time of the harness and the searcher is more than the budget in seconds,
+COLD_START_BUDGET by default. tests/test_import_budget.py enforces the budget on the example searchers.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+try:
+    import common
+except ModuleNotFoundError:
+    from . import common
+
+REPORT_FILE = "import_time.json"
+# Seconds of importing the harness and a searcher, heavy libraries are imported when they are used
+COLD_START_BUDGET = 1.0
+
+# Imports a repeat, then prints the seconds of the harness and of the searcher as json
+IMPORT_SCRIPT = """
+import sys, time, json
+sys.path.insert(0, ".")
+begin = time.perf_counter()
+from thpo.run_search_one_time import get_implement_searcher
+harness = time.perf_counter() - begin
+begin = time.perf_counter()
+get_implement_searcher(%r)
+searcher = time.perf_counter() - begin
+print(json.dumps({"harness": harness, "searcher": searcher}))
+"""
+
+
+def parse_importtime(text):
+    """ Parse the report of "python -X importtime"
+
+    Args:
+        text: stderr of the python process
+
+    Returns:
+        modules: list of dict type, in import order:
+            "module": module name
+            "self": seconds spent in the module itself
+            "cumulative": seconds including its imports
+            "depth": nesting depth, 0 for modules imported directly
+    """
+    modules = []
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        # the name is indented by 2 spaces per nesting level after the separator space
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append({
+            "module": name.strip(),
+            "self": int(fields[0]) / 1e6,
+            "cumulative": int(fields[1]) / 1e6,
+            "depth": max(depth, 0),
+        })
+    return modules
+
+
+def measure_import_time(searcher_root, timeout=600):
+    """ Measure the import time of the harness and a searcher in a new python process
+
+    Args:
+        searcher_root: directory of searcher
+        timeout: timeout in seconds
+
+    Returns:
+        report: dict type:
+            "searcher_root": searcher_root
+            "wall": seconds of the whole process, including interpreter startup
+            "harness": seconds of importing thpo.run_search_one_time
+            "searcher": seconds of importing the searcher module
+            "modules": list of modules, see parse_importtime, empty if not supported by the python
+    """
+    cmd = [common.PYTHONX, "-X", "importtime", "-c", IMPORT_SCRIPT % searcher_root]
+    begin = time.perf_counter()
+    status = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+    wall = time.perf_counter() - begin
+    stderr = status.stderr.decode("utf-8", "replace")
+    assert status.returncode == 0, "import failed: " + stderr[-2000:]
+    totals = json.loads(status.stdout.decode("utf-8").strip().splitlines()[-1])
+    report = {
+        "searcher_root": searcher_root,
+        "wall": wall,
+        "harness": totals["harness"],
+        "searcher": totals["searcher"],
+        "modules": parse_importtime(stderr),
+    }
+    return report
+
+
+def group_by_package(modules):
+    """ Sum the self seconds of modules by top level package
+
+    Returns:
+        packages: list of (package, seconds), most expensive first
+    """
+    packages = {}
+    for module in modules:
+        package = module["module"].split(".")[0]
+        packages[package] = packages.get(package, 0.0) + module["self"]
+    return sorted(packages.items(), key=lambda item: -item[1])
+
+
+def format_report(report, n_top=10):
+    """ Format a report as text
+
+    Args:
+        report: see measure_import_time
+        n_top: number of packages and modules listed
+
+    Returns:
+        text: string type
+    """
+    lines = ["searcher: %s wall: %.3fs harness: %.3fs searcher: %.3fs" % (
+        report["searcher_root"], report["wall"], report["harness"], report["searcher"])]
+    modules = report["modules"]
+    if len(modules) == 0:
+        lines.append("per module import time needs python >= 3.7 (-X importtime)")
+        return "\n".join(lines)
+    lines.append("top packages by self seconds:")
+    for package, seconds in group_by_package(modules)[:n_top]:
+        lines.append("  %8.4f %s" % (seconds, package))
+    lines.append("top modules by cumulative seconds:")
+    for module in sorted(modules, key=lambda module: -module["cumulative"])[:n_top]:
+        lines.append("  %8.4f %8.4f %s" % (module["cumulative"], module["self"], module["module"]))
+    return "\n".join(lines)
+
+
+def save_report(result_root, report):
+    with open(result_root + REPORT_FILE, "w") as f:
+        json.dump(report, f)
+
+
+def load_report(result_root):
+    """ Load the report of a run, None if there is none
+    """
+    path = result_root + REPORT_FILE
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="import time of the harness and a searcher")
+    parser.add_argument("-o", "--searcher-root", dest="searcher_root", required=True, type=str,
+                        help="searcher file directory")
+    parser.add_argument("--budget", dest="budget", type=float, default=COLD_START_BUDGET,
+                        help="maximum seconds of importing the harness and the searcher")
+    parser.add_argument("--top", dest="top", type=int, default=10, help="number of packages and modules listed")
+    args = parser.parse_args()
+    report = measure_import_time(args.searcher_root)
+    print(format_report(report, args.top))
+    cold_start = report["harness"] + report["searcher"]
+    if cold_start > args.budget:
+        print("cold start %.3fs is over the budget %.3fs" % (cold_start, args.budget))
+        sys.exit(1)
+    print("cold start %.3fs is within the budget %.3fs" % (cold_start, args.budget))
@@ -0,0 +1,135 @@
+# coding=utf-8
+"""
+Searcher on the coords lattice of parameters: sampling, conversion between Parameters and index matrices,
+and the visited points of a run.
+
+The judge runs a submitted searcher with its own stock thpo package, which only has AbstractSearcher.
+prepare_submission.sh ships this module and the modules it imports with the searcher, so a searcher imports
+IndexSearcher from its own directory first:
+    try:
+        from index_searcher import IndexSearcher
+    except ModuleNotFoundError:
+        from thpo.index_searcher import IndexSearcher
+"""
+import numpy as np
+
+from thpo.abstract_searcher import AbstractSearcher
+
+try:
+    import sampler
+    from param_codec import ParameterCodec
+    from visited_index import VisitedIndex
+except ModuleNotFoundError:
+    from . import sampler
+    from .param_codec import ParameterCodec
+    from .visited_index import VisitedIndex
+
+
+class IndexSearcher(AbstractSearcher):
+    """ Searcher abstract class with the coords lattice of parameters, see AbstractSearcher
+    """
+    def __init__(self, parameters_config, n_iteration, n_suggestion, random_seed=None):
+        """ Init searcher
+
+        Args:
+            parameters_config: parameters configuration, see AbstractSearcher
+            n_iteration: number of iterations
+            n_suggestion: number of suggestions to return
+            random_seed: seed of self.random_state used by sample_indices
+        """
+        AbstractSearcher.__init__(self, parameters_config, n_iteration, n_suggestion)
+
+        # Codec between Parameters and index matrices, columns follow the parameter names in sorted order
+        self.codec = ParameterCodec(parameters_config)
+        self.parameter_names = self.codec.names
+        self.random_state = np.random.RandomState(random_seed)
+
+        # Visited points (running, stopped and completed suggestions), see update_visited
+        self.visited = VisitedIndex(self.codec.shape)
+        self.n_visited_history = 0
+
+    def sample_indices(self, n_samples, method=sampler.SAMPLE_UNIFORM):
+        """ Sample points on the coords lattice
+
+        Args:
+            n_samples: number of points
+            method: "uniform", "lhs" (latin hypercube) or "sobol"
+
+        Returns:
+            indices: numpy.ndarray of int64, shape (n_samples, n_params),
+                indices[i, j] is the index of the value in the coords of self.parameter_names[j]
+        """
+        return sampler.sample_indices(self.codec.shape, n_samples, method, self.random_state)
+
+    def indices_to_values(self, indices):
+        """ Get the parameter values of an index matrix
+
+        Returns:
+            values: numpy.ndarray, shape (n_samples, n_params)
+        """
+        return self.codec.to_values(indices)
+
+    def indices_to_parameters(self, indices):
+        """ Convert an index matrix to Parameters, convert only the rows to return
+
+        Returns:
+            parameters: list of Parameter, in the form of [{name:value, name:value, ...}, ...]
+        """
+        return self.codec.decode_many(indices)
+
+    def parameters_to_indices(self, parameters):
+        """ Convert Parameters to an index matrix, values not in coords are snapped to the closest coords
+
+        Returns:
+            indices: numpy.ndarray of int64, shape (n_samples, n_params)
+        """
+        return self.codec.encode_many(parameters)
+
+    def update_visited(self, running_suggestions, suggestion_history):
+        """ Mark the running suggestions and the suggestions new in suggestion_history as visited,
+            suggestion_history only grows so its suggestions are marked once
+
+        Args:
+            running_suggestions: running suggestions, see suggest
+            suggestion_history: historical suggestions, see suggest
+        """
+        new_history = suggestion_history[self.n_visited_history:]
+        self.n_visited_history = len(suggestion_history)
+        parameters = [suggestion["parameter"] for suggestion in running_suggestions + new_history]
+        if len(parameters) > 0:
+            self.visited.add(self.parameters_to_indices(parameters))
+
+    def sample_unvisited(self, n_tries=100):
+        """ Sample a point that is not visited
+
+        Args:
+            n_tries: number of random points to try before searching all unvisited points
+
+        Returns:
+            index: numpy.ndarray of int64, shape (n_params,), a visited point if all points are visited
+        """
+        candidates = self.sample_indices(n_tries)
+        unvisited = ~self.visited.contains(candidates)
+        if unvisited.any():
+            return candidates[unvisited.argmax()]
+        if self.visited.is_full():
+            return candidates[0]
+        free_keys = np.setdiff1d(np.arange(self.visited.size), self.visited.visited_keys())
+        return self.visited.unpack([self.random_state.choice(free_keys)])[0]
+
+    def replace_visited(self, indices):
+        """ Replace the points that are visited or repeated by random unvisited points,
+            and mark the returned points as visited
+
+        Args:
+            indices: numpy.ndarray of int, shape (n, n_params), candidate points to suggest
+
+        Returns:
+            indices: numpy.ndarray of int64, shape (n, n_params), distinct points unless all points are visited
+        """
+        indices = np.array(indices, dtype=np.int64).reshape(-1, len(self.codec.shape))
+        for i in range(len(indices)):
+            if self.visited.contains(indices[i])[0]:
+                indices[i] = self.sample_unvisited()
+            self.visited.add(indices[i])
+        return indices
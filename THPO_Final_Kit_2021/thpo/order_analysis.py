@@ -0,0 +1,109 @@
+# coding=utf-8
+"""
+Pairwise order analysis of the values of every day, used to study how the order of
+configurations on early days agrees with the order on the last day (e.g. to tune prune_iters).
+"""
+import numpy as np
+
+# Maximum number of pairwise comparisons (pairs * days) held in memory at the same time
+MAX_BLOCK_ELEMENTS = 1 << 24
+
+
+def lexicographic_order(coords):
+    """ Get the order of points sorted lexicographically by parameter values
+
+    Args:
+        coords: numpy.ndarray, shape (n_points, n_dims), columns follow evaluator.dims
+
+    Returns:
+        order: indices of points, parameters are compared in the order of columns
+    """
+    coords = np.asarray(coords)
+    return np.lexsort(coords.T[::-1])
+
+
+def pairwise_order_stats(values, ref_day=-1, max_block_elements=MAX_BLOCK_ELEMENTS):
+    """ Compare the order of every pair of points on every day with the order on ref_day
+
+    Every unordered pair (i, j) with i < j is counted once, and the order of a pair on a day is
+    values[i, day] <= values[j, day], so the result depends on the order of points when there are ties.
+
+    Args:
+        values: numpy.ndarray, shape (n_points, n_days), e.g. means of every day
+        ref_day: the day whose order is the reference
+        max_block_elements: bound of pairs * days compared at the same time
+
+    Returns:
+        stats: dict type:
+            "n_pairs": number of pairs
+            "agree": shape (n_days,), number of pairs whose order on the day equals the order on ref_day
+            "concordant_minus_discordant": shape (n_days,), sum of sign products with ref_day
+            "ties": shape (n_days,), number of pairs with equal values on the day
+    """
+    values = np.asarray(values, dtype=float)
+    n_points, n_days = values.shape
+    ref = slice(ref_day % n_days, ref_day % n_days + 1)
+    agree = np.zeros(n_days, dtype=np.int64)
+    concordant_minus_discordant = np.zeros(n_days, dtype=np.int64)
+    ties = np.zeros(n_days, dtype=np.int64)
+
+    start = 0
+    while start < n_points - 1:
+        n_cols = n_points - start
+        block = max(1, min(n_cols, max_block_elements // (n_cols * n_days)))
+        end = start + block
+        rows = values[start:end]                    # (block, n_days)
+        cols = values[start:]                       # (n_cols, n_days)
+        # pair (start + r, start + k) is valid if k > r
+        valid = np.arange(n_cols)[None, :] > np.arange(block)[:, None]
+
+        less_equal = rows[:, None, :] <= cols[None, :, :]
+        same_order = (less_equal == less_equal[:, :, ref]) & valid[:, :, None]
+        agree += same_order.sum(axis=(0, 1))
+
+        sign = np.sign(cols[None, :, :] - rows[:, None, :]).astype(np.int8)
+        sign_product = sign * sign[:, :, ref] * valid[:, :, None]
+        concordant_minus_discordant += sign_product.sum(axis=(0, 1), dtype=np.int64)
+        ties += ((sign == 0) & valid[:, :, None]).sum(axis=(0, 1))
+        start = end
+
+    stats = {
+        "n_pairs": n_points * (n_points - 1) // 2,
+        "agree": agree,
+        "concordant_minus_discordant": concordant_minus_discordant,
+        "ties": ties,
+    }
+    return stats
+
+
+def order_agreement(values, coords=None, ref_day=-1, max_block_elements=MAX_BLOCK_ELEMENTS):
+    """ Agreement of the order on every day with the order on ref_day
+
+    Args:
+        values: numpy.ndarray, shape (n_points, n_days)
+        coords: numpy.ndarray, shape (n_points, n_dims). If it is given, each pair is oriented
+            by lexicographic parameter values, the same as the pair loops in explore_data
+        ref_day: the day whose order is the reference
+        max_block_elements: bound of pairs * days compared at the same time
+
+    Returns:
+        result: dict type:
+            "n_pairs": number of pairs
+            "agreement": shape (n_days,), fraction of pairs whose order agrees with ref_day
+            "kendall_tau": shape (n_days,), Kendall tau-b with ref_day, nan if all values of a day are equal
+    """
+    values = np.asarray(values)
+    if coords is not None:
+        values = values[lexicographic_order(coords)]
+    stats = pairwise_order_stats(values, ref_day, max_block_elements)
+    n_pairs, ties = stats["n_pairs"], stats["ties"]
+    denominator = np.sqrt((n_pairs - ties).astype(float) * (n_pairs - ties[ref_day]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        agreement = stats["agree"] / n_pairs
+        kendall_tau = stats["concordant_minus_discordant"] / denominator
+    result = {
+        "n_pairs": n_pairs,
+        "agreement": agreement,
+        "kendall_tau": kendall_tau,
+    }
+    return result
@@ -0,0 +1,140 @@
+# coding=utf-8
+"""
+Per-phase timing of run_search_one_time.
+
+Every repeat records a span per phase and iteration, and writes them to its trace file
+result_root + TRACE_DIR + "<name>.<repeat>.jsonl", one json line per span:
+    {"iter": iteration (0 before the first iteration), "phase": phase, "start": seconds since
+     the start of the repeat, "duration": seconds}
+load_summary sums the spans of the repeats 1 ... n_repeat of an evaluation function per phase, so trace
+files of earlier runs with more repeats in the same result directory are not counted.
+"""
+import os
+import json
+import time
+import contextlib
+
+TRACE_DIR = "trace/"
+
+# Phases of a repeat, in the order of run_search_one_time
+PHASE_LOAD = "load"
+PHASE_INIT = "init"
+PHASE_SUGGEST = "suggest"
+PHASE_EVALUATE = "evaluate_final"
+PHASE_EARLY_STOP = "is_early_stop"
+PHASE_BOOKKEEPING = "bookkeeping"
+PHASE_RESULT_WRITE = "result_write"
+PHASES = [PHASE_LOAD, PHASE_INIT, PHASE_SUGGEST, PHASE_EVALUATE, PHASE_EARLY_STOP,
+          PHASE_BOOKKEEPING, PHASE_RESULT_WRITE]
+
+
+class PhaseTimer():
+    """ Timing spans of one repeat
+
+    Usage:
+        timer = PhaseTimer()
+        with timer.span(PHASE_SUGGEST, iteration):
+            ...
+        suggest_time += timer.last_duration
+
+    Attributes:
+        spans: list of (iteration, phase, start, duration)
+        last_duration: duration of the last finished span in seconds
+    """
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.last_duration = 0.0
+
+    @contextlib.contextmanager
+    def span(self, phase, iteration=0):
+        """ Record the time spent in the with block as a span of phase
+        """
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.last_duration = end - begin
+            self.spans.append((iteration, phase, begin - self.origin, self.last_duration))
+
+    def totals(self):
+        """ Get the total seconds of every phase
+
+        Returns:
+            totals: dict type, phase -> seconds
+        """
+        totals = {}
+        for _, phase, _, duration in self.spans:
+            totals[phase] = totals.get(phase, 0.0) + duration
+        return totals
+
+    def save(self, result_root, eva_data_name, repeat_num):
+        """ Write the spans to the trace file of the repeat, see module docstring
+
+        Returns:
+            path: file path of the trace file
+        """
+        os.makedirs(result_root + TRACE_DIR, exist_ok=True)
+        path = get_trace_path(result_root, eva_data_name, repeat_num)
+        lines = [json.dumps({"iter": iteration, "phase": phase, "start": start, "duration": duration})
+                 for iteration, phase, start, duration in self.spans]
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+
+def get_trace_path(result_root, eva_data_name, repeat_num):
+    """ Get the trace file path of a repeat
+    """
+    return "%s%s%s.%d.jsonl" % (result_root, TRACE_DIR, eva_data_name, repeat_num)
+
+
+def load_summary(result_root, eva_data_name, n_repeat):
+    """ Sum the spans of the repeats of an evaluation function
+
+    Args:
+        result_root: result directory
+        eva_data_name: name of evaluation function
+        n_repeat: number of repetitions, trace files of the repeats 1 ... n_repeat are read
+
+    Returns:
+        summary: dict type, None if there is no trace file:
+            "n_repeat": number of trace files read
+            "total": dict type, phase -> seconds of all repeats
+    """
+    n_trace, total = 0, {}
+    for repeat_num in range(1, n_repeat + 1):
+        path = get_trace_path(result_root, eva_data_name, repeat_num)
+        if not os.path.exists(path):
+            continue
+        n_trace += 1
+        with open(path, "r") as f:
+            for line in f:
+                item = json.loads(line)
+                total[item["phase"]] = total.get(item["phase"], 0.0) + item["duration"]
+    if n_trace == 0:
+        return None
+    return {"n_repeat": n_trace, "total": total}
+
+
+def format_summary(summaries):
+    """ Format the summaries of evaluation functions as a table of seconds per repeat of every phase
+
+    Args:
+        summaries: list of (eva_data_name, summary), see load_summary
+
+    Returns:
+        table: string type
+    """
+    phases = list(PHASES)
+    for _, summary in summaries:
+        phases += [phase for phase in summary["total"] if phase not in phases]
+    header = "%-12s %6s" % ("func", "repeat") + "".join(" %14s" % phase for phase in phases) + " %10s" % "total"
+    rows = [header]
+    for name, summary in summaries:
+        n_repeat = summary["n_repeat"]
+        seconds = [summary["total"].get(phase, 0.0) / n_repeat for phase in phases]
+        row = "%-12s %6d" % (name, n_repeat) + "".join(" %14.4f" % s for s in seconds) + " %10.4f" % sum(seconds)
+        rows.append(row)
+    return "\n".join(rows)
@@ -0,0 +1,181 @@
+# coding=utf-8
+"""
+Sampling profiler of repeats, enabled by --profile sample.
+
+A daemon thread samples the stack of the thread running the repeat every SAMPLE_INTERVAL seconds.
+Stacks are saved in the collapsed format of flame graph tools, one line per distinct stack:
+    frame;frame;...;frame count
+from the outermost frame to the innermost one, every frame is "function (file:line)". Stacks start
+at the function that started the sampler, so that profiles of warm and subprocess modes are comparable.
+
+Every repeat writes result_root + PROFILE_DIR + "<searcher>.<name>.<repeat>.collapsed", and
+run_search merges the files of all repeats to result_root + PROFILE_DIR + "<searcher>.collapsed",
+which can be rendered by e.g. flamegraph.pl or speedscope.
+"""
+import os
+import sys
+import threading
+import collections
+
+PROFILE_DIR = "profile/"
+COLLAPSED_SUFFIX = ".collapsed"
+SAMPLE_INTERVAL = 0.005
+
+
+def frame_label(frame):
+    """ Label of a frame, "function (file:line)", file is shortened to its last two path components
+    """
+    code = frame.f_code
+    file_name = "/".join(code.co_filename.replace("\\", "/").split("/")[-2:])
+    return "%s (%s:%d)" % (code.co_name, file_name, frame.f_lineno)
+
+
+class StackSampler():
+    """ Sampling profiler of one thread
+
+    Usage:
+        sampler = StackSampler()
+        sampler.start()
+        ...
+        sampler.stop()
+        sampler.save(path)
+
+    Attributes:
+        counts: collections.Counter, collapsed stack -> number of samples
+    """
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts = collections.Counter()
+        self.thread_id = None
+        self.root_code = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """ Start sampling the current thread, stacks start at the caller
+        """
+        self.thread_id = threading.get_ident()
+        self.root_code = sys._getframe(1).f_code
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="thpo-stack-sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """ Stop sampling
+        """
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                if frame.f_code is self.root_code:
+                    break
+                frame = frame.f_back
+            self.counts[";".join(reversed(stack))] += 1
+
+    def save(self, path):
+        """ Write the samples in the collapsed format
+        """
+        save_collapsed(path, self.counts)
+
+
+def save_collapsed(path, counts):
+    """ Write collapsed stacks, most sampled first
+
+    Args:
+        path: output file path
+        counts: dict type, collapsed stack -> number of samples
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp_path, "w") as f:
+        for stack, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+            f.write("%s %d\n" % (stack, count))
+    os.replace(tmp_path, path)
+
+
+def load_collapsed(path):
+    """ Read collapsed stacks
+
+    Returns:
+        counts: collections.Counter, collapsed stack -> number of samples
+    """
+    counts = collections.Counter()
+    with open(path, "r") as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack:
+                counts[stack] += int(count)
+    return counts
+
+
+def get_profile_path(result_root, searcher_name, eva_data_name=None, repeat_num=None):
+    """ Get the profile path of a repeat, or the merged profile path of a searcher if eva_data_name is None
+    """
+    if eva_data_name is None:
+        return result_root + PROFILE_DIR + searcher_name + COLLAPSED_SUFFIX
+    return "%s%s%s.%s.%d%s" % (result_root, PROFILE_DIR, searcher_name, eva_data_name, repeat_num, COLLAPSED_SUFFIX)
+
+
+def get_searcher_name(searcher_root):
+    """ Name of a searcher in profile file names, the last component of its directory
+    """
+    return os.path.basename(os.path.normpath(searcher_root))
+
+
+def merge_profiles(result_root, searcher_name, eva_func_list, n_repeat):
+    """ Merge the profiles of all repeats of a searcher
+
+    Args:
+        result_root: result directory
+        searcher_name: name of searcher, see get_searcher_name
+        eva_func_list: names of evaluation functions
+        n_repeat: number of repetitions
+
+    Returns:
+        path: file path of the merged profile, None if there is no profile of any repeat
+    """
+    counts = collections.Counter()
+    n_profile = 0
+    for eva_data_name in eva_func_list:
+        for repeat_num in range(1, n_repeat + 1):
+            path = get_profile_path(result_root, searcher_name, eva_data_name, repeat_num)
+            if os.path.exists(path):
+                counts.update(load_collapsed(path))
+                n_profile += 1
+    if n_profile == 0:
+        return None
+    path = get_profile_path(result_root, searcher_name)
+    save_collapsed(path, counts)
+    return path
+
+
+def top_frames(counts, n_top=10, self_time=True):
+    """ Get the most sampled frames
+
+    Args:
+        counts: dict type, collapsed stack -> number of samples
+        n_top: number of frames
+        self_time: count the innermost frame of stacks only if True, otherwise every frame on stacks
+
+    Returns:
+        frames: list of (frame, number of samples, fraction of all samples)
+    """
+    frame_counts = collections.Counter()
+    for stack, count in counts.items():
+        frames = stack.split(";")
+        if self_time:
+            frame_counts[frames[-1]] += count
+        else:
+            for frame in set(frames):
+                frame_counts[frame] += count
+    total = max(1, sum(counts.values()))
+    return [(frame, count, count / total) for frame, count in frame_counts.most_common(n_top)]
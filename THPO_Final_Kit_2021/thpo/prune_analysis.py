@@ -0,0 +1,152 @@
+# coding=utf-8
+"""
+Simulation of early stop (prune) rules on the whole data set, used to choose prune_method,
+prune_top_n and prune_eta of pku_dair_openbox_final.
+
+A prune decision is made for a candidate on every day, it is correct if the final value
+(mean on the last day) of the candidate is worse than the target value.
+"""
+import numpy as np
+
+VALUE, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+
+def pairwise_threshold_stats(bound, final, targets, target_index=None):
+    """ Count prune decisions "bound < target" of every (candidate, target) pair on every day
+
+    Args:
+        bound: numpy.ndarray, shape (n_candidates, n_days), e.g. upper bounds of candidates
+        final: numpy.ndarray, shape (n_candidates,), final values of candidates
+        targets: numpy.ndarray, shape (n_targets,), target values
+        target_index: numpy.ndarray of int, shape (n_candidates,), index of the candidate in targets
+            or -1, pairs of a candidate and itself are skipped
+
+    Returns:
+        stats: dict type:
+            "n_pairs": number of pairs
+            "pruned": shape (n_days,), number of pairs with bound < target
+            "correct": shape (n_days,), number of pairs with bound < target and final < target
+    """
+    bound = np.asarray(bound, dtype=float)
+    final = np.asarray(final, dtype=float)
+    sorted_targets = np.sort(np.asarray(targets, dtype=float))
+    n_targets = len(sorted_targets)
+
+    # number of targets greater than x
+    def n_greater(x):
+        return n_targets - np.searchsorted(sorted_targets, x, side='right')
+
+    pruned = n_greater(bound)
+    correct = n_greater(np.maximum(bound, final[:, None]))
+    n_pairs = len(final) * n_targets
+    if target_index is not None:
+        is_target = np.asarray(target_index) >= 0
+        # a candidate is never a correct prune of itself
+        pruned = pruned - ((bound < final[:, None]) & is_target[:, None])
+        n_pairs -= int(is_target.sum())
+
+    stats = {
+        "n_pairs": n_pairs,
+        "pruned": pruned.sum(axis=0),
+        "correct": correct.sum(axis=0),
+    }
+    return stats
+
+
+def upper_bound_rule(scores, target_value, eta=None):
+    """ prune_method 'upper_bound': prune if the upper bound is worse than target_value
+
+    Args:
+        scores: numpy.ndarray, shape (n_candidates, n_days, 3)
+        target_value: value of the top n-th candidate
+
+    Returns:
+        pruned: numpy.ndarray of bool, shape (n_candidates, n_days)
+    """
+    return scores[:, :, UPPER_BOUND] < target_value
+
+
+def mean_rank_rule(scores, target_value=None, eta=2):
+    """ prune_method 'mean_rank': prune if the mean ranks out of the top 1/eta of all candidates on the day
+
+    Args:
+        scores: numpy.ndarray, shape (n_candidates, n_days, 3)
+        eta: prune_eta
+
+    Returns:
+        pruned: numpy.ndarray of bool, shape (n_candidates, n_days)
+    """
+    means = scores[:, :, VALUE]
+    n_candidates = means.shape[0]
+    sorted_means = np.sort(means, axis=0)
+    # rank: number of candidates with a greater mean on the day
+    rank = np.empty(means.shape, dtype=np.int64)
+    for day in range(means.shape[1]):
+        rank[:, day] = n_candidates - np.searchsorted(sorted_means[:, day], means[:, day], side='right')
+    return rank / n_candidates >= 1 / eta
+
+
+def mixed_rule(scores, target_value, eta=2):
+    """ prune only if both 'upper_bound' and 'mean_rank' prune
+    """
+    return upper_bound_rule(scores, target_value) & mean_rank_rule(scores, eta=eta)
+
+
+PRUNE_RULES = {
+    'upper_bound': upper_bound_rule,
+    'mean_rank': mean_rank_rule,
+    'mixed': mixed_rule,
+}
+
+
+def prune_rule_curves(scores, final, rule='upper_bound', candidate_sizes=(1000,), top_ns=(10,), eta=2):
+    """ Precision, recall and wasted budget of a prune rule on every day
+
+    Candidates are the top candidate_size points sorted by final value. A candidate should be pruned
+    if it is not better than the top n-th candidate.
+
+    Args:
+        scores: numpy.ndarray, shape (n_points, n_days, 3), see data_utils.get_all_scores
+        final: numpy.ndarray, shape (n_points,), final values of points
+        rule: name in PRUNE_RULES, or a function(scores, target_value, eta) -> pruned
+        candidate_sizes: list of candidate set sizes
+        top_ns: list of prune_top_n
+        eta: prune_eta
+
+    Returns:
+        curves: dict type, every value has shape (len(candidate_sizes), len(top_ns), n_days):
+            "precision": correct prunes / prunes
+            "recall": correct prunes / candidates that should be pruned
+            "false_prune_rate": prunes of candidates that should not be pruned / such candidates
+            "wasted_budget": fraction of the budget (n_candidates * n_days) spent on candidates
+                that should be pruned, if the rule is applied on the day
+    """
+    rule_func = PRUNE_RULES[rule] if isinstance(rule, str) else rule
+    final = np.asarray(final, dtype=float)
+    n_days = scores.shape[1]
+    order = np.argsort(-final, kind='stable')
+    shape = (len(candidate_sizes), len(top_ns), n_days)
+    curves = {key: np.full(shape, np.nan) for key in ['precision', 'recall', 'false_prune_rate', 'wasted_budget']}
+    spent = np.arange(1, n_days + 1)
+
+    for i, candidate_size in enumerate(candidate_sizes):
+        candidate_idx = order[:candidate_size]
+        candidate_scores = np.asarray(scores[candidate_idx], dtype=float)
+        candidate_final = final[candidate_idx]
+        for j, top_n in enumerate(top_ns):
+            assert top_n <= candidate_size, "top_n is more than candidate_size"
+            target_value = candidate_final[top_n - 1]
+            pruned = rule_func(candidate_scores, target_value, eta=eta)
+            should = (candidate_final < target_value)[:, None]
+
+            n_pruned = pruned.sum(axis=0)
+            n_correct = (pruned & should).sum(axis=0)
+            n_should = should.sum()
+            n_keep = candidate_size - n_should
+            with np.errstate(divide='ignore', invalid='ignore'):
+                curves['precision'][i, j] = n_correct / n_pruned
+                curves['recall'][i, j] = n_correct / n_should
+                curves['false_prune_rate'][i, j] = (n_pruned - n_correct) / n_keep
+            wasted = np.where(pruned, spent, n_days) * should
+            curves['wasted_budget'][i, j] = wasted.sum(axis=0) / (candidate_size * n_days)
+    return curves
@@ -0,0 +1,190 @@
+# coding=utf-8
+"""
+Verification of the quantized storage of value tensors (see data_store.get_quantization) against
+calculate_reward.
+
+Every reward read by the harness is one number of the value tensor, so a quantization with a maximum
+absolute error e changes every reward by at most e, and so does every step of calculate_reward before
+the normalization:
+    best_reward: a maximum over iterations, changed by at most e
+    mean_reward: a mean of sorted best rewards, sorting and mean change by at most e
+    best_reward_normed, normed_mean: (x - rand_perf) / (best - rand_perf) with best and rand_perf from the
+        unquantized baseline, changed by at most e / (best - rand_perf), clipping does not increase it
+    mean_normed_mean: changed by at most the mean of e / (best - rand_perf) of the evaluation functions
+Two rewards (or repeats, or searchers) can only swap their order if they differ by at most twice the bound.
+
+For every dataset the check quantizes the value tensor of its json dataset, verifies that the dequantized
+tensor is within the documented max_abs_error, then runs calculate_reward (compute_reward) on the rewards
+of random searches read from the float64 and the dequantized tensors, and verifies the bounds and the
+orders of repeats. It passes if the bound of the final score is within the tolerance.
+The check covers the rewards of the same suggestions, a searcher may suggest differently on quantized values.
+
+Usage:
+    python3 thpo/quantization_check.py -dr ./input/ -d data-30 data-2 --dtype int16 --tolerance 1e-3
+exits with 1 if the check fails.
+"""
+import sys
+import json
+import argparse
+import numpy as np
+
+sys.path.append(".")
+import thpo.common as common
+from thpo import data_store
+from thpo.reward_calculation import get_baseline_perf, compute_reward
+from thpo.run_search_one_time import confidence_iteration_count
+
+# float64 rounding of the normalization
+_SLACK = 1e-9
+
+
+def load_reference(path):
+    """ Load the float64 value tensor of a json dataset
+    """
+    with open(path, "r") as f:
+        _, values = data_store.decode_dataset(json.load(f))
+    return values
+
+
+def random_rewards(rewards_a, rewards_b, all_iter, n_repeat, random_state):
+    """ Rewards of random searches on two reward lattices of the same points
+
+    Half of the repeats draw points uniformly, the other half from the best percent of points of rewards_a,
+    where the orders of repeats are closest.
+
+    Returns:
+        origin_a: numpy.ndarray, shape [all_iter, n_repeat]
+        origin_b: numpy.ndarray, shape [all_iter, n_repeat]
+    """
+    flat_a, flat_b = rewards_a.ravel(), rewards_b.ravel()
+    top = np.argsort(flat_a)[-max(1, flat_a.size // 100):]
+    points = np.empty([all_iter, n_repeat], dtype=np.int64)
+    for repeat in range(n_repeat):
+        if repeat % 2 == 0:
+            points[:, repeat] = random_state.randint(flat_a.size, size=all_iter)
+        else:
+            points[:, repeat] = top[random_state.randint(len(top), size=all_iter)]
+    return flat_a[points], flat_b[points]
+
+
+def count_order_flips(reference, quantized, max_gap):
+    """ Count the pairs of repeats whose order differs, and those of them more than max_gap apart in reference
+
+    Args:
+        reference: numpy.ndarray, shape [n_function, n_repeat]
+        quantized: numpy.ndarray, the same shape as reference
+        max_gap: numpy.ndarray, shape [n_function], gaps allowed to swap
+
+    Returns:
+        n_flips: number of pairs in a different order
+        n_violations: number of pairs in a different order and more than max_gap apart
+    """
+    n_flips, n_violations = 0, 0
+    for ref, quant, gap in zip(reference, quantized, max_gap):
+        ref_diff = ref[:, np.newaxis] - ref[np.newaxis, :]
+        quant_diff = quant[:, np.newaxis] - quant[np.newaxis, :]
+        flipped = np.sign(ref_diff) != np.sign(quant_diff)
+        n_flips += int(np.count_nonzero(np.triu(flipped, 1)))
+        n_violations += int(np.count_nonzero(np.triu(flipped & (np.abs(ref_diff) > gap + _SLACK), 1)))
+    return n_flips, n_violations
+
+
+def check_quantization(data_root, data, dtype, tolerance, n_repeat=10, all_iter=100, n_trials=20, seed=0):
+    """ Check the quantization of datasets against calculate_reward
+
+    Args:
+        data_root: data set directory
+        data: list of data set file names
+        dtype: storage dtype, "float32" or "int16"
+        tolerance: maximum change of the final score
+        n_repeat: number of repetitions of a random search
+        all_iter: number of rewards of a repetition
+        n_trials: number of random searches
+        seed: random seed
+
+    Returns:
+        passed: True if every check passes
+        lines: report lines
+    """
+    args = {common.CmdArgs.data_root: data_root, common.CmdArgs.data: list(data)}
+    best, rand_perf = get_baseline_perf(args)
+    passed = True
+    lines = []
+    rewards_ref, rewards_quant = [], []
+    max_abs_error = np.zeros([len(data)])
+    for idx, data_name in enumerate(data):
+        reference = load_reference(data_root + data_name)
+        quantization = data_store.get_quantization(dtype, *data_store.value_range(reference))
+        dequantized = data_store.dequantize(data_store.quantize(reference, quantization), quantization)
+        same_nan = np.array_equal(np.isnan(reference), np.isnan(dequantized))
+        observed = float(np.nanmax(np.abs(dequantized - reference))) if same_nan else np.inf
+        max_abs_error[idx] = quantization["max_abs_error"]
+        ok = observed <= max_abs_error[idx]
+        passed = passed and ok
+        lines.append("func: %s dtype: %s max_abs_error: %.3g observed: %.3g normalized bound: %.3g %s" % (
+            data_name, dtype, max_abs_error[idx], observed, max_abs_error[idx] / (best[idx] - rand_perf[idx]),
+            "ok" if ok else "FAILED"))
+        # the reward of a suggestion is its value after confidence_iteration_count iterations
+        rewards_ref.append(reference[..., confidence_iteration_count - 1, 0])
+        rewards_quant.append(dequantized[..., confidence_iteration_count - 1, 0])
+
+    bound = max_abs_error / (best - rand_perf)
+    bounds = {
+        "best_reward": max_abs_error[:, np.newaxis],
+        "mean_reward": max_abs_error,
+        "best_reward_normed": bound[:, np.newaxis],
+        "normed_mean": bound,
+    }
+    final_bound = float(np.mean(bound))
+    max_diff = {key: 0.0 for key in list(bounds) + ["final score"]}
+    n_flips, n_violations = 0, 0
+    random_state = np.random.RandomState(seed)
+    for _ in range(n_trials):
+        origin_ref = np.zeros([len(data), all_iter, n_repeat])
+        origin_quant = np.zeros([len(data), all_iter, n_repeat])
+        for idx in range(len(data)):
+            origin_ref[idx], origin_quant[idx] = random_rewards(rewards_ref[idx], rewards_quant[idx], all_iter,
+                                                                n_repeat, random_state)
+        result_ref, score_ref = compute_reward(origin_ref, best, rand_perf)
+        result_quant, score_quant = compute_reward(origin_quant, best, rand_perf)
+        for key, key_bound in bounds.items():
+            diff = np.abs(result_quant[key] - result_ref[key])
+            max_diff[key] = max(max_diff[key], float(np.max(diff)))
+            passed = passed and bool(np.all(diff <= key_bound + _SLACK))
+        max_diff["final score"] = max(max_diff["final score"], abs(score_quant - score_ref))
+        passed = passed and abs(score_quant - score_ref) <= final_bound + _SLACK
+        flips, violations = count_order_flips(result_ref["best_reward"], result_quant["best_reward"],
+                                              2 * max_abs_error)
+        n_flips, n_violations = n_flips + flips, n_violations + violations
+    passed = passed and n_violations == 0
+
+    for key, diff in max_diff.items():
+        lines.append("max change of %s: %.3g" % (key, diff))
+    lines.append("repeat pairs in a different order: %d, more than twice max_abs_error apart: %d" % (
+        n_flips, n_violations))
+    lines.append("final score bound: %.3g tolerance: %.3g" % (final_bound, tolerance))
+    passed = passed and final_bound <= tolerance
+    return passed, lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="check the quantized storage of datasets against calculate_reward")
+    parser.add_argument("-dr", "--data-root", dest="data_root", type=str, default="./input/",
+                        help="data set directory")
+    parser.add_argument("-d", "--data", dest="data", required=True, type=str, nargs="+",
+                        help="data set file name")
+    parser.add_argument("--dtype", dest="dtype", type=str, default="int16", choices=["float32", "int16"],
+                        help="storage dtype of the value tensor")
+    parser.add_argument("--tolerance", dest="tolerance", type=float, default=1e-3,
+                        help="maximum change of the final score")
+    parser.add_argument("-r", "--repeat", dest="n_repeat", type=int, default=10,
+                        help="number of repetitions of a random search")
+    parser.add_argument("-a", "--all_iter", dest="all_iter", type=int, default=100,
+                        help="number of rewards of a repetition")
+    parser.add_argument("--trials", dest="n_trials", type=int, default=20, help="number of random searches")
+    args = parser.parse_args()
+    passed, lines = check_quantization(args.data_root, args.data, args.dtype, args.tolerance,
+                                       args.n_repeat, args.all_iter, args.n_trials)
+    print("\n".join(lines))
+    print("quantization check:", "ok" if passed else "FAILED")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,137 @@
+# coding=utf-8
+"""
+Result files of searchers.
+
+The result file of an evaluation function (result_root + name) holds one json record per line:
+    {"fun": name, "repeat": repeat number, "iter": iteration, "param": parameter, "reward": reward}
+Repeats running in parallel append to the same file, so the records of a repeat are buffered by
+ResultWriter and appended by a single write, then synced to disk.
+
+Next to it, the binary record file (result_root + name + RECORD_SUFFIX) holds the same records as
+packed RECORD_DTYPE rows (repeat, iter, reward) without the parameters, which load_rewards reads
+in one call instead of parsing every json line.
+"""
+import os
+import json
+import numpy as np
+
+RECORD_SUFFIX = ".rec"
+RECORD_DTYPE = np.dtype([("repeat", "<i4"), ("iter", "<i4"), ("reward", "<f8")])
+
+
+def append_file(path, data):
+    """ Append bytes to a file by a single write on a file opened with O_APPEND, then sync it to disk
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        written = 0
+        while written < len(data):
+            written += os.write(fd, data[written:])
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def load_rewards(path, all_iter, n_repeat, init_score):
+    """ Load the rewards of a result file
+
+    The binary record file of the result file is used if it exists, otherwise the json records are parsed.
+
+    Args:
+        path: result file path
+        all_iter: number of iterations
+        n_repeat: number of repetitions
+        init_score: reward of iterations without records
+
+    Returns:
+        rewards: numpy.ndarray, shape (all_iter, n_repeat)
+    """
+    rewards = np.full([all_iter, n_repeat], init_score, dtype=float)
+    if os.path.exists(path + RECORD_SUFFIX):
+        records = np.fromfile(path + RECORD_SUFFIX, dtype=RECORD_DTYPE)
+    elif os.path.exists(path):
+        with open(path, "r") as result_file:
+            items = [json.loads(line) for line in result_file]
+        records = np.array([(p["repeat"], p["iter"], p["reward"]) for p in items], dtype=RECORD_DTYPE)
+    else:
+        return rewards
+    # Records out of range are dropped, the last record of an (iter, repeat) pair wins
+    valid = (records["iter"] >= 1) & (records["iter"] <= all_iter) & \
+            (records["repeat"] >= 1) & (records["repeat"] <= n_repeat)
+    records = records[valid]
+    rewards[records["iter"] - 1, records["repeat"] - 1] = records["reward"]
+    return rewards
+
+
+class ResultWriter():
+    """ Buffered writer of the records of one repeat
+
+    Records are kept in memory until close (or the end of a with block), which appends them to the
+    result file and to the binary record file by a single write each on files opened with O_APPEND,
+    so records of parallel repeats never interleave, and a repeat killed before close leaves no partial records.
+
+    Usage:
+        with ResultWriter(result_file_name, eva_data_name, repeat_num) as writer:
+            writer.add(iteration, parameter, reward)
+    """
+    def __init__(self, path, eva_data_name, repeat_num, verbose=True):
+        """
+        Args:
+            path: result file path
+            eva_data_name: name of evaluation function
+            repeat_num: repetition number
+            verbose: print the records when they are written
+        """
+        self.path = path
+        self.eva_data_name = eva_data_name
+        self.repeat_num = repeat_num
+        self.verbose = verbose
+        self.lines = []
+        self.records = []
+        self.logs = []
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def add(self, iteration, suggestion, reward):
+        """ Buffer the record of a suggestion
+
+        Args:
+            iteration: iteration number of the record, starts from 1
+            suggestion: parameter of the suggestion
+            reward: reward of the suggestion
+        """
+        item = {
+            'fun': self.eva_data_name,
+            "repeat": self.repeat_num,
+            'iter': iteration,
+            'param': suggestion,
+            'reward': reward,
+        }
+        self.lines.append(json.dumps(item) + '\n')
+        self.records.append((self.repeat_num, iteration, reward))
+        if self.verbose:
+            self.logs.append("fun:%7s, run:%2d, iter:%2d, suggest:%s reward:%f" % (
+                self.eva_data_name, self.repeat_num, iteration, str(suggestion), reward))
+
+    def flush(self):
+        """ Append the buffered records to the result file and the binary record file
+        """
+        if len(self.lines) == 0:
+            return
+        append_file(self.path, ''.join(self.lines).encode('utf-8'))
+        append_file(self.path + RECORD_SUFFIX, np.array(self.records, dtype=RECORD_DTYPE).tobytes())
+        if self.verbose:
+            print('\n'.join(self.logs))
+        self.lines, self.records, self.logs = [], [], []
+
+    def close(self):
+        """ Flush the buffered records, the writer can not be used afterwards
+        """
+        if not self.closed:
+            self.flush()
+            self.closed = True
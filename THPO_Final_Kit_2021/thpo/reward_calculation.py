@@ -1,10 +1,9 @@
 # coding=utf-8
-import os
-import json
 import numpy as np
 
 import thpo.common as common
-from thpo.evaluate_function import EvaluateFunction
+from thpo.data_store import load_metadata
+from thpo.result_store import load_rewards
 
 
 def calculate_reward(args):
@@ -25,6 +24,21 @@ def calculate_reward(args):
     """
     best, rand_perf = get_baseline_perf(args)
     origin_reward = get_origin_reward(args)
+    return compute_reward(origin_reward, best, rand_perf)
+
+
+def compute_reward(origin_reward, best, rand_perf):
+    """ Calculate rewards from the rewards of every iteration, see calculate_reward
+
+    Args:
+        origin_reward: searcher rewards, see get_origin_reward
+        best: best rewards of every evaluation function
+        rand_perf: random searcher median rewards of every evaluation function
+
+    Return:
+        course_result: dict type, see calculate_reward
+        mean_normed_mean: final reward
+    """
     # Calculate rewards of every repeat on every evaluation function
     accumulate_reward = np.maximum.accumulate(origin_reward, axis=1)
     best_reward = accumulate_reward[:, -1, :]
@@ -57,6 +71,19 @@ def calculate_reward(args):
     return course_result, mean_normed_mean
 
 
+def get_baseline(args, eva_func_name):
+    """ Get the baseline of an evaluation function without loading its value tensor
+
+    Args:
+        args: arguments for running searching task
+        eva_func_name: name of evaluation function
+
+    Return:
+        baseline: dict type, see EvaluateFunction
+    """
+    return load_metadata(args[common.CmdArgs.data_root] + str(eva_func_name))["baseline"]
+
+
 def get_baseline_perf(args):
     """ Get baseline performance of every evaluation function
 
@@ -67,17 +94,15 @@ def get_baseline_perf(args):
         best: best rewards of every evaluation function
         rand_perf: random searcher median rewards of every evaluation function
     """
-    all_iter = args[common.CmdArgs.all_iters]
     eva_func_list = args[common.CmdArgs.data]
     n_function = len(eva_func_list)
     best = np.zeros([n_function])
     rand_perf = np.zeros([n_function])
     for idx, eva_func_name in enumerate(eva_func_list):
-        eva_func_file = args[common.CmdArgs.data_root] + str(eva_func_name)
-        eva = EvaluateFunction(eva_func_file, all_iter)
-        rand_median_perf, _, best_opt, _ = eva.get_baseline()
-        best[idx] = best_opt
-        rand_perf[idx] = rand_median_perf[-1]
+        baseline = get_baseline(args, eva_func_name)
+        best[idx] = baseline["best"]
+        # the same as EvaluateFunction.get_baseline, which keeps the first 100 iterations
+        rand_perf[idx] = baseline["median"][0:100][-1]
     return best, rand_perf
 
 
@@ -97,15 +122,8 @@ def get_origin_reward(args):
     n_function = len(eva_func_list)
     origin_reward = np.zeros([n_function, all_iter, n_repeat])
     for idx, eva_func_name in enumerate(eva_func_list):
-        eva_func_file = args[common.CmdArgs.data_root] + str(eva_func_name)
-        eva = EvaluateFunction(eva_func_file, all_iter)
-        function_reward = np.full([all_iter, n_repeat], eva.get_init_score(), dtype=float)
+        init_score = get_baseline(args, eva_func_name)["worst"]
         result_file_name = args[common.CmdArgs.result_root] + eva_func_name
-        if os.path.exists(result_file_name):
-            with open(result_file_name, "r") as result_file:
-                for line in result_file:
-                    p = json.loads(line)
-                    function_reward[p["iter"] - 1, p["repeat"] - 1] = p["reward"]
-        origin_reward[idx] = function_reward
+        origin_reward[idx] = load_rewards(result_file_name, all_iter, n_repeat, init_score)
     return origin_reward
 
@@ -1,16 +1,26 @@
 # coding=utf-8
+import os
 import copy
+import shutil
 import traceback
+import multiprocessing
+import multiprocessing.util
 
 from concurrent.futures import ProcessPoolExecutor, wait, ALL_COMPLETED
 from subprocess import run, PIPE, TimeoutExpired
 
 import thpo.common as common
+import thpo.eval_cache as eval_cache
+import thpo.profiler as profiler
+import thpo.import_report as import_report
 
 
 def run_search(args):
     """ Evaluate the searcher on all evaluation functions
 
+    Every (evaluation function, repeat) pair is an independent task. Tasks of larger evaluation
+    functions are submitted first, and results are aggregated per evaluation function in repeat order.
+
     Args:
         args: arguments for running searching task
 
@@ -22,63 +32,257 @@ def run_search(args):
     eva_func_list = args[common.CmdArgs.data]
     n_function = len(eva_func_list)
     n_repeat = args[common.CmdArgs.n_repeat]
-    process_list = []
-    workers = min(args[common.CmdArgs.worker], n_function)
+    task_list = schedule_tasks(args)
+    process_dict = {}
+    workers = min(args[common.CmdArgs.worker], len(task_list))
+    # Bound the threads of every searcher process before it is launched, so that
+    # workers * threads does not oversubscribe the cores
+    n_threads = common.get_threads_per_worker(workers)
+    common.set_thread_env(n_threads)
+    print("run_search cpu:", common.get_cpu_count(), "workers:", workers, "threads per worker:", n_threads)
+    if args.get(common.CmdArgs.import_report) == common.IMPORT_REPORT_ON:
+        try:
+            report = import_report.measure_import_time(args[common.CmdArgs.searcher_root])
+            import_report.save_report(args[common.CmdArgs.result_root], report)
+        except Exception:
+            print(traceback.format_exc())
     err_code, err_msg, timeout_count = common.SEARCH_SUCCESS, "", 0
     with ProcessPoolExecutor(max_workers=workers) as t:
-        for func_idx in eva_func_list:
-            task = t.submit(search_in_function, args, func_idx)
-            process_list.append(task)
-        wait(process_list, return_when=ALL_COMPLETED)
-        for idx, task in enumerate(process_list):
+        if args[common.CmdArgs.run_mode] == common.RUN_MODE_WARM:
+            search_func = search_one_repeat_warm
+        else:
+            search_func = search_one_repeat
+        for eva_func_name, repear_num in task_list:
+            task = t.submit(search_func, args, eva_func_name, repear_num)
+            process_dict[(eva_func_name, repear_num)] = task
+        wait(process_dict.values(), return_when=ALL_COMPLETED)
+        for eva_func_name in eva_func_list:
             try:
-                err_code, err_msg, t_count = task.result()
-                if t_count > 0:
+                func_err_code, func_err_msg = common.SEARCH_SUCCESS, ""
+                for repear_num in range(1, n_repeat+1):
+                    r_err_code, r_err_msg, t_count = process_dict[(eva_func_name, repear_num)].result()
+                    if r_err_code != common.SEARCH_SUCCESS:
+                        func_err_code, func_err_msg = r_err_code, r_err_msg
                     timeout_count = timeout_count + t_count
+                err_code, err_msg = func_err_code, func_err_msg
             except Exception as e:
                 print(traceback.format_exc())
                 err_code, err_msg = common.OTHER_ERROR, "other error "+repr(e)
-                print("task timeout %s , %s", eva_func_list[idx], e)
+                print("task timeout %s , %s", eva_func_name, e)
     if err_code == common.RUN_TIMEOUT:
         err_msg = "timeout rate " + str(timeout_count/(n_repeat*n_function))
+    if args.get(common.CmdArgs.eval_cache) == common.EVAL_CACHE_SHARED:
+        # The shared evaluation result cache only lives within the run
+        shutil.rmtree(args[common.CmdArgs.result_root] + eval_cache.SHARED_CACHE_DIR, ignore_errors=True)
+    if args.get(common.CmdArgs.profile) == common.PROFILE_SAMPLE:
+        searcher_name = profiler.get_searcher_name(args[common.CmdArgs.searcher_root])
+        profile_path = profiler.merge_profiles(args[common.CmdArgs.result_root], searcher_name, eva_func_list, n_repeat)
+        print("run_search profile:", profile_path)
     return err_code, err_msg
 
 
-def search_in_function(args, eva_func_name):
-    """ Evaluate the searcher on one evaluation function
+def schedule_tasks(args):
+    """ Get all (evaluation function, repeat) tasks, longest job first
+
+    The size of the data set file is used as the cost of its repeats.
+
+    Args:
+        args: arguments for running searching task
+
+    Returns:
+        task_list: list of (eva_func_name, repear_num)
+    """
+    eva_func_list = args[common.CmdArgs.data]
+    n_repeat = args[common.CmdArgs.n_repeat]
+
+    def get_size(eva_func_name):
+        path = args[common.CmdArgs.data_root] + str(eva_func_name)
+        return os.path.getsize(path) if os.path.exists(path) else 0
+    sizes = {eva_func_name: get_size(eva_func_name) for eva_func_name in eva_func_list}
+    task_list = [(eva_func_name, repear_num) for eva_func_name in eva_func_list
+                 for repear_num in range(1, n_repeat+1)]
+    task_list.sort(key=lambda task: -sizes[task[0]])
+    return task_list
+
+
+def search_one_repeat(args, eva_func_name, repear_num):
+    """ Evaluate the searcher on one evaluation function for one repeat in a new python process
 
     Args:
         args: arguments for running searching task
         eva_func_name: Name of evaluation function
+        repear_num: repetition number
 
     Returns:
         err_code: error code of searching task
         err_msg: error message of searching task
-        timeout_count: the number of timeouts
+        timeout_count: the number of timeouts, 0 or 1
     """
     err_code, err_msg = common.SEARCH_SUCCESS, ""
     timeout_count = 0
-    n_repeat = args[common.CmdArgs.n_repeat]
 
     timeout = args[common.CmdArgs.timeout] + 10
-    for repear_num in range(1, n_repeat+1):
+    cur_args = copy.deepcopy(args)
+    cur_args[common.CmdArgs.data] = str(eva_func_name)
+    cur_args[common.CmdArgs.repear_num] = repear_num
+    run_cmd = common.PYTHONX + " ./thpo/run_search_one_time.py " + common.args_to_str(cur_args)
+    print("search_one_repeat run_cmd:", run_cmd)
+    try:
+        status = run(run_cmd, stderr=PIPE, shell=True, timeout=timeout)
+        if status.returncode != 0:
+            print("status:", str(status.stderr))
+            err_code, err_msg = status.returncode, str(status.stderr)
+            if err_code == common.RUN_TIMEOUT:
+                timeout_count = timeout_count + 1
+    except TimeoutExpired:
+        err_code, err_msg = common.RUN_TIMEOUT, "Run timeout"
+        timeout_count = timeout_count + 1
+        print("run search fun:", str(eva_func_name), "repeat:", str(repear_num),
+            "timeout limit", str(timeout), "seconds.")
+
+    return err_code, err_msg, timeout_count
+
+
+def warm_worker(args, conn):
+    """ Warm worker process, loads the searcher class once, then runs the repeats received from conn
+        in-process with a new searcher each time. The evaluation function of the last repeat is kept for the
+        next one, repeats of an evaluation function are consecutive (see schedule_tasks), so every evaluation
+        function is loaded about once per worker while only one of them is in memory
+
+    Args:
+        args: arguments for running searching task
+        conn: connection to receive (eva_func_name, repear_num) (None to exit) and send back (err_code, err_msg)
+    """
+    from thpo.run_search_one_time import get_implement_searcher, run_search_one_time, create_evaluate_function
+
+    search_class = get_implement_searcher(args[common.CmdArgs.searcher_root])
+    eva_name, eva = None, None
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        eva_func_name, repear_num = task
         cur_args = copy.deepcopy(args)
         cur_args[common.CmdArgs.data] = str(eva_func_name)
         cur_args[common.CmdArgs.repear_num] = repear_num
-        run_cmd = common.PYTHONX + " ./thpo/run_search_one_time.py " + common.args_to_str(cur_args)
-        print("search_in_function run_cmd:", run_cmd)
         try:
-            status = run(run_cmd, stderr=PIPE, shell=True, timeout=timeout)
-            if status.returncode != 0:
-                print("status:", str(status.stderr))
-                err_code, err_msg = status.returncode, str(status.stderr)
-                if err_code == common.RUN_TIMEOUT:
-                    timeout_count = timeout_count + 1
-                continue
-        except TimeoutExpired:
-            err_code, err_msg = common.RUN_TIMEOUT, "Run timeout"
-            timeout_count = timeout_count + 1
-            print("run search fun:", str(eva_func_name), "repeat:", str(repear_num),
-                "timeout limit", str(timeout), "seconds.")
+            if eva_func_name != eva_name:
+                # release the previous value tensor before loading the next one
+                eva_name, eva = None, None
+                eva = create_evaluate_function(args, eva_func_name)
+                eva_name = eva_func_name
+            err_code, err_msg = run_search_one_time(cur_args, search_class, str(eva_func_name), repear_num, eva)
+        except MemoryError as e:
+            print(traceback.format_exc())
+            err_code, err_msg = common.OUT_OF_MEMORY_ERROR, repr(e)
+        except Exception as e:
+            print(traceback.format_exc())
+            err_code, err_msg = common.RUNTIME_ERROR, repr(e)
+        conn.send((err_code, err_msg))
+    conn.close()
+
+
+def start_warm_worker(args):
+    """ Start a warm worker process. It is a new python process rather than a fork, so that
+        numerical libraries are imported after the thread environment variables are set
+
+    Returns:
+        process: the worker process
+        conn: connection to the worker process
+    """
+    ctx = multiprocessing.get_context("spawn")
+    conn, worker_conn = ctx.Pipe()
+    process = ctx.Process(target=warm_worker, args=(args, worker_conn))
+    process.start()
+    worker_conn.close()
+    return process, conn
+
+
+def stop_warm_worker(process, conn, force=False):
+    """ Stop a warm worker process, kill it if force is True
+    """
+    if force:
+        process.kill()
+    else:
+        try:
+            conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+    process.join()
+    conn.close()
+
+
+# The warm worker owned by the current process, it is stopped when the current process exits
+_warm_worker = None
+
+
+def get_warm_worker(args):
+    """ Get the warm worker of the current process, start it if there is none
+    """
+    global _warm_worker
+    if _warm_worker is None:
+        _warm_worker = start_warm_worker(args)
+        multiprocessing.util.Finalize(None, release_warm_worker, exitpriority=10)
+    return _warm_worker
+
+
+def release_warm_worker(force=False):
+    """ Stop the warm worker of the current process
+    """
+    global _warm_worker
+    if _warm_worker is not None:
+        process, conn = _warm_worker
+        _warm_worker = None
+        stop_warm_worker(process, conn, force)
+
+
+def search_one_repeat_warm(args, eva_func_name, repear_num):
+    """ Evaluate the searcher on one evaluation function for one repeat with the warm worker
+        of the current process, the same as search_one_repeat but without launching a python process.
+        The worker is killed if the repeat runs out of time or the worker dies, and restarted on next use.
 
+    Args:
+        args: arguments for running searching task
+        eva_func_name: Name of evaluation function
+        repear_num: repetition number
+
+    Returns:
+        err_code: error code of searching task
+        err_msg: error message of searching task
+        timeout_count: the number of timeouts, 0 or 1
+    """
+    err_code, err_msg = common.SEARCH_SUCCESS, ""
+    timeout_count = 0
+
+    timeout = args[common.CmdArgs.timeout] + 10
+    process, conn = get_warm_worker(args)
+    print("search_one_repeat_warm fun:", str(eva_func_name), "repeat:", str(repear_num))
+    try:
+        conn.send((eva_func_name, repear_num))
+        if not conn.poll(timeout):
+            raise TimeoutError
+        status_code, status_msg = conn.recv()
+    except TimeoutError:
+        err_code, err_msg = common.RUN_TIMEOUT, "Run timeout"
+        timeout_count = timeout_count + 1
+        print("run search fun:", str(eva_func_name), "repeat:", str(repear_num),
+            "timeout limit", str(timeout), "seconds.")
+        release_warm_worker(force=True)
+        return err_code, err_msg, timeout_count
+    except (EOFError, BrokenPipeError):
+        process.join()
+        err_code, err_msg = common.RUNTIME_ERROR, "warm worker exit with code " + str(process.exitcode)
+        print("status:", err_msg)
+        release_warm_worker(force=True)
+        return err_code, err_msg, timeout_count
+
+    if status_code != common.SEARCH_SUCCESS:
+        print("status:", str(status_msg))
+        err_code, err_msg = status_code, str(status_msg)
+        if err_code == common.RUN_TIMEOUT:
+            timeout_count = timeout_count + 1
     return err_code, err_msg, timeout_count
+
@@ -2,14 +2,19 @@
 import os
 import sys
 import importlib
-import time
-import json
 import traceback
 
-from collections import Iterable
+from collections.abc import Iterable
 
 sys.path.append(".")
 import thpo.common as common
+import thpo.eval_cache as eval_cache
+import thpo.chunk_store as chunk_store
+import thpo.phase_timer as phase_timer
+from thpo.phase_timer import PhaseTimer
+from thpo.result_store import ResultWriter
+import thpo.profiler as profiler
+from thpo.profiler import StackSampler
 from thpo.evaluate_function import EvaluateFunction
 
 
@@ -32,18 +37,27 @@ def get_implement_searcher(searcher_root):
     return ip_module_class
 
 
-def save_to_result_file(result_file, eva_data_name, repeat_num, iteration, suggestion, reward):
-    item = {
-        'fun': eva_data_name,
-        "repeat": repeat_num,
-        'iter': iteration,
-        'param': suggestion,
-        'reward': reward,
-    }
-    item_str = json.dumps(item)
-    result_file.write(item_str + '\n')
-    print("fun:%7s, run:%2d, iter:%2d, suggest:%s reward:%f" % (
-        eva_data_name, repeat_num, iteration, str(suggestion), reward))
+def create_evaluate_function(args, eva_data_name):
+    """ Load an evaluation function from data_root with the backend and the evaluation result cache of args
+
+    Args:
+        args: arguments for running search job
+        eva_data_name: name of evaluation function
+
+    Returns:
+        eva: EvaluateFunction
+    """
+    backend = args.get(common.CmdArgs.eval_backend, common.EVAL_BACKEND_AUTO)
+    chunk_cache_bytes = args.get(common.CmdArgs.chunk_cache_size, 256) * 1024 * 1024
+    quantized = args.get(common.CmdArgs.storage, common.STORAGE_EXACT) == common.STORAGE_QUANTIZED
+    eva = EvaluateFunction(args[common.CmdArgs.data_root] + str(eva_data_name), 100, backend, chunk_cache_bytes,
+                           quantized)
+    cache_mode = args.get(common.CmdArgs.eval_cache, common.EVAL_CACHE_NONE)
+    max_bytes = args.get(common.CmdArgs.cache_size, 64) * 1024 * 1024
+    eva.set_cache(eval_cache.create_cache(cache_mode, eva.values.shape, str(eva_data_name),
+                                          args[common.CmdArgs.result_root], max_bytes))
+    return eva
+
 
 def suggest_new(searcher, iteration_number, running_suggestions, suggestions_history, need_suggestions_count):
     try:
@@ -67,21 +81,42 @@ def suggest_new(searcher, iteration_number, running_suggestions, suggestions_his
         print(iteration_number, "get new suggest ", next_suggestion, " into running, cur running:", len(running_suggestions), " cur hist:", len(suggestions_history))
     return running_suggestions, common.SEARCH_SUCCESS, ""
 
-def run_search_one_time(args, search_class, eva_data_name, repeat_num):
-    """ Evaluate searcher for one repeat
+def run_search_one_time(args, search_class, eva_data_name, repeat_num, eva=None):
+    """ Evaluate searcher for one repeat, under the profiler of args if it is set
 
     Args:
         args: arguments for running search job
         search_class: searcher class
         eva_data_name: name of evaluation function
         repeat_num: number of repetitions
+        eva: loaded evaluation function of eva_data_name, loaded from data_root if it is None
+    """
+    if args.get(common.CmdArgs.profile, common.PROFILE_NONE) != common.PROFILE_SAMPLE:
+        return run_repeat(args, search_class, eva_data_name, repeat_num, eva)
+    sampler = StackSampler()
+    sampler.start()
+    try:
+        return run_repeat(args, search_class, eva_data_name, repeat_num, eva)
+    finally:
+        sampler.stop()
+        searcher_name = profiler.get_searcher_name(args[common.CmdArgs.searcher_root])
+        sampler.save(profiler.get_profile_path(args[common.CmdArgs.result_root], searcher_name,
+                                               eva_data_name, repeat_num))
+
+
+def run_repeat(args, search_class, eva_data_name, repeat_num, eva=None):
+    """ Evaluate searcher for one repeat, see run_search_one_time
     """
     n_iteration = args[common.CmdArgs.n_iteration]
     n_suggestions = args[common.CmdArgs.n_suggestions]
-    path = args[common.CmdArgs.data_root] + str(eva_data_name)
-    eva = EvaluateFunction(path, 100)
+    # Timing spans of every phase, written to the trace file of the repeat
+    timer = PhaseTimer()
+    with timer.span(phase_timer.PHASE_LOAD):
+        if eva is None:
+            eva = create_evaluate_function(args, eva_data_name)
     try:
-        searcher = search_class(eva.parameters_config, n_iteration, n_suggestions)
+        with timer.span(phase_timer.PHASE_INIT):
+            searcher = search_class(eva.parameters_config, n_iteration, n_suggestions)
     except Exception as e:
         print(traceback.format_exc())
         err_msg = "SuggestException search_class " + repr(e)
@@ -89,70 +124,84 @@ def run_search_one_time(args, search_class, eva_data_name, repeat_num):
 
     running_suggestions, suggestions_history = [], []
     suggest_time = 0
-    result_file_name = args[common.CmdArgs.result_root] + eva_data_name
-    result_file = open(result_file_name, 'a')
     err_code, err_msg = common.SEARCH_SUCCESS, ""
     for iteration_number in range(1, n_iteration+1):
-        begin_time = time.time()
-        # Step 1. Judge need new suggestions or not
-        need_suggestions_count = n_suggestions - len(running_suggestions)
-        if need_suggestions_count > 0:
-            # Step 2 Suggest new suggestions
-            running_suggestions, err_code, err_msg = suggest_new(searcher, iteration_number, 
-                running_suggestions, suggestions_history, need_suggestions_count)
-        suggest_time = suggest_time + time.time() - begin_time
+        with timer.span(phase_timer.PHASE_SUGGEST, iteration_number):
+            # Step 1. Judge need new suggestions or not
+            need_suggestions_count = n_suggestions - len(running_suggestions)
+            if need_suggestions_count > 0:
+                # Step 2 Suggest new suggestions
+                running_suggestions, err_code, err_msg = suggest_new(searcher, iteration_number, 
+                    running_suggestions, suggestions_history, need_suggestions_count)
+        suggest_time = suggest_time + timer.last_duration
         if suggest_time > args[common.CmdArgs.timeout]:
             err_code = common.RUN_TIMEOUT
             # timeout to break out the loop
             break
 
         # Step 3. Get the suggestions reward of the running suggestions on the iteration
-        try:
-            running_suggestions = eva.evaluate_final(running_suggestions)
-        except Exception as e:
-            print(traceback.format_exc())
-            err_code, err_msg = common.SUGGEST_EVALUATE_ERROR, "EvaluateException " + repr(e)
+        with timer.span(phase_timer.PHASE_EVALUATE, iteration_number):
+            try:
+                running_suggestions = eva.evaluate_final(running_suggestions)
+            except Exception as e:
+                print(traceback.format_exc())
+                err_code, err_msg = common.SUGGEST_EVALUATE_ERROR, "EvaluateException " + repr(e)
 
         # Step 4. Judge running suggestions need early stop or not
         need_stops = [False] * n_suggestions
-        begin_time = time.time()
-        try:
-            ret_need_stops = searcher.is_early_stop(iteration_number, running_suggestions, suggestions_history)
-            for i, need_stop in enumerate(ret_need_stops):
-                if need_stop and i < len(need_stops):
-                    need_stops[i] = True
-        except Exception as e:
-            print(traceback.format_exc())
-            err_code, err_msg = common.SUGGEST_EVALUATE_ERROR, "EvaluateException " + repr(e)
-        suggest_time = suggest_time + time.time() - begin_time
+        with timer.span(phase_timer.PHASE_EARLY_STOP, iteration_number):
+            try:
+                ret_need_stops = searcher.is_early_stop(iteration_number, running_suggestions, suggestions_history)
+                for i, need_stop in enumerate(ret_need_stops):
+                    if need_stop and i < len(need_stops):
+                        need_stops[i] = True
+            except Exception as e:
+                print(traceback.format_exc())
+                err_code, err_msg = common.SUGGEST_EVALUATE_ERROR, "EvaluateException " + repr(e)
+        suggest_time = suggest_time + timer.last_duration
         if suggest_time > args[common.CmdArgs.timeout]:
             err_code = common.RUN_TIMEOUT
             # timeout to break out the loop
             break
 
-        # Step 5. Add suggestions that have run 14 iters into the suggestions history
-        for i, suggest in enumerate(running_suggestions):
-            if len(suggest['reward']) >= confidence_iteration_count:
-                need_stops[i] = True
+        with timer.span(phase_timer.PHASE_BOOKKEEPING, iteration_number):
+            # Step 5. Add suggestions that have run 14 iters into the suggestions history
+            for i, suggest in enumerate(running_suggestions):
+                if len(suggest['reward']) >= confidence_iteration_count:
+                    need_stops[i] = True
 
-        # Step 6. Stop running suggestions and put then into the suggestions history
-        for i in range(len(need_stops)-1, -1, -1):
-            if need_stops[i]:
-                is_early = len(running_suggestions[i]['reward']) >= confidence_iteration_count
-                print(iteration_number, "14 iteration stop:", is_early, running_suggestions[i],
-                    " put into history, cur hist:", len(suggestions_history))
-                suggestions_history.append(running_suggestions[i])
-                running_suggestions.remove(running_suggestions[i])
+            # Step 6. Stop running suggestions and put then into the suggestions history
+            for i in range(len(need_stops)-1, -1, -1):
+                if need_stops[i]:
+                    is_early = len(running_suggestions[i]['reward']) >= confidence_iteration_count
+                    print(iteration_number, "14 iteration stop:", is_early, running_suggestions[i],
+                        " put into history, cur hist:", len(suggestions_history))
+                    suggestions_history.append(running_suggestions[i])
+                    running_suggestions.remove(running_suggestions[i])
 
     print("\n\nrun_search_one_time", eva_data_name, "repeat:", repeat_num, "result:")
     save_idx = 1
-    for idx, suggestion in enumerate(suggestions_history):
-        print("fun:%7s, run:%2d, iter:%2d, suggest:%s" % (eva.get_name(), repeat_num, idx, str(suggestion)))
-        if len(suggestion['reward']) >= confidence_iteration_count:
-            reward = suggestion['reward'][-1]['value']
-            save_to_result_file(result_file, eva_data_name, repeat_num, save_idx, suggestion['parameter'], reward)
-            save_idx = save_idx + 1
-
+    result_file_name = args[common.CmdArgs.result_root] + eva_data_name
+    # Records of the repeat are appended to the result file at once when the writer is closed
+    with timer.span(phase_timer.PHASE_RESULT_WRITE), \
+            ResultWriter(result_file_name, eva_data_name, repeat_num) as writer:
+        for idx, suggestion in enumerate(suggestions_history):
+            print("fun:%7s, run:%2d, iter:%2d, suggest:%s" % (eva.get_name(), repeat_num, idx, str(suggestion)))
+            if len(suggestion['reward']) >= confidence_iteration_count:
+                reward = suggestion['reward'][-1]['value']
+                writer.add(save_idx, suggestion['parameter'], reward)
+                save_idx = save_idx + 1
+
+    if eva.cache is not None:
+        cache_stats = eva.cache.pop_stats()
+        eval_cache.save_stats(args[common.CmdArgs.result_root], eva_data_name, repeat_num, cache_stats)
+        print("run_search_one_time", eva_data_name, "repeat:", repeat_num, "cache:", cache_stats)
+    if args.get(common.CmdArgs.eval_backend) == common.EVAL_BACKEND_CHUNKED:
+        chunk_stats = eva.values.pop_stats()
+        chunk_store.save_stats(args[common.CmdArgs.result_root], eva_data_name, repeat_num, chunk_stats)
+        print("run_search_one_time", eva_data_name, "repeat:", repeat_num, "chunk cache:", chunk_stats)
+    timer.save(args[common.CmdArgs.result_root], eva_data_name, repeat_num)
+    print("run_search_one_time", eva_data_name, "repeat:", repeat_num, "phase seconds:", timer.totals())
     print("run_search_one_time", eva_data_name, "repeat:", repeat_num, "done")
     return err_code, err_msg
 
@@ -0,0 +1,140 @@
+# coding=utf-8
+"""
+Samplers of points on the coords lattice of parameters.
+
+A sample is a row of an integer index matrix of shape (n_samples, n_params), whose i-th column is
+the index of the value in the coords of the i-th parameter. Every method draws from a unit hypercube
+design and maps it to the lattice, so each coords index is drawn with equal probability.
+"""
+import numpy as np
+
+SAMPLE_UNIFORM = "uniform"
+SAMPLE_LHS = "lhs"
+SAMPLE_SOBOL = "sobol"
+SAMPLE_METHODS = [SAMPLE_UNIFORM, SAMPLE_LHS, SAMPLE_SOBOL]
+
+_SOBOL_BITS = 32
+# Primitive polynomials and initial direction numbers of Sobol sequence (Joe and Kuo, new-joe-kuo-6.21201),
+# (degree s, coefficients a, m_1 ... m_s) of dimensions 2, 3 ..., dimension 1 uses m_i = 1
+_SOBOL_DIRECTIONS = [
+    (1, 0, [1]),
+    (2, 1, [1, 3]),
+    (3, 1, [1, 3, 1]),
+    (3, 2, [1, 1, 1]),
+    (4, 1, [1, 1, 3, 3]),
+    (4, 4, [1, 3, 5, 13]),
+    (5, 2, [1, 1, 5, 5, 17]),
+    (5, 4, [1, 1, 5, 5, 5]),
+    (5, 7, [1, 1, 7, 11, 19]),
+    (5, 11, [1, 1, 5, 1, 1]),
+    (5, 13, [1, 1, 1, 3, 11]),
+    (5, 14, [1, 3, 5, 5, 31]),
+]
+MAX_SOBOL_DIMS = len(_SOBOL_DIRECTIONS) + 1
+
+
+def get_random_state(random_state=None):
+    """ Get a numpy.random.RandomState from a seed or a RandomState
+    """
+    if isinstance(random_state, np.random.RandomState):
+        return random_state
+    return np.random.RandomState(random_state)
+
+
+def uniform_design(n_samples, n_dims, random_state=None):
+    """ Independent uniform points in [0, 1)^n_dims
+    """
+    rng = get_random_state(random_state)
+    return rng.random_sample((n_samples, n_dims))
+
+
+def latin_hypercube_design(n_samples, n_dims, random_state=None):
+    """ Latin hypercube points in [0, 1)^n_dims, every dimension has one point in each of n_samples strata
+    """
+    rng = get_random_state(random_state)
+    design = np.empty((n_samples, n_dims))
+    for dim in range(n_dims):
+        design[:, dim] = (rng.permutation(n_samples) + rng.random_sample(n_samples)) / n_samples
+    return design
+
+
+def sobol_direction_numbers(n_dims):
+    """ Direction numbers of the first n_dims dimensions of Sobol sequence
+
+    Returns:
+        directions: numpy.ndarray of uint64, shape (n_dims, _SOBOL_BITS)
+    """
+    if n_dims > MAX_SOBOL_DIMS:
+        raise ValueError("sobol design supports at most %d parameters, got %d" % (MAX_SOBOL_DIMS, n_dims))
+    directions = np.zeros((n_dims, _SOBOL_BITS), dtype=np.uint64)
+    for dim in range(n_dims):
+        if dim == 0:
+            s, a, m = _SOBOL_BITS, 0, [1] * _SOBOL_BITS
+        else:
+            s, a, m = _SOBOL_DIRECTIONS[dim - 1]
+        v = [0] * _SOBOL_BITS
+        for i in range(_SOBOL_BITS):
+            if i < s:
+                v[i] = m[i] << (_SOBOL_BITS - 1 - i)
+            else:
+                v[i] = v[i - s] ^ (v[i - s] >> s)
+                for k in range(1, s):
+                    if (a >> (s - 1 - k)) & 1:
+                        v[i] ^= v[i - k]
+        directions[dim] = v
+    return directions
+
+
+def sobol_design(n_samples, n_dims, random_state=None, scramble=True):
+    """ Sobol points in [0, 1)^n_dims, starting from the first point of the sequence
+
+    Args:
+        n_samples: number of points
+        n_dims: number of dimensions, at most MAX_SOBOL_DIMS
+        random_state: seed or numpy.random.RandomState of the random digital shift
+        scramble: apply a random digital shift (xor with a random integer per dimension)
+
+    Returns:
+        design: numpy.ndarray, shape (n_samples, n_dims)
+    """
+    directions = sobol_direction_numbers(n_dims)
+    index = np.arange(n_samples, dtype=np.uint64)
+    gray = index ^ (index >> np.uint64(1))
+    points = np.zeros((n_samples, n_dims), dtype=np.uint64)
+    for bit in range(_SOBOL_BITS):
+        has_bit = ((gray >> np.uint64(bit)) & np.uint64(1)).astype(bool)
+        if not has_bit.any():
+            break
+        points[has_bit] ^= directions[:, bit]
+    if scramble:
+        rng = get_random_state(random_state)
+        shift = rng.randint(0, 1 << 16, size=(2, n_dims)).astype(np.uint64)
+        points ^= (shift[0] << np.uint64(16)) | shift[1]
+    return points / float(1 << _SOBOL_BITS)
+
+
+_DESIGNS = {
+    SAMPLE_UNIFORM: uniform_design,
+    SAMPLE_LHS: latin_hypercube_design,
+    SAMPLE_SOBOL: sobol_design,
+}
+
+
+def sample_indices(shape, n_samples, method=SAMPLE_UNIFORM, random_state=None):
+    """ Sample points on a lattice
+
+    Args:
+        shape: list of int, number of coords of every parameter
+        n_samples: number of points
+        method: one of SAMPLE_METHODS
+        random_state: seed or numpy.random.RandomState
+
+    Returns:
+        indices: numpy.ndarray of int64, shape (n_samples, len(shape))
+    """
+    if method not in _DESIGNS:
+        raise ValueError("unknown sample method %s, expected one of %s" % (method, SAMPLE_METHODS))
+    shape = np.asarray(shape, dtype=np.int64)
+    design = _DESIGNS[method](n_samples, len(shape), random_state)
+    indices = np.floor(design * shape).astype(np.int64)
+    return np.minimum(indices, shape - 1)
@@ -0,0 +1,60 @@
+# coding=utf-8
+import numpy as np
+
+
+class VisitedIndex():
+    """ Set of visited points of the coords lattice
+
+    A point is a row of indices in "coords" of every parameter (see ParameterCodec), it is keyed by
+    the packed integer of its row, i.e. its flat index in the C-ordered lattice.
+
+    Attributes:
+        shape: tuple of int, number of coords of every parameter
+        size: number of points of the lattice
+        keys: set of packed integers of visited points
+    """
+    def __init__(self, shape):
+        self.shape = tuple(int(n) for n in shape)
+        self.size = int(np.prod(self.shape))
+        self.keys = set()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def pack(self, indices):
+        """ Pack rows of indices to integers
+
+        Args:
+            indices: numpy.ndarray of int, shape (n, len(shape)), or one row
+
+        Returns:
+            keys: numpy.ndarray of int64, shape (n,)
+        """
+        indices = np.asarray(indices, dtype=np.int64).reshape(-1, len(self.shape))
+        return np.ravel_multi_index(indices.T, self.shape)
+
+    def unpack(self, keys):
+        """ Unpack integers to rows of indices
+        """
+        return np.stack(np.unravel_index(np.asarray(keys, dtype=np.int64), self.shape), axis=1)
+
+    def add(self, indices):
+        """ Mark rows of indices as visited
+        """
+        self.keys.update(self.pack(indices).tolist())
+
+    def contains(self, indices):
+        """ Test whether rows of indices are visited
+
+        Returns:
+            visited: numpy.ndarray of bool, shape (n,)
+        """
+        return np.array([key in self.keys for key in self.pack(indices).tolist()], dtype=bool)
+
+    def visited_keys(self):
+        """ Get the packed integers of visited points, sorted
+        """
+        return np.array(sorted(self.keys), dtype=np.int64)
+
+    def is_full(self):
+        return len(self.keys) >= self.size
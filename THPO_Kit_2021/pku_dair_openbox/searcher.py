@@ -1,6 +1,7 @@
 # coding=utf-8
 import os
-NUM_THREADS = "2"
+# Threads per worker are given by the harness in THPO_NUM_THREADS, 2 if it is not set
+NUM_THREADS = os.environ.get("THPO_NUM_THREADS", "2")
 os.environ["OMP_NUM_THREADS"] = NUM_THREADS         # export OMP_NUM_THREADS=1
 os.environ["OPENBLAS_NUM_THREADS"] = NUM_THREADS    # export OPENBLAS_NUM_THREADS=1
 os.environ["MKL_NUM_THREADS"] = NUM_THREADS         # export MKL_NUM_THREADS=1
@@ -9,6 +10,11 @@ os.environ["NUMEXPR_NUM_THREADS"] = NUM_THREADS     # export NUMEXPR_NUM_THREADS
 
 # Need to import the searcher abstract class, the following are essential
 from thpo.abstract_searcher import AbstractSearcher
+try:
+    # The judge runs the searcher with its own thpo, so prepare_submission.sh ships param_codec.py with it
+    from param_codec import ParameterCodec
+except ModuleNotFoundError:
+    from thpo.param_codec import ParameterCodec
 
 from openbox import space as sp
 from openbox import Observation
@@ -61,6 +67,7 @@ class Searcher(AbstractSearcher):
         n_suggestion: number of suggestions to return
         """
         AbstractSearcher.__init__(self, parameters_config, n_iter, n_suggestion)
+        self.codec = ParameterCodec(parameters_config)
 
         self.config_space = self.get_config_space(parameters_config)
         self.advisor = SyncBatchAdvisor(
@@ -90,9 +97,7 @@ class Searcher(AbstractSearcher):
         Parameter: a dict in the form of {name:value, name:value, ...}. for example:
                             {'p1': 0, 'p2': 0, 'p3': 0}
         """
-        para_dict = dict()
-        for name, v in parameter.items():
-            para_dict[name] = self.parameters_config[name]['coords'].index(v)
+        para_dict = dict(zip(self.codec.names, self.codec.encode(parameter)))
         config = get_config_from_dict(para_dict, self.config_space)
         return config
 
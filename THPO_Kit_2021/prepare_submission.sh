@@ -19,6 +19,11 @@ echo $UPLOAD_DIR
 
 cp -r -n $CODE_DIR ./$UPLOAD_DIR
 
+# ship the modules of thpo that searchers import from their own directory first,
+# the judge only provides the stock thpo package
+SHARED_MODULES="thpo/param_codec.py"
+cp -n $SHARED_MODULES ./$UPLOAD_DIR/
+
 # touch requirements.txt
 REQUIREMENTS_FILE=./$UPLOAD_DIR/requirements.txt
 touch $REQUIREMENTS_FILE
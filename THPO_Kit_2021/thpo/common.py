@@ -22,6 +22,13 @@ OUT_OF_MEMORY_ERROR = ERROR_START + 9
 RUNTIME_ERROR = ERROR_START + 10
 
 
+# Environment variables bounding the threads of numerical libraries (BLAS, OpenMP ...) in a process.
+# They only take effect if set before the libraries are imported, so the harness sets them before
+# launching searcher processes. THPO_NUM_THREADS tells searchers the threads per worker.
+NUM_THREADS_ENV = "THPO_NUM_THREADS"
+THREAD_ENV_VARS = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                   "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS", NUM_THREADS_ENV]
+
 class CmdArgs(IntEnum):
     uuid = auto()
     searcher_root = auto()
@@ -130,3 +137,35 @@ def args_to_str(args):
         args_str.append(short_name)
         args_str.append(str(value))
     return ' '.join(args_str)
+
+
+def get_cpu_count():
+    """ Get the number of cores available to the current process
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def get_threads_per_worker(n_worker):
+    """ Split the available cores over the workers running in parallel
+
+    Args:
+        n_worker: number of workers running in parallel
+
+    Returns:
+        n_threads: threads per worker, at least 1. It is THPO_NUM_THREADS if it is set by the user
+    """
+    if os.environ.get(NUM_THREADS_ENV):
+        return max(1, int(os.environ[NUM_THREADS_ENV]))
+    return max(1, get_cpu_count() // max(1, n_worker))
+
+
+def set_thread_env(n_threads):
+    """ Set the thread environment variables, inherited by the processes launched afterwards
+
+    Args:
+        n_threads: threads per worker
+    """
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(n_threads)
@@ -0,0 +1,124 @@
+# coding=utf-8
+import numpy as np
+
+
+class ParameterCodec():
+    """ Codec between parameter values and indices in "coords" of parameters
+
+    A Parameter (a dict in the form of {name:value, name:value, ...}) is encoded to a row of indices,
+    whose columns follow names. A value not in "coords" is snapped to the closest valid value, the first
+    one in "coords" if two valid values are equally close, the same as EvaluateFunction.evaluate.
+
+    Attributes:
+        names: list of parameter names, the order of columns
+        coords: list of numpy.ndarray, "coords" of every parameter
+        shape: tuple of int, number of coords of every parameter
+    """
+    def __init__(self, parameters_config, names=None):
+        """ Build the codec
+
+        Args:
+            parameters_config: parameters configuration, see AbstractSearcher
+            names: order of parameters, default: sorted parameter names
+        """
+        self.names = list(names) if names is not None else sorted(parameters_config.keys())
+        self.coords = []
+        self.raw_coords = []
+        self.value_to_index = []
+        self.sorted_coords = []
+        self.coords_order = []
+        for name in self.names:
+            coords = np.array(parameters_config[name]["coords"], dtype=float)
+            value_to_index = {}
+            for i, value in enumerate(parameters_config[name]["coords"]):
+                value_to_index.setdefault(value, i)
+            order = np.argsort(coords, kind="stable")
+            self.coords.append(coords)
+            self.raw_coords.append(list(parameters_config[name]["coords"]))
+            self.value_to_index.append(value_to_index)
+            self.coords_order.append(order)
+            self.sorted_coords.append(coords[order])
+        self.shape = tuple(len(coords) for coords in self.coords)
+
+    def snap_index(self, axis, value):
+        """ Get the index of the closest valid value in "coords" of a parameter
+
+        Args:
+            axis: index of the parameter in names
+            value: parameter value
+
+        Returns:
+            idx: index in "coords", the first one in "coords" is used if two valid values are equally close
+        """
+        idx = self.value_to_index[axis].get(value)
+        if idx is not None:
+            return idx
+        sorted_coords, order = self.sorted_coords[axis], self.coords_order[axis]
+        pos = int(np.searchsorted(sorted_coords, value))
+        left = max(pos - 1, 0)
+        right = min(pos, len(sorted_coords) - 1)
+        left_dist = abs(sorted_coords[left] - value)
+        right_dist = abs(sorted_coords[right] - value)
+        if right_dist < left_dist or (right_dist == left_dist and order[right] < order[left]):
+            return int(order[right])
+        return int(order[left])
+
+    def encode(self, parameter):
+        """ Encode a Parameter
+
+        Returns:
+            idx: tuple of int, indices in "coords" of every parameter
+        """
+        for name in self.names:
+            assert name in parameter, "missing parameter " + name
+        return tuple(self.snap_index(axis, parameter[name]) for axis, name in enumerate(self.names))
+
+    def encode_many(self, parameters):
+        """ Encode a batch of Parameters
+
+        Args:
+            parameters: list of Parameter, or a numpy.ndarray of shape (n, len(names)) whose columns follow names
+
+        Returns:
+            idx: numpy.ndarray of int64, shape (n, len(names))
+        """
+        if isinstance(parameters, np.ndarray):
+            values = parameters.astype(float).reshape(-1, len(self.names))
+        else:
+            for parameter in parameters:
+                for name in self.names:
+                    assert name in parameter, "missing parameter " + name
+            values = np.array([[parameter[name] for name in self.names] for parameter in parameters], dtype=float)
+            values = values.reshape(-1, len(self.names))
+
+        idx = np.empty(values.shape, dtype=np.int64)
+        for axis in range(len(self.names)):
+            sorted_coords, order = self.sorted_coords[axis], self.coords_order[axis]
+            value = values[:, axis]
+            pos = np.searchsorted(sorted_coords, value)
+            left = np.clip(pos - 1, 0, len(sorted_coords) - 1)
+            right = np.clip(pos, 0, len(sorted_coords) - 1)
+            left_dist = np.abs(sorted_coords[left] - value)
+            right_dist = np.abs(sorted_coords[right] - value)
+            use_right = (right_dist < left_dist) | ((right_dist == left_dist) & (order[right] < order[left]))
+            idx[:, axis] = order[np.where(use_right, right, left)]
+        return idx
+
+    def decode(self, idx):
+        """ Decode indices to a Parameter, values are taken from "coords" of parameters_config
+        """
+        return {name: self.raw_coords[axis][idx[axis]] for axis, name in enumerate(self.names)}
+
+    def decode_many(self, idx):
+        """ Decode an index matrix of shape (n, len(names)) to a list of Parameter
+        """
+        return [self.decode(row) for row in np.asarray(idx).tolist()]
+
+    def to_values(self, idx):
+        """ Get the parameter values of an index matrix
+
+        Returns:
+            values: numpy.ndarray, shape (n, len(names))
+        """
+        idx = np.asarray(idx)
+        return np.stack([self.coords[axis][idx[:, axis]] for axis in range(len(self.names))], axis=1)
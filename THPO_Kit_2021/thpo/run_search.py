@@ -24,6 +24,11 @@ def run_search(args):
     n_repeat = args[common.CmdArgs.n_repeat]
     process_list = []
     workers = min(args[common.CmdArgs.worker], n_function)
+    # Bound the threads of every searcher process before it is launched, so that
+    # workers * threads does not oversubscribe the cores
+    n_threads = common.get_threads_per_worker(workers)
+    common.set_thread_env(n_threads)
+    print("run_search cpu:", common.get_cpu_count(), "workers:", workers, "threads per worker:", n_threads)
     err_code, err_msg, timeout_count = common.SEARCH_SUCCESS, "", 0
     with ProcessPoolExecutor(max_workers=workers) as t:
         for func_idx in eva_func_list: